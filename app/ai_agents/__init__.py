@@ -1,7 +1,18 @@
-from .summary_agent import run_summary_crew
-from .qa_agent import run_qa_crew
+import importlib
+
+# The agents import crewai (seconds), so they are loaded on first use and not
+# when the app starts (see app/utils/warmup.py).
+_LAZY = {
+    "run_summary_crew": ".summary_agent",
+    "run_qa_crew": ".qa_agent",
+}
+
+def __getattr__(name):
+    if name in _LAZY:
+        return getattr(importlib.import_module(_LAZY[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # this for => from ai_agent import *
 __all__ = ["run_summary_crew", "run_qa_crew"]
 
-__version__ = "0.0.0"
\ No newline at end of file
+__version__ = "0.0.0"
@@ -0,0 +1,136 @@
+"""
+Reusable CrewAI objects.
+
+Building an Agent + Task + Crew is pydantic validation, tool/LLM setup, event-bus
+wiring... on every request. Instead we keep pools of ready "workers" (an agent,
+its task and its crew) per agent kind and per LLM config:
+
+    result = summary_pool.run(llm, description, expected_output)
+
+`run` checks a worker out for every attempt of the call (app/ai_agents/invoke.py:
+deadline, retries, hedging, circuit breaker), `checkout` is the bare version.
+
+A worker is used by ONE request at a time (checked out / returned), that's what
+makes the reuse safe across concurrent requests. Each worker also gets its own
+copy of the LLM: crewai counts token usage on the LLM instance, with a shared
+instance concurrent requests would see each other's tokens.
+"""
+
+import copy
+import queue
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator
+
+from crewai import Agent, Task, Crew, Process, LLM
+from crewai.llms.base_llm import BaseLLM
+
+from app.configs.concurrency import AGENT_POOL_MAX_IDLE
+from app.configs.rate_limit import LLM_RATE_LIMIT_ENABLED, LLM_RATE_OUTPUT_TOKENS
+from app.utils.metrics import record_llm_usage
+from app.utils.rate_limit import rate_limiter
+from app.utils.tokens import estimate_tokens
+from .invoke import invoke
+from .kickoff import kickoff_crew
+
+
+def _private_llm(llm: LLM) -> LLM:
+    if not isinstance(llm, BaseLLM):
+        return llm
+    # BaseLLM is a plain class in crewai 1.7 (no pydantic model_copy). The copy
+    # shares the provider client, the usage counters dict must be its own
+    private = copy.copy(llm)
+    private._token_usage = dict.fromkeys(llm._token_usage, 0)
+    return private
+
+
+class CrewWorker:
+    def __init__(self, agent: Agent):
+        self.agent = agent
+        # retries are done by invoke(), crewai retrying too would multiply them
+        self.agent.max_retry_limit = 0
+        # description / expected_output are set on every run
+        self.task = Task(description="-", expected_output="-", agent=agent)
+        self.crew = Crew(agents=[agent], tasks=[self.task], process=Process.sequential)
+
+    def run(self, description: str, expected_output: str, on_token: Callable[[str], None] | None = None) -> dict:
+        self.task.description = description
+        self.task.expected_output = expected_output
+
+        before = self.agent.llm.get_token_usage_summary()
+        result = kickoff_crew(self.crew, on_token)
+        after = self.agent.llm.get_token_usage_summary()
+        input_tokens = after.prompt_tokens - before.prompt_tokens
+        output_tokens = after.completion_tokens - before.completion_tokens
+        record_llm_usage(self.agent.llm.model, input_tokens, output_tokens)
+
+        return {
+            'llm_model': self.agent.llm.model,
+            'text': result.raw if hasattr(result, 'raw') else str(result),
+            'input_tokens': input_tokens,
+            'output_tokens': output_tokens,
+        }
+
+
+class CrewPool:
+    def __init__(self, name: str, build_agent: Callable[[LLM], Agent], max_idle: int = AGENT_POOL_MAX_IDLE):
+        self.name = name
+        self._build_agent = build_agent
+        self._max_idle = max_idle
+        self._idle: Dict[int, "queue.LifoQueue[CrewWorker]"] = {}
+        # keeps the LLMs alive, the pools are keyed by id()
+        self._llms: Dict[int, LLM] = {}
+        self._lock = threading.Lock()
+
+    def _idle_workers(self, llm: LLM) -> "queue.LifoQueue[CrewWorker]":
+        key = id(llm)
+        with self._lock:
+            if key not in self._idle:
+                self._idle[key] = queue.LifoQueue()
+                self._llms[key] = llm
+            return self._idle[key]
+
+    def warm_up(self, llm: LLM, count: int = 1) -> None:
+        idle = self._idle_workers(llm)
+        for _ in range(count - idle.qsize()):
+            idle.put_nowait(CrewWorker(self._build_agent(_private_llm(llm))))
+
+    @contextmanager
+    def checkout(self, llm: LLM) -> Iterator[CrewWorker]:
+        idle = self._idle_workers(llm)
+        try:
+            worker = idle.get_nowait()
+        except queue.Empty:
+            worker = CrewWorker(self._build_agent(_private_llm(llm)))
+
+        # a worker whose run blew up is not put back, its state is unknown
+        yield worker
+
+        if idle.qsize() < self._max_idle:
+            idle.put_nowait(worker)
+
+    def run(
+        self,
+        llm: LLM,
+        description: str,
+        expected_output: str,
+        on_token: Callable[[str], None] | None = None,
+    ) -> dict:
+        """
+            worker.run() under the request deadline, with retries, hedging (a
+            backup attempt checks out its own worker), the circuit breaker and
+            the provider quota (estimated tokens, corrected with the real usage).
+        """
+        def attempt(attempt_on_token: Callable[[str], None] | None) -> dict:
+            with self.checkout(llm) as worker:
+                return worker.run(description, expected_output, attempt_on_token)
+
+        tokens = estimate_tokens(description) + LLM_RATE_OUTPUT_TOKENS
+        # latency grows with the prompt, calls are compared to calls of about the same size
+        result = invoke(attempt, f"{self.name}:{len(description).bit_length()}", llm.model, on_token, tokens)
+        if LLM_RATE_LIMIT_ENABLED:
+            rate_limiter.settle(llm.model, tokens, (result['input_tokens'] or 0) + (result['output_tokens'] or 0))
+        return result
+
+    def size(self) -> int:
+        return sum(idle.qsize() for idle in self._idle.values())
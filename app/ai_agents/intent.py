@@ -0,0 +1,199 @@
+"""
+Local router of the chat questions, decided before any LLM call:
+
+    summarize     "summarize it again", "rewrite the summary shorter", "tl;dr"...
+    out_of_scope  clearly unrelated to the video ("what's the weather today?")
+    qa            everything else (default)
+
+1. rules: keyword patterns (english, arabic and a few other languages). An
+   english question with summary words is a summarize one unless it names a
+   topic or a part of the video: "what's the key point about caching?" or
+   "summarize the last 10 minutes" are answered from the retrieved chunks.
+   "make the summary funnier" / "summarize for a 10 year old" are summaries.
+   out_of_scope: small talk that is the whole question ("who are you?"), or an
+   unrelated subject ("weather") with nothing else in the question. Never when
+   the question refers to the video or the conversation.
+2. optional model (INTENT_MODEL=embedding): questions no rule caught are
+   compared to example questions with the retrieval embedder, the closest
+   example decides when it's similar enough.
+
+Every decision is counted in `ai_intent_routes_total{route, source}` and timed as
+the "intent_route" stage. No crewai import here, it runs on the event loop.
+"""
+
+import re
+from functools import lru_cache
+from typing import Any, Dict
+
+import numpy as np
+
+from app.configs.metrics import METRICS_ENABLED
+from app.configs.qa import INTENT_MODEL, INTENT_MODEL_MIN_SIMILARITY
+from app.utils.metrics import intent_routes, span
+
+ROUTE_SUMMARIZE = "summarize"
+ROUTE_QA = "qa"
+ROUTE_OUT_OF_SCOPE = "out_of_scope"
+
+_SUMMARY_WORDS_RE = re.compile(
+    r"\b(re-?)?summar(y|ies|i[sz]e|i[sz]ed|i[sz]ing)\b"
+    r"|\btl;?\s?dr\b|\brecap\b|\bgist\b|\bsum (it |this |that )?up\b|\boverview\b"
+    r"|\b(key|main) (points?|ideas?|takeaways?)\b"
+    r"|\b(shorter|longer|simpler) version\b",
+    re.IGNORECASE,
+)
+
+# "summary about caching", "key points of kubernetes": a topic, not the whole video
+_TOPIC_RE = re.compile(
+    r"\b(about|on|regarding|concerning|of|from|around|behind|related to)\s+"
+    r"(?!((the|this|that|whole|entire)\s+)*(video|clip|talk|lecture|episode|speaker|presenter|it|everything|\d))"
+    r"[^\W_]",
+    re.IGNORECASE,
+)
+
+# a part of the video: "the last 10 minutes", "the docker section", "from 12:30"
+_PARTIAL_RE = re.compile(
+    r"\b(first|last|next|previous|final|opening)\s+(\d+\s+)?(minutes?|mins?|seconds?|hours?|parts?|sections?|chapters?)\b"
+    r"|\bthe\s+[^\W_]+\s+(part|section|chapter|segment)\b"
+    r"|\b(section|chapter|segment|part)\s+\d+\b"
+    r"|\b\d{1,2}:\d{2}\b",
+    re.IGNORECASE,
+)
+
+# other languages: the word alone asks for the summary
+_SUMMARIZE_OTHER_RE = re.compile(
+    r"\brésum(é|er|ez)\b|\bresum(en|ir)\b|\bzusammenfass"
+    # arabic: summarize / summary / conclusion / main points
+    r"|لخص|لخّص|تلخيص|ملخص|خلاص[ةه]|النقاط الرئيسي",
+    re.IGNORECASE,
+)
+
+_WORD_RE = re.compile(r"[^\W_]+", re.UNICODE)
+
+# small talk, only when it's the whole question: "who are you?" yes,
+# "who are you talking about in the demo?" no
+_SMALL_TALK_RE = re.compile(
+    r"^\W*((hi|hello|hey)\W+)?(please\W+)?"
+    r"(who (are|made|created|built) you|what('s| is) your name|tell me a (joke|story)|what (time|day) is it)"
+    r"(\W+please)?\W*$"
+    r"|^\W*(من (انت|أنت)|ما اسمك)\W*$",
+    re.IGNORECASE,
+)
+
+# unrelated subjects, only when the rest of the question is filler words
+_OFF_TOPIC_RE = re.compile(
+    r"\b(weather|forecast|horoscope|lottery|stock price|exchange rate)\b|الطقس|نكتة",
+    re.IGNORECASE,
+)
+
+_OFF_TOPIC_FILLER = frozenset("""
+    what s is are was will be the a an it its like going to today tomorrow tonight now right current
+    currently this week weekend here there outside tell me give show check please for in at of my
+    how about any
+    ما هو هي كيف اليوم غدا الآن قل لي احكي اخبرني في
+""".split())
+
+# the question is about the video or the conversation, never out_of_scope
+_VIDEO_REFERENCE_RE = re.compile(
+    r"\b(video|speaker|talk|lecture|episode|clip|presenter|host|mention(s|ed)?|said|says|explain(s|ed)?"
+    r"|answer(s|ed)?|demo(s)?|earlier|above|previous(ly)?|last|example(s)?|part|section|slides?)\b"
+    r"|الفيديو|المتحدث|المحاضر|ذكر|قال|الجواب|الإجابة|المثال|سابق",
+    re.IGNORECASE,
+)
+
+# examples for INTENT_MODEL=embedding
+_EXAMPLES = {
+    ROUTE_SUMMARIZE: [
+        "summarize the video",
+        "can you summarize it again",
+        "give me a shorter summary",
+        "rewrite the summary in bullet points",
+        "what are the main points of the video",
+        "make the summary more detailed",
+        "لخص الفيديو",
+        "اعد كتابة الملخص",
+    ],
+    ROUTE_OUT_OF_SCOPE: [
+        "what is the weather today",
+        "tell me a joke",
+        "who are you",
+        "what is the bitcoin price",
+        "book me a flight",
+    ],
+    ROUTE_QA: [
+        "what does the speaker say about this",
+        "explain this concept from the video",
+        "what is the difference between these two",
+        "how does it work",
+        "why did he do that",
+    ],
+}
+
+
+@lru_cache(maxsize=1)
+def _example_matrix() -> tuple[np.ndarray, list[str]]:
+    from app.retrieval.embedders import get_embedder
+
+    routes = [route for route, examples in _EXAMPLES.items() for _ in examples]
+    texts = [text for examples in _EXAMPLES.values() for text in examples]
+    return get_embedder().embed(texts), routes
+
+
+def _model_route(question: str) -> tuple[str, float] | None:
+    from app.retrieval.embedders import get_embedder
+
+    matrix, routes = _example_matrix()
+    scores = matrix @ get_embedder().embed([question])[0]
+    best = int(np.argmax(scores))
+    if scores[best] < INTENT_MODEL_MIN_SIMILARITY:
+        return None
+    return routes[best], float(scores[best])
+
+
+def _asks_for_summary(question: str) -> bool:
+    if _SUMMARIZE_OTHER_RE.search(question):
+        return True
+    if not _SUMMARY_WORDS_RE.search(question):
+        return False
+    return not (_TOPIC_RE.search(question) or _PARTIAL_RE.search(question))
+
+
+def _is_out_of_scope(question: str) -> bool:
+    if _VIDEO_REFERENCE_RE.search(question):
+        return False
+    if _SMALL_TALK_RE.search(question):
+        return True
+    if not _OFF_TOPIC_RE.search(question):
+        return False
+    # "what's the weather today?" yes, "how does the weather model handle gaps?" no
+    rest = _OFF_TOPIC_RE.sub(" ", question.casefold())
+    return all(word in _OFF_TOPIC_FILLER for word in _WORD_RE.findall(rest))
+
+
+def _decide(question: str) -> Dict[str, Any]:
+    if _asks_for_summary(question):
+        return {"route": ROUTE_SUMMARIZE, "source": "rules", "score": 1.0}
+    if _is_out_of_scope(question):
+        return {"route": ROUTE_OUT_OF_SCOPE, "source": "rules", "score": 1.0}
+    if INTENT_MODEL == "embedding":
+        decided = _model_route(question)
+        if decided is not None:
+            return {"route": decided[0], "source": "model", "score": round(decided[1], 3)}
+    return {"route": ROUTE_QA, "source": "default", "score": 0.0}
+
+
+def route_question(question: str) -> Dict[str, Any]:
+    """
+        {"route": summarize | qa | out_of_scope, "source": rules | model | default, "score"}
+    """
+    with span("intent_route"):
+        decision = _decide(question)
+    if METRICS_ENABLED:
+        intent_routes.inc(route=decision["route"], source=decision["source"])
+    return decision
+
+
+def warm_up() -> None:
+    # embeds the examples once, so the first question doesn't pay for it
+    if INTENT_MODEL == "embedding":
+        _example_matrix()
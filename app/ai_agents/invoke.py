@@ -0,0 +1,309 @@
+"""
+Every LLM call (a crew kickoff) goes through `invoke()`:
+
+    1. deadline  the request deadline (app/utils/resilience.py) is checked before
+                 every attempt and bounds how long an attempt is waited for (504)
+    2. breaker   one circuit breaker per model, while it's open calls fail right
+                 away with CircuitOpenError (503) instead of piling up on a dead provider
+    3. hedging   an attempt slower than LLM_HEDGE_PERCENTILE of the recent calls of
+                 the same agent gets an identical backup call on another worker, the
+                 first answer wins (the loser finishes in the background, its tokens
+                 are still counted in ai_llm_tokens_total)
+    4. retries   retryable errors (429, 5xx, timeouts, connection errors) are retried
+                 with jittered exponential backoff while the deadline allows it
+    5. quota     every attempt (and hedge) first takes 1 request + its tokens from
+                 the cluster-wide quota of the model (app/utils/rate_limit.py), and
+                 waits for it or fails with RateLimitedError (429)
+
+Attempts run on their own pool so the caller can stop waiting for them (a
+thread can't be killed, LLM_ATTEMPT_TIMEOUT is also the http timeout of the
+Gemini client so a hung attempt frees its thread). Streaming calls are never
+hedged (the client would get the tokens twice) and only retried before their
+first token.
+
+No crewai import here, see CrewPool.run (app/ai_agents/factory.py).
+"""
+
+import contextvars
+import logging
+import re
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Callable, Dict, TypeVar
+
+from app.configs import model_key
+from app.configs.concurrency import LLM_MAX_WORKERS
+from app.configs.llm import (
+    LLM_ATTEMPT_TIMEOUT,
+    LLM_MAX_ATTEMPTS,
+    LLM_RETRY_BASE_DELAY,
+    LLM_RETRY_MAX_DELAY,
+    LLM_HEDGE_ENABLED,
+    LLM_HEDGE_PERCENTILE,
+    LLM_HEDGE_MIN_DELAY,
+    LLM_HEDGE_MIN_SAMPLES,
+    LLM_HEDGE_WINDOW,
+    LLM_HEDGE_MAX_RATIO,
+    LLM_BREAKER_ENABLED,
+    LLM_BREAKER_WINDOW,
+    LLM_BREAKER_MIN_CALLS,
+    LLM_BREAKER_ERROR_RATE,
+    LLM_BREAKER_OPEN_SECONDS,
+)
+from app.configs.metrics import METRICS_ENABLED
+from app.configs.rate_limit import LLM_RATE_LIMIT_ENABLED
+from app.utils.metrics import llm_resilience, registry
+from app.utils.rate_limit import RateLimitedError, rate_limiter
+from app.utils.resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    DeadlineExceeded,
+    LatencyTracker,
+    backoff_delay,
+    check_deadline,
+    remaining,
+)
+
+try:
+    import httpx
+    _TRANSPORT_ERRORS: tuple = (httpx.TimeoutException, httpx.TransportError)
+except ImportError:
+    _TRANSPORT_ERRORS = ()
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_RETRYABLE_CODES = {408, 429, 500, 502, 503, 504}
+# google.genai errors read "503 UNAVAILABLE. {...}", crewai sometimes re-raises them as text
+_RETRYABLE_MESSAGE = re.compile(r"\b(408|429|500|502|503|504) [A-Z_]+\b|overloaded|RESOURCE_EXHAUSTED|UNAVAILABLE")
+
+# hedges and abandoned attempts need threads of their own on top of the llm pool
+_attempt_executor = ThreadPoolExecutor(max_workers=LLM_MAX_WORKERS * 2, thread_name_prefix="llm-attempt")
+
+_trackers: Dict[str, LatencyTracker] = {}
+# every call of a model, whatever its size (app/ai_agents/routing.py: is the provider slow?)
+_model_trackers: Dict[str, LatencyTracker] = {}
+_breakers: Dict[str, CircuitBreaker] = {}
+_lock = threading.Lock()
+_budget = {"calls": 0, "hedges": 0}
+
+
+class AttemptTimeout(TimeoutError):
+    pass
+
+
+def _tracker(name: str, trackers: Dict[str, LatencyTracker] = _trackers) -> LatencyTracker:
+    with _lock:
+        if name not in trackers:
+            trackers[name] = LatencyTracker(LLM_HEDGE_WINDOW)
+        return trackers[name]
+
+
+def model_latency(model: str, q: float, min_samples: int) -> float | None:
+    """
+        Percentile q of the recent call latencies of the model, None before min_samples calls.
+    """
+    tracker = _tracker(model_key(model), _model_trackers)
+    return tracker.percentile(q) if len(tracker) >= min_samples else None
+
+
+def breaker_for(model: str) -> CircuitBreaker:
+    model = model_key(model)
+    with _lock:
+        if model not in _breakers:
+            _breakers[model] = CircuitBreaker(
+                model, LLM_BREAKER_WINDOW, LLM_BREAKER_MIN_CALLS, LLM_BREAKER_ERROR_RATE, LLM_BREAKER_OPEN_SECONDS
+            )
+        return _breakers[model]
+
+
+def _event(model: str, event: str) -> None:
+    if METRICS_ENABLED:
+        llm_resilience.inc(model=model, event=event)
+
+
+def is_retryable(error: BaseException) -> bool:
+    """
+        Provider side / transient errors, worth another attempt (and counted by the breaker).
+    """
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        if isinstance(error, (DeadlineExceeded, CircuitOpenError, RateLimitedError)):
+            return False
+        if isinstance(error, (TimeoutError, ConnectionError) + _TRANSPORT_ERRORS):
+            return True
+        code = getattr(error, "code", None) or getattr(error, "status_code", None)
+        if code in _RETRYABLE_CODES or _RETRYABLE_MESSAGE.search(str(error)):
+            return True
+        error = error.__cause__ or error.__context__
+    return False
+
+
+def _hedge_delay(tracker: LatencyTracker) -> float | None:
+    if not LLM_HEDGE_ENABLED or len(tracker) < LLM_HEDGE_MIN_SAMPLES:
+        return None
+    return max(LLM_HEDGE_MIN_DELAY, tracker.percentile(LLM_HEDGE_PERCENTILE))
+
+
+def _take_hedge_budget() -> bool:
+    with _lock:
+        if _budget["hedges"] >= LLM_HEDGE_MAX_RATIO * _budget["calls"]:
+            return False
+        _budget["hedges"] += 1
+        return True
+
+
+def _submit(func: Callable[[], T], trackers: tuple[LatencyTracker, ...]) -> Future:
+    started = time.monotonic()
+
+    def record(future: Future) -> None:
+        # every successful attempt, even a losing one: the slow ones are the point
+        if not future.cancelled() and future.exception() is None:
+            for tracker in trackers:
+                tracker.record(time.monotonic() - started)
+
+    # each attempt gets its own copy of the request context (deadline, metrics)
+    future = _attempt_executor.submit(contextvars.copy_context().run, func)
+    future.add_done_callback(record)
+    return future
+
+
+def _attempt(
+    call: Callable[[Callable[[str], None] | None], T],
+    timeout: float,
+    trackers: tuple[LatencyTracker, ...],
+    model: str,
+    tokens: int,
+    on_token: Callable[[str], None] | None,
+    emitted: threading.Event,
+) -> T:
+    abandoned = threading.Event()
+
+    def attempt_on_token(text: str) -> None:
+        # tokens of an attempt we stopped waiting for would end up after its error
+        if not abandoned.is_set():
+            emitted.set()
+            on_token(text)
+
+    func = (lambda: call(attempt_on_token)) if on_token is not None else (lambda: call(None))
+    started = time.monotonic()
+    futures = [_submit(func, trackers)]
+    try:
+        hedge_after = _hedge_delay(trackers[0]) if on_token is None else None
+        if hedge_after is not None and hedge_after < timeout:
+            done, _ = wait(futures, timeout=hedge_after)
+            # a backup never waits for the quota, it would come too late anyway
+            if not done and _take_hedge_budget() and (not LLM_RATE_LIMIT_ENABLED or rate_limiter.try_acquire(model, tokens)):
+                _event(model, "hedge")
+                futures.append(_submit(func, trackers))
+
+        first_error = None
+        while futures:
+            left = timeout - (time.monotonic() - started)
+            done, _ = wait(futures, timeout=max(0.0, left), return_when=FIRST_COMPLETED)
+            if not done:
+                _event(model, "attempt_timeout")
+                raise AttemptTimeout(f"LLM call took more than {timeout:.1f}s.")
+            for future in done:
+                if future.exception() is None:
+                    if future is not futures[0]:
+                        _event(model, "hedge_won")
+                    return future.result()
+                first_error = first_error or future.exception()
+                futures.remove(future)
+        # the primary and its backup both failed
+        raise first_error
+    finally:
+        abandoned.set()
+
+
+def _record(breaker: CircuitBreaker | None, generation: int, ok: bool, model: str) -> None:
+    if breaker is None:
+        return
+    opened = breaker.opened
+    breaker.record(ok, generation)
+    if breaker.opened > opened:
+        _event(model, "breaker_opened")
+        logger.error("LLM circuit breaker opened for %s, calls fail fast for %ss", model, LLM_BREAKER_OPEN_SECONDS)
+
+
+def invoke(
+    call: Callable[[Callable[[str], None] | None], T],
+    name: str,
+    model: str,
+    on_token: Callable[[str], None] | None = None,
+    tokens: int = 0,
+) -> T:
+    """
+        Runs call(on_token) with the deadline, breaker, hedging, retries and quota above.
+        `name` groups the latencies of similar calls (the agent kind), `model`
+        picks the circuit breaker and the quota, `tokens` is the estimated size
+        of the call (prompt + answer).
+        Raises DeadlineExceeded, CircuitOpenError, RateLimitedError or the error of the last attempt.
+    """
+    # llm.model here, the routed (prefixed) name in app/ai_agents/routing.py
+    model = model_key(model)
+    breaker = breaker_for(model) if LLM_BREAKER_ENABLED else None
+    trackers = (_tracker(name), _tracker(model, _model_trackers))
+    emitted = threading.Event()
+    with _lock:
+        _budget["calls"] += 1
+
+    for attempt in range(1, LLM_MAX_ATTEMPTS + 1):
+        try:
+            check_deadline()
+        except DeadlineExceeded:
+            _event(model, "deadline_exceeded")
+            raise
+        if LLM_RATE_LIMIT_ENABLED:
+            # before the breaker: a half open breaker's probe must not be stuck waiting here
+            rate_limiter.acquire(model, tokens)
+        generation = 0
+        if breaker is not None:
+            try:
+                generation = breaker.before_call()
+            except CircuitOpenError:
+                _event(model, "breaker_rejected")
+                raise
+
+        left = remaining()
+        timeout = LLM_ATTEMPT_TIMEOUT if left is None else min(LLM_ATTEMPT_TIMEOUT, left)
+        try:
+            result = _attempt(call, timeout, trackers, model, tokens, on_token, emitted)
+        except Exception as e:
+            retryable = is_retryable(e)
+            # a 400 (bad prompt...) is our problem, not the provider's
+            _record(breaker, generation, not retryable, model)
+            left = remaining()
+            if isinstance(e, AttemptTimeout) and left is not None and left <= 0:
+                _event(model, "deadline_exceeded")
+                raise DeadlineExceeded("The request deadline was exceeded while waiting for the LLM.") from e
+            if not retryable or attempt == LLM_MAX_ATTEMPTS or emitted.is_set():
+                raise
+            delay = backoff_delay(attempt, LLM_RETRY_BASE_DELAY, LLM_RETRY_MAX_DELAY)
+            if left is not None and delay >= left:
+                raise
+            _event(model, "retry")
+            logger.warning("LLM call failed (attempt %s/%s), retrying in %.2fs: %s", attempt, LLM_MAX_ATTEMPTS, delay, e)
+            time.sleep(delay)
+            continue
+        _record(breaker, generation, True, model)
+        return result
+
+
+def _breaker_metrics() -> list[str]:
+    states = {CircuitBreaker.CLOSED: 0, CircuitBreaker.HALF_OPEN: 1, CircuitBreaker.OPEN: 2}
+    lines = [
+        "# HELP ai_llm_circuit_state LLM circuit breaker state by model (0 closed, 1 half open, 2 open).",
+        "# TYPE ai_llm_circuit_state gauge",
+    ]
+    with _lock:
+        breakers = list(_breakers.values())
+    lines += [f'ai_llm_circuit_state{{model="{breaker.name}"}} {states[breaker.state]}' for breaker in breakers]
+    return lines
+
+
+registry.add_collector(_breaker_metrics)
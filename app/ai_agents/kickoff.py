@@ -0,0 +1,37 @@
+from typing import Callable
+from crewai import Crew
+from crewai.llms.base_llm import BaseLLM
+from crewai.types.streaming import StreamChunkType
+
+from app.utils.metrics import span
+
+
+def kickoff_crew(crew: Crew, on_token: Callable[[str], None] | None = None):
+    """
+        Runs the crew and returns its CrewOutput.
+        With `on_token` the crew is run in streaming mode and every text chunk the
+        LLM produces is passed to it as soon as it arrives (tool calls are skipped).
+    """
+    with span("llm_kickoff"):
+        return _kickoff(crew, on_token)
+
+
+def _kickoff(crew: Crew, on_token: Callable[[str], None] | None):
+    if on_token is None:
+        return crew.kickoff()
+
+    # crewai turns `stream` on for the agents' LLMs and never turns it off again,
+    # restore it so the next (non streaming) run of a pooled crew isn't affected
+    llms = [agent.llm for agent in crew.agents if isinstance(agent.llm, BaseLLM)]
+    previous = [llm.stream for llm in llms]
+    crew.stream = True
+    try:
+        streaming = crew.kickoff()
+        for chunk in streaming:
+            if chunk.chunk_type == StreamChunkType.TEXT and chunk.content:
+                on_token(chunk.content)
+        return streaming.result
+    finally:
+        crew.stream = False
+        for llm, stream in zip(llms, previous):
+            llm.stream = stream
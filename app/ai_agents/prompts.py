@@ -0,0 +1,215 @@
+"""
+Prompt templates of the agents, parsed once at import.
+
+Rendering is a plain join of the precompiled literal parts and the values, no
+f-string rebuilding / re-parsing of the (big) prompt text on every request.
+Fields use the `{name}` syntax, the templates must not contain other braces.
+"""
+
+import hashlib
+from string import Formatter
+from typing import Any, List, Tuple
+
+from app.configs.summarization import SUMMARY_MAP_REDUCE_THRESHOLD_TOKENS, SUMMARY_CHUNK_TOKENS
+
+
+class PromptTemplate:
+    def __init__(self, text: str):
+        self.text = text
+        self._parts: List[Tuple[str, str | None]] = []
+        for literal, field, format_spec, conversion in Formatter().parse(text):
+            if format_spec or conversion:
+                raise ValueError(f"Unsupported field in prompt template: {field!r}")
+            self._parts.append((literal, field))
+        self.fields = {field for _, field in self._parts if field}
+
+    def render(self, **values: Any) -> str:
+        missing = self.fields - values.keys()
+        if missing:
+            raise KeyError(f"Missing prompt values: {sorted(missing)}")
+        out = []
+        for literal, field in self._parts:
+            out.append(literal)
+            if field:
+                out.append(str(values[field]))
+        return "".join(out)
+
+
+# --- summary agent ---
+
+SUMMARY_AGENT_ROLE = """You are an AI agent that receives the transcript of a YouTube video and generates a concise Summary in his original language .Make it clear, structured, and include main points only."""
+SUMMARY_AGENT_GOAL = """To Create a clear and readable summary that captures all key points of the transcript,
+                to show it for user, and used it for conversation with llm in Q/A agent."""
+SUMMARY_AGENT_BACKSTORY = "we get the transcript for the video and pass it for you to make a clear and readable summary for user and Q/A agent later"
+
+SUMMARY_TASK = PromptTemplate("""
+        Summarize the following transcript based on the user's requirements.
+
+        1. **Language Rule (Critical):**
+            - Check the "USER INSTRUCTIONS" section below.
+           - **If INSTRUCTIONS are provided:** The summary **must** be in the exact same language as those instructions.
+           - **If INSTRUCTIONS are "None" or empty:** The summary **must** be in the exact same language as the Transcript below.
+
+        2. **Handling User Instructions (Safety):**
+            - Read the "USER INSTRUCTIONS" carefully.
+           - **If you can't understand the "CRITICAL USER INSTRUCTIONS":** Treat them as if they do not exist. Ignore them and proceed to summarize normally based on the transcript and language rules above.
+
+        3. **Content & Clarity (Using Your Knowledge):**
+            - The summary should capture all key points from the transcript.
+           - **Crucial:** If the user instructions ask to "explain", "clarify", or "make it clear":
+                - Identify technical terms or complex concepts mentioned in the transcript.
+             - **Use your own internal knowledge** to provide brief, clear explanations or definitions for those terms.
+                - Do NOT hallucinate or add completely new topics, only expand on what is already mentioned.
+
+        4. **Formatting:**
+            - Be clear and easy to read on a screen.
+            - The summary will be shown to the user and the user will ask questions about the video.
+            - Replace "transcript" with "video" or "the speaker".
+
+        5. **USER INSTRUCTIONS:**
+        {summary_instruction}
+
+        6. **Transcript:**
+        Transcript start =>>>>
+
+        {transcript_text}
+        
+        Transcript end =<<<
+        """)
+SUMMARY_EXPECTED_OUTPUT = "A clear summary with additional explanations if requested."
+
+CHUNK_NOTES_TASK = PromptTemplate("""
+        This is part {part} of {total_parts} of a long video transcript.
+        Write detailed notes of this part only: every key point, example, definition and conclusion, in order.
+        - Write in the exact same language as the transcript part.
+        - Don't add an introduction or a conclusion, other parts will be merged with yours.
+        - Replace "transcript" with "video" or "the speaker".
+
+        Transcript part start =>>>>
+
+        {chunk_text}
+
+        Transcript part end =<<<
+        """)
+CHUNK_NOTES_EXPECTED_OUTPUT = "Detailed notes of this part of the video, in the transcript's language."
+
+COMBINE_NOTES_TASK = PromptTemplate("""
+        The following are notes of consecutive parts of the same video.
+        Merge them into one set of notes, keep every key point and the original order, remove repetitions.
+        Write in the exact same language as the notes.
+
+        Notes start =>>>>
+
+        {notes}
+
+        Notes end =<<<
+        """)
+COMBINE_NOTES_EXPECTED_OUTPUT = "Merged notes of the video parts, in the notes' language."
+
+
+def _prompt_version(*parts: Any) -> str:
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(str(part).encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()[:12]
+
+
+# Part of the summary cache key (app/caches/summary.py): a hash of everything the
+# summary depends on besides the transcript, instruction and model. Editing the
+# agent, a summary prompt or the map-reduce sizes makes the old entries unreachable.
+SUMMARY_PROMPT_VERSION = _prompt_version(
+    SUMMARY_AGENT_ROLE,
+    SUMMARY_AGENT_GOAL,
+    SUMMARY_AGENT_BACKSTORY,
+    SUMMARY_TASK.text,
+    SUMMARY_EXPECTED_OUTPUT,
+    CHUNK_NOTES_TASK.text,
+    CHUNK_NOTES_EXPECTED_OUTPUT,
+    COMBINE_NOTES_TASK.text,
+    COMBINE_NOTES_EXPECTED_OUTPUT,
+    SUMMARY_MAP_REDUCE_THRESHOLD_TOKENS,
+    SUMMARY_CHUNK_TOKENS,
+)
+
+# --- Q&A agent ---
+
+QA_TASK = PromptTemplate("""
+    You are a Video Assistant. You have access to two tools: 'Fetches Summary Notes from Redis' and 'Fetches Full Transcript from Redis'.
+
+    **INSTRUCTIONS:**
+    1. **Language:** Answer in exact same language as user's question.
+    2. **Handling "SUMMARIZE" Requests:**
+        - If user asks to Summarize, Re-summarize, or Rewrite summary:
+            - **USE THE TOOL 'Fetches Summary Notes from Redis'** first (previous summary + notes of every part).
+            - Use 'Fetches Full Transcript from Redis' ONLY if the notes tool says so, or the request needs details the notes don't have.
+            - Call the tools with session_id: "{session_id}".
+            - Use the returned text to generate the summary.
+        - DO NOT rely only on the provided chunks below.
+    3. **Handling "Q&A" Requests:**
+        - If user asks a specific question (e.g., "What is Docker?"):
+            - DO NOT use the tool.
+            - Answer using "CONTEXT FROM VIDEO" below.
+            - Chunks starting with a [mm:ss] timestamp: cite it when you use them (e.g. "at 12:34").
+            - If chunks don't contain definition, explain it yourself.
+    4. **Out of Scope:** If question is unrelated, say you can't help.
+
+    **SESSION ID:** {session_id}
+
+    **CONTEXT FROM VIDEO (Use this for Q&A):**
+    {context_text}
+
+    **CONVERSATION HISTORY:**
+    {conversation_history}
+
+    **CURRENT REQUEST:**
+    {question}
+
+    Based on request type, decide to use tool or chunks.
+    """)
+QA_EXPECTED_OUTPUT = "A clear, accurate answer in the same language as the user's question or summary."
+
+# --- routed chat prompts (app/ai_agents/intent.py), no tools ---
+
+QA_ANSWER_TASK = PromptTemplate("""
+    Answer the user's question about a video.
+    - Answer in the exact same language as the question.
+    - Use "CONTEXT FROM VIDEO" below, chunks starting with a [mm:ss] timestamp: cite it when you use them (e.g. "at 12:34").
+    - If the context doesn't contain the answer (e.g. a definition), explain it yourself.
+
+    **CONTEXT FROM VIDEO:**
+    {context_text}
+
+    **CONVERSATION HISTORY:**
+    {conversation_history}
+
+    **QUESTION:**
+    {question}
+    """)
+
+RESUMMARIZE_TASK = PromptTemplate("""
+    The user already got a summary of a video and now asks for a new one (re-summarize, rewrite, shorter, other focus...).
+    - Follow the user's request, write in the exact same language as the request.
+    - Use the VIDEO CONTENT below (notes of the whole video, or its transcript), and the previous summary for what to change.
+    - Replace "transcript" and "notes" with "video" or "the speaker".
+
+    **PREVIOUS SUMMARY:**
+    {previous_summary}
+
+    **VIDEO CONTENT:**
+    {video_content}
+
+    **USER REQUEST:**
+    {question}
+    """)
+RESUMMARIZE_EXPECTED_OUTPUT = "The new summary, as the user asked, in the user's language."
+
+OUT_OF_SCOPE_TASK = PromptTemplate("""
+    You are the assistant of a video chat, you only answer about the video.
+    The user asked something unrelated. In one or two sentences, in the exact same
+    language as the question, say politely that you can only help with the video.
+
+    **QUESTION:**
+    {question}
+    """)
+
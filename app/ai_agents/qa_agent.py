@@ -1,43 +1,155 @@
-from app.configs import gemini_llm
-from crewai import Agent, Task, Crew, Process, LLM
+from app.configs import get_gemini_llm
+from crewai import Agent, LLM
 from crewai.tools import tool # Import decorator from CrewAI
-from app.configs import redis_client
+from app.configs import run_redis_sync
+from app.caches.session_notes import session_notes_key, load_session_video_id
+from app.caches.video import get_video_data
+from app.caches.transcripts import transcript_key
+from app.utils.compression import decompress
+from app.utils.metrics import span
+from .factory import CrewPool
+from app.configs.summarization import SUMMARY_MAP_REDUCE_THRESHOLD_TOKENS
+from app.configs.qa import RESUMMARIZE_TRANSCRIPT_TIMEOUT
+from app.utils.tokens import estimate_tokens
+from .intent import ROUTE_SUMMARIZE, ROUTE_QA, ROUTE_OUT_OF_SCOPE
+from .prompts import (
+    QA_EXPECTED_OUTPUT,
+    QA_ANSWER_TASK,
+    RESUMMARIZE_TASK,
+    RESUMMARIZE_EXPECTED_OUTPUT,
+    OUT_OF_SCOPE_TASK,
+)
+from .qa_context import assemble_qa_prompt
+from .summary_agent import run_summary_crew
+from typing import Callable
 import json
+import logging
+import redis
+
+logger = logging.getLogger(__name__)
 
 # tools
-@tool("Fetches Full Transcript from Redis")
-def _get_full_transcript(session_id: str) -> str:
+def _load_summary_notes(session_id: str) -> dict | None:
+    # what /summary stored for the session (app/caches/session_notes.py)
+    key = session_notes_key(session_id)
+    try:
+        with span("redis_session_notes"):
+            data = run_redis_sync(lambda r: r.get(key))
+    except redis.exceptions.RedisError:
+        return None
+    return json.loads(data) if data else None
+
+
+@tool("Fetches Summary Notes from Redis")
+def _get_summary_notes(session_id: str) -> str:
     """
-        Use this tool ONLY when the user asks to SUMMARIZE or RE-SUMMARIZE the video.
+        Use this tool FIRST when the user asks to SUMMARIZE, RE-SUMMARIZE or REWRITE the summary.
+        Returns the previous summary and the notes of every part of the video (much shorter than the transcript).
         Do NOT use this for specific questions.
     """
-    
+    notes = _load_summary_notes(session_id)
+    if notes is None:
+        return "No summary notes for this session. Use 'Fetches Full Transcript from Redis'."
+    return _format_summary_notes(notes)
+
+
+def _format_summary_notes(notes: dict) -> str:
+    parts = [f"PREVIOUS SUMMARY (instruction: {notes['summary_instruction'] or 'None'}):\n{notes['summary']}"]
+    sections = notes["sections"]
+    if sections:
+        parts.append("NOTES OF THE WHOLE VIDEO, PART BY PART:")
+        parts.extend(f"[part {i + 1}/{len(sections)}]\n{section}" for i, section in enumerate(sections))
+    else:
+        # short video: the transcript itself is small, fetch it if the summary is not enough
+        parts.append("(No part notes for this video. If the request needs more than the previous summary, "
+                     "use 'Fetches Full Transcript from Redis'.)")
+    return "\n\n".join(parts)
+
+
+def _load_session_transcript(session_id: str) -> tuple[str | None, str | None]:
+    """
+        (transcript, error) of the session.
+    """
     # ✅ 2. Match the Key Format used in NestJS
     # NestJS: `${videoChatSession.id}-metadata`
     key = f"{session_id}-metadata"
 
-    # 3. Get the raw data
-    data = redis_client.get(key)
+    # 3. Get the raw data (runs in a worker thread -> shared async pool, with timeout)
+    try:
+        with span("redis_full_transcript"):
+            data = run_redis_sync(lambda r: r.get(key))
+    except redis.exceptions.RedisError:
+        return None, "Error: Could not reach Redis to fetch the transcript. Answer from the provided context."
     
     if not data:
-        return "Error: Could not find transcript in Redis. The session ID might be wrong or data expired."
+        return None, "Error: Could not find transcript in Redis. The session ID might be wrong or data expired."
     
     # ✅ 4. Parse the JSON string
     # NestJS sent an object like: { transcript: "...", summary: "..." }
     # Redis returns this as a STRING, so we need to turn it back into a Dictionary.
     try:
         parsed_data = json.loads(data)
-        
-        # Extract just the transcript part
-        transcript_text = parsed_data.get("transcript")
-        
-        if not transcript_text:
-            return "Error: Found data, but 'transcript' field was empty."
-            
-        return transcript_text
-        
     except json.JSONDecodeError:
-        return "Error: Retrieved data was not valid JSON."
+        return None, "Error: Retrieved data was not valid JSON."
+
+    # Extract just the transcript part
+    transcript_text = parsed_data.get("transcript")
+
+    if not transcript_text and parsed_data.get("transcript_ref"):
+        # summary made with transcript_by_reference: the text is in our transcript store
+        return _load_stored_transcript(parsed_data["transcript_ref"]["transcript_id"])
+
+    if not transcript_text:
+        return None, "Error: Found data, but 'transcript' field was empty."
+
+    return transcript_text, None
+
+
+def _load_stored_transcript(transcript_id: str) -> tuple[str | None, str | None]:
+    key = transcript_key(transcript_id)
+    try:
+        with span("redis_full_transcript"):
+            data, encoding = run_redis_sync(lambda r: r.hmget(key, "data", "encoding"), binary=True)
+    except redis.exceptions.RedisError:
+        return None, "Error: Could not reach Redis to fetch the transcript. Answer from the provided context."
+    if data is None:
+        return None, "Error: The stored transcript expired. Answer from the provided context."
+    return decompress(data, encoding.decode()).decode("utf-8"), None
+
+
+def _load_video_transcript(session_id: str, video_id: str | None) -> str | None:
+    """
+        Transcript of the session's video from the video cache (app/caches/video.py),
+        for sessions without the NestJS `{session_id}-metadata` key. video_id comes
+        from the session notes, else from `{session_id}-video-id`.
+    """
+    async def load() -> str | None:
+        session_video_id = video_id or await load_session_video_id(session_id)
+        if not session_video_id:
+            return None
+        # transcript only: no yt-dlp when the cache expired
+        video_data = await get_video_data(f"https://www.youtube.com/watch?v={session_video_id}", include_metadata=False)
+        if video_data["metadata_error"] or video_data["transcript_error"]:
+            return None
+        return video_data["transcript"]["text"]
+
+    try:
+        # the caches live on the event loop, this runs in an LLM worker thread
+        return run_redis_sync(lambda _: load(), timeout=RESUMMARIZE_TRANSCRIPT_TIMEOUT)
+    except redis.exceptions.RedisError as e:
+        logger.warning("Could not load the video transcript of session %s: %s", session_id, e)
+        return None
+
+
+@tool("Fetches Full Transcript from Redis")
+def _get_full_transcript(session_id: str) -> str:
+    """
+        Use this tool ONLY for SUMMARIZE / RE-SUMMARIZE requests that 'Fetches Summary Notes from Redis'
+        couldn't answer (no notes, or details the notes don't have).
+        Do NOT use this for specific questions.
+    """
+    transcript_text, error = _load_session_transcript(session_id)
+    return transcript_text if transcript_text is not None else error
 
 def _get_qa_agent(llm):
     return Agent(
@@ -46,91 +158,108 @@ def _get_qa_agent(llm):
         goal="Answer user questions based ONLY on the transcript and summary.",
         backstory="An expert assistant specialized in retrieving information from video transcripts.",
         llm=llm,
-        tools=[_get_full_transcript],
+        tools=[_get_summary_notes, _get_full_transcript],
         verbose=False, # Set to True for verbose logging
     )
 
-def _get_qa_task(
+qa_pool = CrewPool("qa", _get_qa_agent)
+
+def _get_answer_agent(llm):
+    # routed questions (app/ai_agents/intent.py): the prompt already has everything, no tools
+    return Agent(
+        name="VideoAnswer",
+        role="Video Assistant, the answer must be in the same language of the question",
+        goal="Answer the user's request about the video from the content given in the task.",
+        backstory="An expert assistant specialized in explaining and summarizing videos.",
+        llm=llm,
+        verbose=False,
+    )
+
+answer_pool = CrewPool("answer", _get_answer_agent)
+
+def _resummarize(
     session_id: str,
     question: str,
-    relative_parts_from_transcript: list[str],
-    last_few_message: list[str],
-    qa_agent: Agent 
-) -> Task:
-    
-    # 1. Construct the Context String (RAG)
-    context_text = "\n\n---\n\n".join(relative_parts_from_transcript)
-
-    # 2. Construct the History String (Memory)
-    conversation_history = "\n".join(last_few_message)
-
-    description = f"""
-    You are a Video Assistant. You have access to a tool: 'Fetches Full Transcript from Redis'.
-
-    **INSTRUCTIONS:**
-    1. **Language:** Answer in exact same language as user's question.
-    2. **Handling "SUMMARIZE" Requests:**
-        - If user asks to Summarize, Re-summarize, or Rewrite summary:
-            - **USE THE TOOL 'Fetches Full Transcript from Redis'**.
-            - Call tool with session_id: "{session_id}".
-            - Use the returned full text to generate the summary.
-        - DO NOT rely only on the provided chunks below.
-    3. **Handling "Q&A" Requests:**
-        - If user asks a specific question (e.g., "What is Docker?"):
-            - DO NOT use the tool.
-            - Answer using "CONTEXT FROM VIDEO" below.
-            - If chunks don't contain definition, explain it yourself.
-    4. **Out of Scope:** If question is unrelated, say you can't help.
-
-    **SESSION ID:** {session_id}
-
-    **CONTEXT FROM VIDEO (Use this for Q&A):**
-    {context_text}
-
-    **CONVERSATION HISTORY:**
-    {conversation_history}
-
-    **CURRENT REQUEST:**
-    {question}
-
-    Based on request type, decide to use tool or chunks.
+    llm: LLM,
+    on_token: Callable[[str], None] | None,
+) -> tuple[dict, dict] | None:
     """
+        summarize route: from the session notes (long videos), else from the
+        transcript (short ones, or long ones with expired notes -> map-reduce).
+        The transcript is the one NestJS stored for the session, else the one of
+        the session's video in the video cache.
+        Returns (result, prompt_usage), None when the session has neither.
+    """
+    notes = _load_summary_notes(session_id)
+    previous_summary = notes["summary"] if notes else "None"
+    if notes and notes["sections"]:
+        video_content, source = "\n\n".join(notes["sections"]), "notes"
+    else:
+        video_content, _ = _load_session_transcript(session_id)
+        if video_content is None:
+            video_content = _load_video_transcript(session_id, notes["video_id"] if notes else None)
+        if video_content is None:
+            return None
+        source = "transcript"
+        if estimate_tokens(video_content) > SUMMARY_MAP_REDUCE_THRESHOLD_TOKENS:
+            result = run_summary_crew(video_content, question, llm, on_token)
+            result = {**result, 'text': result['summary']}
+            return result, {"source": "map_reduce", "total_tokens": result['input_tokens']}
 
-    return Task(
-        description=description,
-        expected_output="A clear, accurate answer in the same language as the user's question or summary.",
-        agent=qa_agent
+    description = RESUMMARIZE_TASK.render(
+        previous_summary=previous_summary,
+        video_content=video_content,
+        question=question,
     )
+    result = answer_pool.run(llm, description, RESUMMARIZE_EXPECTED_OUTPUT, on_token)
+    return result, {"source": source, "total_tokens": estimate_tokens(description)}
 
 def run_qa_crew(
         session_id: str,
         question: str,
         relative_parts_from_transcript: list[str],
         last_few_message: list[str],
-        llm: LLM = gemini_llm
+        llm: LLM | None = None,
+        on_token: Callable[[str], None] | None = None,
+        route: str | None = None,
     ):
-    qa_agent = _get_qa_agent(llm)
-    qa_task = _get_qa_task(
-        session_id,
-        question, 
-        relative_parts_from_transcript, 
-        last_few_message, 
-        qa_agent
-    )
-    qa_crew = Crew(
-        agents=[qa_agent],
-        tasks=[qa_task],
-        process=Process.sequential,
-    )
+    """
+        route (app/ai_agents/intent.py):
+            None          the agent with its tools decides what to do (router disabled)
+            qa            context + history prompt, no tools
+            summarize     new summary from the session notes / transcript, no tools
+            out_of_scope  short polite refusal, no context
+    """
+    llm = llm or get_gemini_llm()
+    qa_result = None
+    if route == ROUTE_SUMMARIZE:
+        resummarized = _resummarize(session_id, question, llm, on_token)
+        if resummarized is not None:
+            qa_result, prompt_usage = resummarized
+        else:
+            # nothing stored for the session, let the agent explain with its tools
+            route = None
+    elif route == ROUTE_OUT_OF_SCOPE:
+        description = OUT_OF_SCOPE_TASK.render(question=question)
+        prompt_usage = {"total_tokens": estimate_tokens(description)}
+        qa_result = answer_pool.run(llm, description, QA_EXPECTED_OUTPUT, on_token)
+    elif route == ROUTE_QA:
+        description, prompt_usage = assemble_qa_prompt(
+            session_id, question, relative_parts_from_transcript, last_few_message, template=QA_ANSWER_TASK
+        )
+        qa_result = answer_pool.run(llm, description, QA_EXPECTED_OUTPUT, on_token)
 
-    qa_result = qa_crew.kickoff()
-    metrics = qa_crew.usage_metrics
-    print(metrics)
-    final_answer = qa_result.raw if hasattr(qa_result, 'raw') else str(qa_result)
+    if qa_result is None:
+        description, prompt_usage = assemble_qa_prompt(session_id, question, relative_parts_from_transcript, last_few_message)
+        qa_result = qa_pool.run(llm, description, QA_EXPECTED_OUTPUT, on_token)
+    logger.info("QA route=%s prompt tokens: %s", route, prompt_usage)
 
     return {
-        'llm_model': qa_agent.llm.model,
-        'answer':final_answer,   
-        'input_tokens': metrics.prompt_tokens, 
-        'output_tokens':metrics.completion_tokens
+        'llm_model': qa_result['llm_model'],
+        'answer': qa_result['text'],
+        'input_tokens': qa_result['input_tokens'],
+        'output_tokens': qa_result['output_tokens'],
+        'route': route,
+        # estimated tokens per prompt section (see qa_context.assemble_qa_prompt)
+        'prompt_usage': prompt_usage,
     }
@@ -0,0 +1,196 @@
+"""
+Fits the /ask-question context + history into QA_PROMPT_TOKEN_BUDGET.
+
+    1. fixed part: the instructions + session id + question (the question is only
+       cut if it alone is over the budget)
+    2. context chunks: exact duplicates dropped, chunks contained in another one
+       dropped, overlapping chunks (end of one == start of the other, e.g. from a
+       sliding window) merged. Then ranked by how many question words they contain,
+       packed best first (the last one cut to fit), and put back in their original
+       order so the text still reads like the video.
+    3. history: newest messages first until the budget is used, the oldest are dropped.
+
+Token counts are `estimate_tokens` (sum of the parts >= the estimate of the whole
+prompt, so the rendered prompt is never above the budget, as long as the budget
+is bigger than the fixed instructions, ~300 tokens).
+"""
+
+import re
+from typing import Any, Dict, List, Tuple
+
+from app.configs.qa import (
+    QA_PROMPT_TOKEN_BUDGET,
+    QA_HISTORY_MAX_SHARE,
+    QA_MIN_OVERLAP_WORDS,
+    QA_MIN_CHUNK_TOKENS,
+)
+from app.utils.tokens import estimate_tokens, truncate_to_tokens
+from .prompts import PromptTemplate, QA_TASK
+
+CONTEXT_SEPARATOR = "\n\n---\n\n"
+HISTORY_SEPARATOR = "\n"
+
+_WORD_RE = re.compile(r"\w+")
+
+
+def _overlap(first: List[str], second: List[str], min_words: int) -> int:
+    # longest suffix of `first` that is a prefix of `second`,
+    # only the positions where second's first word appears are compared
+    start = max(len(first) - len(second) + 1, 1)
+    for position in range(start, len(first) - min_words + 1):
+        if first[position] == second[0] and first[position:] == second[:len(first) - position]:
+            return len(first) - position
+    return 0
+
+
+def _dedupe_chunks(chunks: List[str], min_overlap_words: int = QA_MIN_OVERLAP_WORDS) -> List[str]:
+    """
+        Drops duplicates / chunks inside another chunk and merges overlapping ones.
+        The order of the first occurrence is kept.
+    """
+    unique: List[List[str]] = []
+    seen = set()
+    for chunk in chunks:
+        words = str(chunk).split()
+        key = " ".join(words).casefold()
+        if not words or key in seen:
+            continue
+        seen.add(key)
+        unique.append(words)
+
+    # contained in a longer chunk (padded with spaces: whole words only)
+    padded = [f" {' '.join(words).casefold()} " for words in unique]
+    kept = [
+        words for i, words in enumerate(unique)
+        if not any(i != j and len(padded[j]) > len(padded[i]) and padded[i] in padded[j] for j in range(len(unique)))
+    ]
+
+    merged = True
+    while merged:
+        merged = False
+        for i in range(len(kept)):
+            for j in range(len(kept)):
+                if i == j:
+                    continue
+                size = _overlap(kept[i], kept[j], min_overlap_words)
+                if size:
+                    kept[i] = kept[i] + kept[j][size:]
+                    del kept[j]
+                    merged = True
+                    break
+            if merged:
+                break
+    return [" ".join(words) for words in kept]
+
+
+def _rank(chunks: List[str], question: str) -> List[int]:
+    # local relevance: share of the question words found in the chunk
+    # (no model call, the chunks already come from retrieval / NestJS)
+    terms = {word for word in _WORD_RE.findall(question.casefold()) if len(word) > 2}
+    if not terms:
+        return list(range(len(chunks)))
+
+    def score(i: int) -> float:
+        words = set(_WORD_RE.findall(chunks[i].casefold()))
+        return len(terms & words) / len(terms)
+
+    # stable: same score => original order (retrieval order)
+    return sorted(range(len(chunks)), key=score, reverse=True)
+
+
+def _pack_context(chunks: List[str], question: str, budget: int) -> Tuple[List[str], int, int]:
+    """
+        Returns (chunks in original order, tokens used, how many chunks were cut).
+    """
+    separator_tokens = estimate_tokens(CONTEXT_SEPARATOR)
+    chosen: Dict[int, str] = {}
+    used = truncated = 0
+    for i in _rank(chunks, question):
+        cost = estimate_tokens(chunks[i]) + (separator_tokens if chosen else 0)
+        if used + cost <= budget:
+            chosen[i] = chunks[i]
+            used += cost
+            continue
+        room = budget - used - (separator_tokens if chosen else 0)
+        if room >= QA_MIN_CHUNK_TOKENS:
+            chosen[i] = truncate_to_tokens(chunks[i], room)
+            used += estimate_tokens(chosen[i]) + (separator_tokens if len(chosen) > 1 else 0)
+            truncated += 1
+        # smaller chunks further down the ranking may still fit
+    return [chosen[i] for i in sorted(chosen)], used, truncated
+
+
+def _pack_history(messages: List[str], budget: int) -> Tuple[List[str], int]:
+    separator_tokens = estimate_tokens(HISTORY_SEPARATOR)
+    kept: List[str] = []
+    used = 0
+    for message in reversed(messages):
+        message = str(message)
+        cost = estimate_tokens(message) + (separator_tokens if kept else 0)
+        if used + cost > budget:
+            if not kept:
+                # the last message alone is too big, keep its end (closest to the question)
+                message = truncate_to_tokens(message, budget, keep="tail")
+                if message:
+                    kept.append(message)
+                    used += estimate_tokens(message)
+            break
+        kept.append(message)
+        used += cost
+    kept.reverse()
+    return kept, used
+
+
+def assemble_qa_prompt(
+    session_id: str,
+    question: str,
+    relative_parts_from_transcript: List[str],
+    last_few_message: List[str],
+    budget: int = QA_PROMPT_TOKEN_BUDGET,
+    template: PromptTemplate = QA_TASK,
+) -> Tuple[str, Dict[str, Any]]:
+    """
+        `template` needs {question}, {context_text} and {conversation_history}
+        (QA_TASK of the agent, or QA_ANSWER_TASK of the routed qa).
+        Returns (prompt, usage) where usage has the estimated tokens of every section:
+            {"budget", "total_tokens", "instructions_tokens", "question_tokens",
+             "context_tokens", "history_tokens", "chunks_in", "chunks_unique",
+             "chunks_used", "chunks_truncated", "messages_in", "messages_used"}
+    """
+    instructions_tokens = estimate_tokens(template.render(
+        session_id=session_id, question="", context_text="", conversation_history=""
+    ))
+    question_tokens = estimate_tokens(question)
+    if instructions_tokens + question_tokens > budget:
+        question = truncate_to_tokens(question, budget - instructions_tokens)
+        question_tokens = estimate_tokens(question)
+    available = max(budget - instructions_tokens - question_tokens, 0)
+
+    chunks = _dedupe_chunks(relative_parts_from_transcript or [])
+    history_tokens_wanted = sum(estimate_tokens(str(m)) + 1 for m in last_few_message or [])
+    # the context comes first, the history gets its share (or what the context leaves)
+    history_reserved = min(history_tokens_wanted, int(available * QA_HISTORY_MAX_SHARE))
+    context, context_tokens, chunks_truncated = _pack_context(chunks, question, available - history_reserved)
+    history, history_tokens = _pack_history(list(last_few_message or []), available - context_tokens)
+
+    prompt = template.render(
+        session_id=session_id,
+        question=question,
+        context_text=CONTEXT_SEPARATOR.join(context),
+        conversation_history=HISTORY_SEPARATOR.join(history),
+    )
+    usage = {
+        "budget": budget,
+        "total_tokens": estimate_tokens(prompt),
+        "instructions_tokens": instructions_tokens,
+        "question_tokens": question_tokens,
+        "context_tokens": context_tokens,
+        "history_tokens": history_tokens,
+        "chunks_in": len(relative_parts_from_transcript or []),
+        "chunks_unique": len(chunks),
+        "chunks_used": len(context),
+        "chunks_truncated": chunks_truncated,
+        "messages_in": len(last_few_message or []),
+        "messages_used": len(history),
+    }
+    return prompt, usage
@@ -0,0 +1,175 @@
+"""
+Picks the model of every LLM request (a summary or a chat answer):
+
+    1. pick_model()  from the request only: size of the transcript (summary),
+                     route of the question (chat). Same request => same model,
+                     the summary cache is keyed by it.
+    2. run_routed()  from the current load, in the llm thread: the picked model is
+                     swapped for LLM_FALLBACK_MODEL while its circuit breaker is
+                     open, it has no concurrency headroom left or its recent calls
+                     are slow. A request failing on it with an overload error
+                     (429/5xx after the retries, breaker opened meanwhile, quota
+                     used up) runs again on the fallback, unless tokens were
+                     already streamed.
+
+The model that answered is the `llm_model` of the response. Every request is
+counted in `ai_llm_routes_total{kind, model, reason}`, every switch in
+`ai_llm_route_fallbacks_total{model, fallback, cause}`. Breakers, latencies,
+quotas and metrics name the models by model_key() (no "gemini/" prefix), like
+crewai's llm.model that invoke() sees.
+
+No crewai import here, the LLMs are built by app.configs.get_llm on first use.
+"""
+
+import logging
+import threading
+from typing import Any, Callable, Dict
+
+from app.configs import get_llm, model_key, GEMINI_MODEL
+from app.configs.llm import LLM_BREAKER_ENABLED
+from app.configs.metrics import METRICS_ENABLED
+from app.configs.routing import (
+    LLM_ROUTING_ENABLED,
+    LLM_LONG_MODEL,
+    LLM_ROUTING_LONG_TOKENS,
+    LLM_FALLBACK_MODEL,
+    LLM_MODEL_MAX_CONCURRENCY,
+    LLM_MODEL_DEFAULT_MAX_CONCURRENCY,
+    LLM_ROUTING_SLOW_SECONDS,
+    LLM_ROUTING_MIN_SAMPLES,
+)
+from app.utils.metrics import llm_routes, llm_route_fallbacks, registry
+from app.utils.resilience import CircuitBreaker, CircuitOpenError
+from app.utils.rate_limit import RateLimitedError
+from .intent import ROUTE_SUMMARIZE
+from .invoke import breaker_for, is_retryable, model_latency
+
+logger = logging.getLogger(__name__)
+
+KIND_SUMMARY = "summary"
+KIND_QA = "qa"
+
+_in_flight: Dict[str, int] = {}
+_lock = threading.Lock()
+
+
+def pick_model(kind: str, tokens: int = 0, route: str | None = None) -> Dict[str, str]:
+    """
+        {"kind", "model", "reason"} of a request, before looking at the load.
+            summary  transcripts above LLM_ROUTING_LONG_TOKENS => LLM_LONG_MODEL
+            qa       re-summaries (they read the whole video) => LLM_LONG_MODEL,
+                     questions and refusals have a short prompt => GEMINI_MODEL
+    """
+    if not LLM_ROUTING_ENABLED:
+        return {"kind": kind, "model": GEMINI_MODEL, "reason": "default"}
+    if kind == KIND_SUMMARY:
+        if tokens > LLM_ROUTING_LONG_TOKENS:
+            return {"kind": kind, "model": LLM_LONG_MODEL, "reason": "long"}
+        return {"kind": kind, "model": GEMINI_MODEL, "reason": "short"}
+    if route == ROUTE_SUMMARIZE:
+        return {"kind": kind, "model": LLM_LONG_MODEL, "reason": "resummarize"}
+    return {"kind": kind, "model": GEMINI_MODEL, "reason": route or "agent"}
+
+
+def _max_concurrency(model: str) -> int:
+    return LLM_MODEL_MAX_CONCURRENCY.get(model_key(model), LLM_MODEL_DEFAULT_MAX_CONCURRENCY)
+
+
+def overload_cause(model: str) -> str | None:
+    """
+        Why the model shouldn't get a new request right now, None when it can.
+    """
+    if LLM_BREAKER_ENABLED:
+        breaker = breaker_for(model)
+        # open and not yet due for its probe call
+        if breaker.state == CircuitBreaker.OPEN and breaker.retry_after() > 0:
+            return "breaker_open"
+    with _lock:
+        if _in_flight.get(model_key(model), 0) >= _max_concurrency(model):
+            return "saturated"
+    p90 = model_latency(model, 0.9, LLM_ROUTING_MIN_SAMPLES)
+    if p90 is not None and p90 > LLM_ROUTING_SLOW_SECONDS:
+        return "slow"
+    return None
+
+
+def _is_overload(error: BaseException) -> bool:
+    # DeadlineExceeded is not retryable: no time left for the fallback either.
+    # The quota is per model, the fallback has its own
+    return isinstance(error, (CircuitOpenError, RateLimitedError)) or is_retryable(error)
+
+
+def _fallback(pick: Dict[str, str], fallback: str, cause: str) -> None:
+    logger.warning("LLM %s request moved from %s to %s: %s", pick["kind"], pick["model"], fallback, cause)
+    if METRICS_ENABLED:
+        llm_route_fallbacks.inc(model=model_key(pick["model"]), fallback=model_key(fallback), cause=cause)
+
+
+def _run_on(model: str, func: Callable[..., dict], args: tuple, kwargs: dict) -> dict:
+    key = model_key(model)
+    with _lock:
+        _in_flight[key] = _in_flight.get(key, 0) + 1
+    try:
+        return func(*args, llm=get_llm(model), **kwargs)
+    finally:
+        with _lock:
+            _in_flight[key] -= 1
+
+
+def run_routed(
+    func: Callable[..., dict],
+    pick: Dict[str, str],
+    *args: Any,
+    on_token: Callable[[str], None] | None = None,
+    **kwargs: Any,
+) -> dict:
+    """
+        func(*args, llm=..., on_token=..., **kwargs) (run_summary_crew / run_qa_crew)
+        on the model of `pick`, or on the fallback model when that one is overloaded.
+        The result gets "routing": {"model", "reason"}, the model that answered.
+    """
+    model, reason = pick["model"], pick["reason"]
+    fallback = LLM_FALLBACK_MODEL if LLM_ROUTING_ENABLED and LLM_FALLBACK_MODEL != model else None
+    if fallback:
+        cause = overload_cause(model)
+        # both overloaded: the fallback would not do better, keep the picked one
+        if cause is not None and overload_cause(fallback) is None:
+            _fallback(pick, fallback, cause)
+            model, reason, fallback = fallback, cause, None
+
+    emitted = threading.Event()
+
+    def tracking_on_token(text: str) -> None:
+        emitted.set()
+        on_token(text)
+
+    kwargs["on_token"] = tracking_on_token if on_token is not None else None
+    try:
+        result = _run_on(model, func, args, kwargs)
+    except Exception as e:
+        # a half streamed answer can't be restarted on another model
+        if fallback is None or emitted.is_set() or not _is_overload(e):
+            raise
+        _fallback(pick, fallback, "overloaded")
+        model, reason = fallback, "overloaded"
+        result = _run_on(model, func, args, kwargs)
+
+    if METRICS_ENABLED:
+        llm_routes.inc(kind=pick["kind"], model=model_key(model), reason=reason)
+    return {**result, "routing": {"model": model, "reason": reason}}
+
+
+def _in_flight_metrics() -> list[str]:
+    lines = [
+        "# HELP ai_llm_model_in_flight LLM requests running per model, and their limit before the model counts as saturated.",
+        "# TYPE ai_llm_model_in_flight gauge",
+    ]
+    with _lock:
+        in_flight = dict(_in_flight)
+    for model, count in in_flight.items():
+        lines.append(f'ai_llm_model_in_flight{{model="{model}",state="running"}} {count}')
+        lines.append(f'ai_llm_model_in_flight{{model="{model}",state="limit"}} {_max_concurrency(model)}')
+    return lines
+
+
+registry.add_collector(_in_flight_metrics)
@@ -1,77 +1,148 @@
-from app.configs import gemini_llm
-from crewai import Agent, Task, Crew, Process, LLM
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+from app.configs import get_gemini_llm
+from app.configs.summarization import (
+    SUMMARY_MAP_REDUCE_THRESHOLD_TOKENS,
+    SUMMARY_CHUNK_TOKENS,
+    SUMMARY_MAP_CONCURRENCY,
+)
+from app.utils.tokens import estimate_tokens, split_into_chunks
+from crewai import Agent, LLM
+from .factory import CrewPool
+from .prompts import (
+    SUMMARY_AGENT_ROLE,
+    SUMMARY_AGENT_GOAL,
+    SUMMARY_AGENT_BACKSTORY,
+    SUMMARY_TASK,
+    SUMMARY_EXPECTED_OUTPUT,
+    CHUNK_NOTES_TASK,
+    CHUNK_NOTES_EXPECTED_OUTPUT,
+    COMBINE_NOTES_TASK,
+    COMBINE_NOTES_EXPECTED_OUTPUT,
+)
 
 def _get_summary_agent(llm):
     return Agent(
-        role="""You are an AI agent that receives the transcript of a YouTube video and generates a concise Summary in his original language .Make it clear, structured, and include main points only.""",
-        goal="""To Create a clear and readable summary that captures all key points of the transcript,
-                to show it for user, and used it for conversation with llm in Q/A agent.""",
-        backstory="we get the transcript for the video and pass it for you to make a clear and readable summary for user and Q/A agent later",
+        role=SUMMARY_AGENT_ROLE,
+        goal=SUMMARY_AGENT_GOAL,
+        backstory=SUMMARY_AGENT_BACKSTORY,
         llm=llm,
         verbose=False, # Set to True for verbose logging
     )
 
-def _get_summary_task( transcript_text: str , video_summary_agent: Agent, summary_instruction: str | None = None):
-    return Task(
-        description=f"""
-        Summarize the following transcript based on the user's requirements.
+summary_pool = CrewPool("summary", _get_summary_agent)
 
-        1. **Language Rule (Critical):**
-            - Check the "USER INSTRUCTIONS" section below.
-           - **If INSTRUCTIONS are provided:** The summary **must** be in the exact same language as those instructions.
-           - **If INSTRUCTIONS are "None" or empty:** The summary **must** be in the exact same language as the Transcript below.
+# map step of long transcripts, shared by all requests so one 3h video can't open
+# dozens of parallel LLM calls
+_map_executor = ThreadPoolExecutor(max_workers=SUMMARY_MAP_CONCURRENCY, thread_name_prefix="summary-map")
 
-        2. **Handling User Instructions (Safety):**
-            - Read the "USER INSTRUCTIONS" carefully.
-           - **If you can't understand the "CRITICAL USER INSTRUCTIONS":** Treat them as if they do not exist. Ignore them and proceed to summarize normally based on the transcript and language rules above.
+def _summary_prompt(transcript_text: str, summary_instruction: str | None = None) -> tuple[str, str]:
+    description = SUMMARY_TASK.render(
+        summary_instruction=summary_instruction or "None",
+        transcript_text=transcript_text,
+    )
+    return description, SUMMARY_EXPECTED_OUTPUT
 
-        3. **Content & Clarity (Using Your Knowledge):**
-            - The summary should capture all key points from the transcript.
-           - **Crucial:** If the user instructions ask to "explain", "clarify", or "make it clear":
-                - Identify technical terms or complex concepts mentioned in the transcript.
-             - **Use your own internal knowledge** to provide brief, clear explanations or definitions for those terms.
-                - Do NOT hallucinate or add completely new topics, only expand on what is already mentioned.
+def _chunk_notes_prompt(chunk_text: str, part: int, total_parts: int) -> tuple[str, str]:
+    description = CHUNK_NOTES_TASK.render(chunk_text=chunk_text, part=part, total_parts=total_parts)
+    return description, CHUNK_NOTES_EXPECTED_OUTPUT
 
-        4. **Formatting:**
-            - Be clear and easy to read on a screen.
-            - The summary will be shown to the user and the user will ask questions about the video.
-            - Replace "transcript" with "video" or "the speaker".
+def _combine_notes_prompt(partial_summaries: list[str]) -> tuple[str, str]:
+    description = COMBINE_NOTES_TASK.render(notes="\n\n---\n\n".join(partial_summaries))
+    return description, COMBINE_NOTES_EXPECTED_OUTPUT
 
-        5. **USER INSTRUCTIONS:**
-        {summary_instruction or "None"}
+def _kickoff(llm: LLM, prompt: tuple[str, str], on_token: Callable[[str], None] | None = None) -> dict:
+    description, expected_output = prompt
+    return summary_pool.run(llm, description, expected_output, on_token)
 
-        6. **Transcript:**
-        Transcript start =>>>>
+def _pack(texts: list[str], max_tokens: int) -> list[list[str]]:
+    # group consecutive texts while the group stays under max_tokens
+    groups, current, current_tokens = [], [], 0
+    for text in texts:
+        tokens = estimate_tokens(text)
+        if current and current_tokens + tokens > max_tokens:
+            groups.append(current)
+            current, current_tokens = [], 0
+        current.append(text)
+        current_tokens += tokens
+    if current:
+        groups.append(current)
+    return groups
 
-        {transcript_text}
-        
-        Transcript end =<<<
-        """,
-        expected_output="A clear summary with additional explanations if requested.",
-        agent=video_summary_agent
-    )
-def run_summary_crew(transcript_text: str,summary_instruction: str | None = None, llm: LLM = gemini_llm):
+def _map_reduce_summary(
+    transcript_text: str,
+    summary_instruction: str | None,
+    llm: LLM,
+    on_token: Callable[[str], None] | None = None,
+) -> dict:
+    """
+        1. map: split the transcript into sentence-aligned chunks and take notes of each (in parallel).
+        2. reduce: merge the notes group by group until they fit in one chunk (recursive).
+        3. final: the normal summary prompt (with the user instructions) over the merged notes.
+    """
+    usage = {'input_tokens': 0, 'output_tokens': 0}
+
+    def run_all(prompts):
+        # every map thread runs in its own copy of the request context (metrics labels)
+        calls = [(contextvars.copy_context(), prompt) for prompt in prompts]
+        results = list(_map_executor.map(lambda call: call[0].run(_kickoff, llm, call[1]), calls))
+        for r in results:
+            usage['input_tokens'] += r['input_tokens']
+            usage['output_tokens'] += r['output_tokens']
+        return [r['text'] for r in results]
+
+    chunks = split_into_chunks(transcript_text, SUMMARY_CHUNK_TOKENS)
+    sections = run_all([
+        _chunk_notes_prompt(chunk, i + 1, len(chunks))
+        for i, chunk in enumerate(chunks)
+    ])
+
+    while estimate_tokens("\n\n".join(sections)) > SUMMARY_CHUNK_TOKENS:
+        groups = _pack(sections, SUMMARY_CHUNK_TOKENS)
+        if len(groups) == len(sections):
+            # every note is already as big as a chunk, merging can't shrink it more
+            break
+        merged = iter(run_all([_combine_notes_prompt(group) for group in groups if len(group) > 1]))
+        # a group of one note has nothing to merge, keep it as is
+        sections = [group[0] if len(group) == 1 else next(merged) for group in groups]
+
+    # only the final step is streamed, the notes are never shown to the user
+    final = _kickoff(llm, _summary_prompt("\n\n".join(sections), summary_instruction), on_token)
+    return {
+        'llm_model': final['llm_model'],
+        'summary': final['text'],
+        'input_tokens': usage['input_tokens'] + final['input_tokens'],
+        'output_tokens': usage['output_tokens'] + final['output_tokens'],
+        # kept per chat session, re-summarizing from them is much cheaper than from the transcript
+        'sections': sections,
+    }
+
+def run_summary_crew(
+        transcript_text: str,
+        summary_instruction: str | None = None,
+        llm: LLM | None = None,
+        on_token: Callable[[str], None] | None = None,
+    ):
     """
         :param transcript_text: Description
         :type transcript_text: str
-        :returns: Summary
+        :param on_token: optional callback, receives the summary text as it is generated
+        :returns: Summary (+ the section notes of map-reduce in 'sections', [] for short transcripts)
         it do this:
             Generates a summary using CrewAI.
+            Short transcripts => one prompt, long ones (> SUMMARY_MAP_REDUCE_THRESHOLD_TOKENS)
+            => map-reduce over chunks, the token usage of every call is summed up.
     """
-    video_summary_agent = _get_summary_agent(llm)
-    video_summary_task = _get_summary_task(transcript_text, video_summary_agent, summary_instruction)
-    summary_crew = Crew(
-        agents=[video_summary_agent],
-        tasks=[video_summary_task],
-        process=Process.sequential,
-    )
-    summary_result = summary_crew.kickoff()
-    metrics = summary_crew.usage_metrics
-    final_summary = summary_result.raw if hasattr(summary_result, 'raw') else str(summary_result)
+    llm = llm or get_gemini_llm()
+    if estimate_tokens(transcript_text) > SUMMARY_MAP_REDUCE_THRESHOLD_TOKENS:
+        return _map_reduce_summary(transcript_text, summary_instruction, llm, on_token)
 
+    result = _kickoff(llm, _summary_prompt(transcript_text, summary_instruction), on_token)
     return {
-        'llm_model': video_summary_agent.llm.model,
-        'summary':final_summary, 
-        'input_tokens': metrics.prompt_tokens, 
-        'output_tokens':metrics.completion_tokens
+        'llm_model': result['llm_model'],
+        'summary': result['text'],
+        'input_tokens': result['input_tokens'],
+        'output_tokens': result['output_tokens'],
+        'sections': [],
     }
@@ -1,28 +1,166 @@
-from .dto import SummaryRequest, SummaryResponse, ChatRequest, ChatResponse
-from .service import generate_summary, chat_with_video
+from .dto import (
+  SummaryRequest,
+  SummaryResponse,
+  SummaryJobCreated,
+  SummaryJobStatus,
+  BatchSummaryRequest,
+  ChatRequest,
+  ChatResponse,
+)
+from .service import (
+  generate_summary,
+  chat_with_video,
+  stream_summary,
+  stream_chat,
+  stream_batch_summary,
+  enqueue_summary_job,
+  get_summary_job,
+)
 from app.api.v1.endpoints.middleware.communication import get_api_key
-from fastapi import APIRouter, Depends
+from app.api.v1.endpoints.middleware.deadline import summary_deadline, qa_deadline
+from app.caches import load_compressed_transcript
+from app.utils.compression import accepts_encoding, decompress
+from app.utils.concurrency import cancel_on_disconnect
+from app.utils.ndjson import NDJSON_MEDIA_TYPE
+from app.utils.sse import SSE_HEADERS
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
 
 router = APIRouter()
 
-@router.post("/summary", dependencies=[Depends(get_api_key)] , response_model=SummaryResponse)
-async def summary(request: SummaryRequest):
+@router.post("/summary", dependencies=[Depends(get_api_key), Depends(summary_deadline)] , response_model=SummaryResponse)
+async def summary(request: SummaryRequest, http_request: Request):
   """
     Accepts a YouTube video URL and generates a summary.
   """
-  return await generate_summary(request.youtube_url, request.summary_instruction)
+  return await cancel_on_disconnect(
+    http_request,
+    generate_summary(
+      request.youtube_url,
+      request.summary_instruction,
+      request.bypass_cache,
+      request.video_chat_session_id,
+      request.include_metadata,
+      request.transcript_by_reference
+    )
+  )
+
+
+@router.post("/summary/jobs", dependencies=[Depends(get_api_key)], response_model=SummaryJobCreated, status_code=202)
+async def summary_job(request: SummaryRequest):
+  """
+    Same input as /summary but returns a job_id right away, the summary is made
+    by a worker. Poll GET /summary/jobs/{job_id}.
+  """
+  return await enqueue_summary_job(
+    request.youtube_url,
+    request.summary_instruction,
+    request.bypass_cache,
+    request.video_chat_session_id,
+    request.include_metadata,
+    request.transcript_by_reference
+  )
+
 
+@router.get("/summary/jobs/{job_id}", dependencies=[Depends(get_api_key)], response_model=SummaryJobStatus)
+async def summary_job_status(job_id: str):
+  """
+    Status of a summary job, `result` is the SummaryResponse once it succeeded.
+  """
+  return await get_summary_job(job_id)
+
+
+@router.get("/transcripts/{transcript_id}", dependencies=[Depends(get_api_key)])
+async def transcript(transcript_id: str, http_request: Request):
+  """
+    A transcript stored by /summary with transcript_by_reference (text/plain).
+    Clients accepting the stored encoding get the stored bytes as they are
+    (Content-Encoding), the others get it decompressed.
+  """
+  stored = await load_compressed_transcript(transcript_id)
+  if stored is None:
+    raise HTTPException(status_code=404, detail="Transcript not found (unknown id or expired).")
+  data, encoding = stored
+  headers = {"ETag": f'"{transcript_id}"', "Vary": "Accept-Encoding"}
+  if accepts_encoding(http_request.headers.get("accept-encoding"), encoding):
+    return Response(data, media_type="text/plain; charset=utf-8", headers={**headers, "Content-Encoding": encoding})
+  return Response(decompress(data, encoding), media_type="text/plain; charset=utf-8", headers=headers)
 
-@router.post("/ask-question",dependencies=[Depends(get_api_key)] , response_model=ChatResponse)
-async def chat(request: ChatRequest):
+
+@router.post("/summary/batch", dependencies=[Depends(get_api_key)])
+async def summary_batch(request: BatchSummaryRequest):
+  """
+    Summarizes many videos (and playlists with expand_playlists) in parallel.
+    Streams NDJSON: one `item` line per video as soon as it's done (result or error),
+    then a `done` line with the counts and the total input_tokens/output_tokens.
+  """
+  return StreamingResponse(
+    stream_batch_summary(
+      request.youtube_urls,
+      request.summary_instruction,
+      request.bypass_cache,
+      request.expand_playlists,
+      request.include_transcript,
+      request.include_metadata
+    ),
+    media_type=NDJSON_MEDIA_TYPE,
+    headers={"X-Accel-Buffering": "no"},
+  )
+
+
+@router.post("/ask-question", dependencies=[Depends(get_api_key), Depends(qa_deadline)] , response_model=ChatResponse)
+async def chat(request: ChatRequest, http_request: Request):
   """
     Accepts a question and video_id.
   """
 
-  return await chat_with_video(
-    request.video_chat_session_id,
-    request.question, 
-    request.relative_parts_from_transcript, 
-    request.last_few_message
+  return await cancel_on_disconnect(
+    http_request,
+    chat_with_video(
+      request.video_chat_session_id,
+      request.question,
+      request.relative_parts_from_transcript,
+      request.last_few_message,
+      request.bypass_cache
+    )
   )
 
+
+# --- Server-Sent Events versions (the client disconnecting stops the generator) ---
+
+@router.post("/summary/stream", dependencies=[Depends(get_api_key), Depends(summary_deadline)])
+async def summary_stream(request: SummaryRequest):
+  """
+    Same as /summary but streams: `metadata`, then `token`s of the summary, then `done`
+    (summary + input_tokens/output_tokens/llm_model) or `error`.
+  """
+  return StreamingResponse(
+    stream_summary(
+      request.youtube_url,
+      request.summary_instruction,
+      request.bypass_cache,
+      request.video_chat_session_id,
+      request.include_metadata,
+      request.transcript_by_reference
+    ),
+    media_type="text/event-stream",
+    headers=SSE_HEADERS,
+  )
+
+
+@router.post("/ask-question/stream", dependencies=[Depends(get_api_key), Depends(qa_deadline)])
+async def chat_stream(request: ChatRequest):
+  """
+    Same as /ask-question but streams the answer `token`s, then `done` or `error`.
+  """
+  return StreamingResponse(
+    stream_chat(
+      request.video_chat_session_id,
+      request.question,
+      request.relative_parts_from_transcript,
+      request.last_few_message,
+      request.bypass_cache
+    ),
+    media_type="text/event-stream",
+    headers=SSE_HEADERS,
+  )
@@ -1,8 +1,20 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+
+from app.configs.concurrency import BATCH_MAX_ITEMS
 
 class SummaryRequest(BaseModel):
     youtube_url: str
     summary_instruction: str | None = None # Optional summary instruction
+    bypass_cache: bool = False # True => always run the LLM (the fresh result still refreshes the cache)
+    video_chat_session_id: str | None = None # if set, the transcript is indexed for /ask-question retrieval
+    include_metadata: bool = True # False => transcript only (faster, no yt-dlp), video_metadata is just {"video_id"}
+    transcript_by_reference: bool = False # True => transcript stored here, the response has transcript_ref instead of the text
+
+class TranscriptRef(BaseModel):
+    transcript_id: str # sha256 of the utf-8 text, GET /transcripts/{transcript_id}
+    size_bytes: int
+    compressed_bytes: int
+    encoding: str # gzip | zstd (as stored)
 
 class SummaryResponse(BaseModel):
     video_metadata: dict
@@ -12,13 +24,42 @@ class SummaryResponse(BaseModel):
     input_tokens: int
     output_tokens: int
     llm_model: str
+    transcript_ref: TranscriptRef | None = None # set instead of transcript with transcript_by_reference
+
+
+class SummaryJobCreated(BaseModel):
+    job_id: str
+    status: str
+
+
+class SummaryJobStatus(BaseModel):
+    job_id: str
+    status: str # queued | running | retrying | succeeded | failed
+    attempts: int
+    max_attempts: int
+    created_at: float
+    started_at: float | None
+    finished_at: float | None
+    error: str | None # last error (also set while retrying)
+    result: SummaryResponse | None # only when succeeded
+
+
+class BatchSummaryRequest(BaseModel):
+    youtube_urls: list[str] = Field(min_length=1, max_length=BATCH_MAX_ITEMS)
+    summary_instruction: str | None = None # same instruction for every video
+    bypass_cache: bool = False
+    expand_playlists: bool = False # True => playlist urls are replaced by their videos
+    include_transcript: bool = False # transcripts are big, not sent back unless asked
+    include_metadata: bool = True
 
 
 class ChatRequest(BaseModel):
     question: str
-    relative_parts_from_transcript: list|None
-    last_few_message: list|None
+    # None/empty => the chunks are retrieved here from the session index (built on /summary)
+    relative_parts_from_transcript: list|None = None
+    last_few_message: list|None = None
     video_chat_session_id: str
+    bypass_cache: bool = False # True => always run the LLM (the fresh answer still refreshes the cache)
 
 
 class ChatResponse(BaseModel):
@@ -26,4 +67,6 @@ class ChatResponse(BaseModel):
     input_tokens: int
     output_tokens: int
     llm_model: str
+    route: str | None = None # summarize | qa | out_of_scope, None => the agent decided (router off)
+    cache_hit: bool = False # True => answer of an earlier similar question (session or video), no LLM call, 0 tokens
 
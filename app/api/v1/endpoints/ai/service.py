@@ -1,17 +1,146 @@
+import asyncio
+import logging
+import math
+import redis
 from fastapi import HTTPException
-from .dto import SummaryResponse, ChatResponse
+from .dto import SummaryResponse, ChatResponse, SummaryJobCreated, SummaryJobStatus, TranscriptRef
 
-from app.utils.youtube import get_video_metadata_transcript
-from app.ai_agents import run_summary_crew, run_qa_crew
+from app.caches import (
+    get_video_data,
+    get_cached_summary,
+    store_summary,
+    store_transcript,
+    store_session_notes,
+    find_cached_answer,
+    store_answer,
+)
+# lazy: crewai is imported on first use (or by the startup warm-up), not with the app
+from app import ai_agents
+from app.ai_agents.intent import route_question, ROUTE_QA
+from app.ai_agents.routing import pick_model, run_routed, KIND_SUMMARY, KIND_QA
+from app.retrieval import build_transcript_index, retrieve_chunks
+from app.jobs import get_job_queue
+from app.configs.concurrency import BATCH_CONCURRENCY, BATCH_MAX_ITEMS
+from app.configs.qa import INTENT_ROUTER_ENABLED, INTENT_MODEL
+from app.configs.llm import SUMMARY_DEADLINE
+from app.utils.concurrency import run_fetch, run_llm, stream_llm
+from app.utils.ndjson import ndjson_line
+from app.utils.rate_limit import RateLimitedError
+from app.utils.resilience import CircuitOpenError, DeadlineExceeded, deadline
+from app.utils.sse import sse_event
+from app.utils.tokens import estimate_tokens
+from app.utils.youtube import extract_playlist_id, expand_playlist
 
-async def generate_summary(url: str, summary_instruction: str | None = None):
+logger = logging.getLogger(__name__)
+
+
+def _llm_error(e: Exception, detail: str) -> HTTPException:
+    """
+        504 when the request deadline ran out, 503 (+ Retry-After) while the LLM
+        circuit breaker is open, 429 (+ Retry-After) when the LLM quota is used
+        up, 500 for anything else.
+    """
+    if isinstance(e, DeadlineExceeded):
+        return HTTPException(status_code=504, detail=f"{detail}: the request deadline was exceeded.")
+    if isinstance(e, RateLimitedError):
+        return HTTPException(
+            status_code=429,
+            detail=f"{detail}: {str(e)}",
+            headers={"Retry-After": str(math.ceil(e.retry_after))},
+        )
+    if isinstance(e, CircuitOpenError):
+        return HTTPException(
+            status_code=503,
+            detail=f"{detail}: {str(e)}",
+            headers={"Retry-After": str(math.ceil(e.retry_after))},
+        )
+    return HTTPException(status_code=500, detail=f"{detail}: {str(e)}")
+
+
+async def _index_transcript(session_id: str | None, transcript: dict) -> None:
     """
-        1. Fetches video info and transcript using utils.py.
-        2. Generates a summary using CrewAI.
-        3. Stores data in memory for chat.
+        Builds the retrieval index of the session (used by /ask-question when
+        NestJS doesn't send the chunks). Best effort, never fails the summary.
     """
-    # 1. Fetch Data from YouTube
-    video_data = get_video_metadata_transcript(url)
+    if not session_id:
+        return
+    try:
+        await build_transcript_index(session_id, transcript["text"], transcript.get("segments"))
+    except Exception as e:
+        logger.warning("Could not index the transcript of session %s: %s", session_id, e, exc_info=True)
+
+
+async def _transcript_fields(transcript_text: str, by_reference: bool) -> dict:
+    """
+        The transcript part of the response: the text, or with by_reference
+        the text is stored here and only its TranscriptRef is sent.
+    """
+    if not by_reference:
+        return {"transcript": transcript_text}
+    try:
+        ref = await store_transcript(transcript_text)
+    except redis.exceptions.RedisError as e:
+        # a big response is better than a failed summary
+        logger.warning("Could not store the transcript, sending it inline: %s", e)
+        return {"transcript": transcript_text}
+    return {"transcript": None, "transcript_ref": TranscriptRef(**ref)}
+
+
+async def _store_session_notes(
+    session_id: str | None,
+    video_id: str,
+    summary_instruction: str | None,
+    result: dict,
+) -> None:
+    # what the chat re-summarizes from (see app/caches/session_notes.py)
+    if session_id:
+        await store_session_notes(session_id, video_id, result["summary"], result.get("sections"), summary_instruction)
+
+
+async def _route(question: str) -> str | None:
+    """
+        The route of the question (app/ai_agents/intent.py), None when the router
+        is off (the agent decides with its tools).
+    """
+    if not INTENT_ROUTER_ENABLED:
+        return None
+    # the rules are microseconds, the optional model embeds the question
+    decision = await run_fetch(route_question, question) if INTENT_MODEL else route_question(question)
+    return decision["route"]
+
+
+async def _resolve_context(
+    session_id: str,
+    question: str,
+    relative_parts_from_transcript: list[str] | None,
+    route: str | None,
+) -> list[str]:
+    if route is not None and route != ROUTE_QA:
+        # summarize / out_of_scope prompts don't use the chunks
+        return []
+    if relative_parts_from_transcript:
+        return relative_parts_from_transcript
+    return await retrieve_chunks(session_id, question)
+
+async def generate_summary(
+    url: str,
+    summary_instruction: str | None = None,
+    bypass_cache: bool = False,
+    session_id: str | None = None,
+    include_metadata: bool = True,
+    transcript_by_reference: bool = False,
+    ):
+    """
+        1. Fetches video info and transcript using utils.py (transcript only
+           with include_metadata=False: no yt-dlp, video_metadata is just the id).
+        2. Indexes the transcript for the chat session (in parallel with 3/4),
+           and stores it when the response only carries a reference to it.
+        3. Returns the cached summary if we already made it (0 tokens charged).
+        4. Otherwise generates a summary using CrewAI and caches it.
+        The summary (+ its section notes) is kept for the chat session, to re-summarize from.
+    """
+    # 1. Fetch Data from YouTube (cached by video_id, blocking parts -> fetch pool)
+    video_data = await get_video_data(url, include_metadata)
 
     if video_data["metadata_error"]:
         raise HTTPException(status_code=400, detail=video_data["metadata_error"])
@@ -30,50 +159,420 @@ async def generate_summary(url: str, summary_instruction: str | None = None):
 
     metadata = video_data["metadata"]
     transcript_text = video_data["transcript"]["text"]
+    video_id = metadata["video_id"]
 
-    # 2. Generate Summary with CrewAI
+    # 2. Retrieval index (+ transcript store), runs while we wait for the LLM
+    index_task = asyncio.ensure_future(_index_transcript(session_id, video_data["transcript"]))
+    transcript_task = asyncio.ensure_future(_transcript_fields(transcript_text, transcript_by_reference))
+
+    # 3. Summary cache (of the model this transcript is routed to)
+    pick = pick_model(KIND_SUMMARY, estimate_tokens(transcript_text))
+    if not bypass_cache:
+        cached = await get_cached_summary(video_id, summary_instruction, pick["model"])
+        if cached:
+            await index_task
+            await _store_session_notes(session_id, video_id, summary_instruction, cached)
+            return SummaryResponse(
+                video_metadata=metadata,
+                summary=cached["summary"],
+                **await transcript_task,
+                transcript_available=True,
+                input_tokens=0,
+                output_tokens=0,
+                llm_model=cached["llm_model"],
+            )
+
+    # 4. Generate Summary with CrewAI
     try:
-        summary_crew_result = run_summary_crew(transcript_text, summary_instruction)
+        summary_crew_result = await run_llm(run_routed, ai_agents.run_summary_crew, pick, transcript_text, summary_instruction)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to generate summary: {str(e)}")
-    print("Summary generated:", summary_crew_result)
+        index_task.cancel()
+        transcript_task.cancel()
+        raise _llm_error(e, "Failed to generate summary")
+    logger.info(
+        "Summary generated: model=%s (%s) input_tokens=%s output_tokens=%s",
+        summary_crew_result["llm_model"], summary_crew_result["routing"]["reason"],
+        summary_crew_result["input_tokens"], summary_crew_result["output_tokens"],
+    )
+    await index_task
+    # under the model that made it: a fallback summary doesn't answer for the routed model
+    await store_summary(
+        video_id,
+        summary_instruction,
+        summary_crew_result["routing"]["model"],
+        summary_crew_result["summary"],
+        summary_crew_result["llm_model"],
+        summary_crew_result.get("sections"),
+    )
+    await _store_session_notes(session_id, video_id, summary_instruction, summary_crew_result)
     return SummaryResponse(
         video_metadata=metadata,
         summary=summary_crew_result["summary"],
-        transcript=transcript_text, 
+        **await transcript_task,
         transcript_available=True, 
         input_tokens=summary_crew_result['input_tokens'],
         output_tokens=summary_crew_result['output_tokens'],
         llm_model=summary_crew_result['llm_model'], # input_tokens, output_tokens
     )
 
+async def enqueue_summary_job(
+    url: str,
+    summary_instruction: str | None = None,
+    bypass_cache: bool = False,
+    session_id: str | None = None,
+    include_metadata: bool = True,
+    transcript_by_reference: bool = False,
+    ) -> SummaryJobCreated:
+    """
+        Queues generate_summary for a worker (app/jobs/worker.py) and returns right away.
+    """
+    job = await get_job_queue().enqueue({
+        "url": url,
+        "summary_instruction": summary_instruction,
+        "bypass_cache": bypass_cache,
+        "session_id": session_id,
+        "include_metadata": include_metadata,
+        "transcript_by_reference": transcript_by_reference,
+    })
+    return SummaryJobCreated(job_id=job["id"], status=job["status"])
+
+
+async def get_summary_job(job_id: str) -> SummaryJobStatus:
+    job = await get_job_queue().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found (unknown id or expired).")
+    return SummaryJobStatus(
+        job_id=job["id"],
+        status=job["status"],
+        attempts=job["attempts"],
+        max_attempts=job["max_attempts"],
+        created_at=job["created_at"],
+        started_at=job["started_at"],
+        finished_at=job["finished_at"],
+        error=job["error"],
+        result=job["result"],
+    )
+
+
 async def chat_with_video(
     session_id: str,
     question: str,
-    relative_parts_from_transcript: list[str],
-    last_few_message: list[str]
+    relative_parts_from_transcript: list[str] | None,
+    last_few_message: list[str] | None,
+    bypass_cache: bool = False,
     ):
     """
         Accepts a question and relative_parts_from_transcript and last_few_message 
         from NestJS server.
+        Without relative_parts_from_transcript the chunks come from the session index.
+        A question similar enough to one already answered (same session, or same
+        video) gets the stored answer, cache_hit=True and 0 tokens.
     """
 
+    # 1. Route (local, no LLM), answer cache, context chunks (sent by NestJS or retrieved here)
+    route = await _route(question)
+    cached, probe = await find_cached_answer(session_id, question, route, bypass_cache)
+    if cached:
+        return ChatResponse(
+            answer=cached["answer"],
+            input_tokens=0,
+            output_tokens=0,
+            llm_model=cached["llm_model"],
+            route=cached["route"],
+            cache_hit=True,
+        )
+    relative_parts_from_transcript = await _resolve_context(session_id, question, relative_parts_from_transcript, route)
+
     # 2. Run QA Agent
     try:
-        final_answer_result = run_qa_crew(
+        final_answer_result = await run_llm(
+            run_routed,
+            ai_agents.run_qa_crew,
+            pick_model(KIND_QA, route=route),
             session_id=session_id,
             question=question,
             relative_parts_from_transcript=relative_parts_from_transcript, 
-            last_few_message=last_few_message
+            last_few_message=last_few_message or [],
+            route=route,
         )
     except Exception as e:
-        print(" Error during chat processing:", str(e))
-        raise HTTPException(status_code=500, detail=f"AI serivce: Error during chat processing: {str(e)}")
+        logger.error("Error during chat processing: %s", e, exc_info=True)
+        raise _llm_error(e, "AI serivce: Error during chat processing")
 
+    if probe is not None:
+        await store_answer(probe, final_answer_result['answer'], final_answer_result['llm_model'], final_answer_result.get('route'))
     return ChatResponse(
         answer=final_answer_result['answer'], 
         input_tokens=final_answer_result['input_tokens'], 
         output_tokens=final_answer_result['output_tokens'], 
-        llm_model=final_answer_result['llm_model']
+        llm_model=final_answer_result['llm_model'],
+        route=final_answer_result.get('route'),
+    )
+
+
+async def stream_summary(
+    url: str,
+    summary_instruction: str | None = None,
+    bypass_cache: bool = False,
+    session_id: str | None = None,
+    include_metadata: bool = True,
+    transcript_by_reference: bool = False,
+    ):
+    """
+        Same flow as generate_summary but as Server-Sent Events:
+            metadata -> token* -> done   (or error at any point)
+        `metadata` is sent as soon as yt-dlp answered, without waiting for the
+        transcript. `done` carries the full summary plus the other fields of
+        SummaryResponse (transcript / transcript_ref, transcript_available).
+    """
+    loop = asyncio.get_running_loop()
+    metadata_ready = loop.create_future()
+
+    def on_metadata(partial: dict) -> None:
+        # fetch thread -> event loop
+        loop.call_soon_threadsafe(lambda: metadata_ready.done() or metadata_ready.set_result(partial))
+
+    video_task = asyncio.ensure_future(get_video_data(url, include_metadata, on_metadata))
+    await asyncio.wait({video_task, metadata_ready}, return_when=asyncio.FIRST_COMPLETED)
+    # cache hits (and coalesced fetches) don't call on_metadata, the full data is there
+    partial = metadata_ready.result() if metadata_ready.done() else video_task.result()
+
+    if partial["metadata_error"]:
+        yield sse_event("error", {"status_code": 400, "detail": partial["metadata_error"]})
+        return
+
+    metadata = partial["metadata"]
+    yield sse_event("metadata", {"video_metadata": metadata})
+
+    video_data = await video_task
+    transcript_available = not video_data["transcript_error"]
+    transcript_text = video_data["transcript"]["text"] if transcript_available else None
+    if not transcript_available:
+        yield sse_event("done", {
+            "summary": "Could not generate summary because transcript is unavailable.",
+            "transcript": None,
+            "transcript_available": False,
+            "input_tokens": 0,
+            "output_tokens": 0,
+            "llm_model": "",
+        })
+        return
+
+    # stored (transcript_by_reference) while the summary is made, sent with `done`
+    fields_task = asyncio.ensure_future(_transcript_fields(transcript_text, transcript_by_reference))
+
+    async def transcript_done_fields() -> dict:
+        fields = await fields_task
+        if "transcript_ref" in fields:
+            fields["transcript_ref"] = fields["transcript_ref"].model_dump()
+        return {**fields, "transcript_available": True}
+
+    video_id = metadata["video_id"]
+    index_task = asyncio.ensure_future(_index_transcript(session_id, video_data["transcript"]))
+    pick = pick_model(KIND_SUMMARY, estimate_tokens(transcript_text))
+    if not bypass_cache:
+        cached = await get_cached_summary(video_id, summary_instruction, pick["model"])
+        if cached:
+            await index_task
+            await _store_session_notes(session_id, video_id, summary_instruction, cached)
+            yield sse_event("token", {"text": cached["summary"]})
+            yield sse_event("done", {
+                "summary": cached["summary"],
+                **await transcript_done_fields(),
+                "input_tokens": 0,
+                "output_tokens": 0,
+                "llm_model": cached["llm_model"],
+            })
+            return
+
+    try:
+        async for kind, value in stream_llm(run_routed, ai_agents.run_summary_crew, pick, transcript_text, summary_instruction):
+            if kind == "token":
+                yield sse_event("token", {"text": value})
+            else:
+                summary_crew_result = value
+    except Exception as e:
+        index_task.cancel()
+        fields_task.cancel()
+        error = _llm_error(e, "Failed to generate summary")
+        yield sse_event("error", {"status_code": error.status_code, "detail": error.detail})
+        return
+
+    await index_task
+    await store_summary(
+        video_id,
+        summary_instruction,
+        summary_crew_result["routing"]["model"],
+        summary_crew_result["summary"],
+        summary_crew_result["llm_model"],
+        summary_crew_result.get("sections"),
     )
+    await _store_session_notes(session_id, video_id, summary_instruction, summary_crew_result)
+    yield sse_event("done", {
+        "summary": summary_crew_result["summary"],
+        **await transcript_done_fields(),
+        "input_tokens": summary_crew_result["input_tokens"],
+        "output_tokens": summary_crew_result["output_tokens"],
+        "llm_model": summary_crew_result["llm_model"],
+    })
+
+
+async def stream_chat(
+    session_id: str,
+    question: str,
+    relative_parts_from_transcript: list[str] | None,
+    last_few_message: list[str] | None,
+    bypass_cache: bool = False,
+    ):
+    """
+        Same as chat_with_video but as Server-Sent Events: token* -> done (or error).
+    """
+    route = await _route(question)
+    cached, probe = await find_cached_answer(session_id, question, route, bypass_cache)
+    if cached:
+        yield sse_event("token", {"text": cached["answer"]})
+        yield sse_event("done", {
+            "answer": cached["answer"],
+            "input_tokens": 0,
+            "output_tokens": 0,
+            "llm_model": cached["llm_model"],
+            "route": cached["route"],
+            "cache_hit": True,
+        })
+        return
+    relative_parts_from_transcript = await _resolve_context(session_id, question, relative_parts_from_transcript, route)
+    try:
+        async for kind, value in stream_llm(
+            run_routed,
+            ai_agents.run_qa_crew,
+            pick_model(KIND_QA, route=route),
+            session_id=session_id,
+            question=question,
+            relative_parts_from_transcript=relative_parts_from_transcript,
+            last_few_message=last_few_message or [],
+            route=route,
+        ):
+            if kind == "token":
+                yield sse_event("token", {"text": value})
+            else:
+                final_answer_result = value
+    except Exception as e:
+        logger.error("Error during streamed chat processing: %s", e, exc_info=True)
+        error = _llm_error(e, "AI serivce: Error during chat processing")
+        yield sse_event("error", {"status_code": error.status_code, "detail": error.detail})
+        return
+
+    if probe is not None:
+        await store_answer(probe, final_answer_result["answer"], final_answer_result["llm_model"], final_answer_result.get("route"))
+    yield sse_event("done", {
+        "answer": final_answer_result["answer"],
+        "input_tokens": final_answer_result["input_tokens"],
+        "output_tokens": final_answer_result["output_tokens"],
+        "llm_model": final_answer_result["llm_model"],
+        "route": final_answer_result.get("route"),
+        "cache_hit": False,
+    })
+
+
+async def _expand_batch_urls(youtube_urls: list[str], expand_playlists: bool) -> list[dict]:
+    """
+        Turns the request urls into batch items {"url", "playlist_url", "error"}.
+        Playlists are listed in parallel, a playlist that can't be listed becomes
+        one failed item. Duplicated videos are summarized once.
+    """
+    async def expand(url: str) -> list[dict]:
+        if not expand_playlists or extract_playlist_id(url) is None:
+            return [{"url": url, "playlist_url": None, "error": None}]
+        try:
+            videos = await run_fetch(expand_playlist, url, BATCH_MAX_ITEMS)
+        except Exception as e:
+            return [{"url": url, "playlist_url": url, "error": {"status_code": 400, "detail": f"Could not list the playlist: {str(e)}"}}]
+        return [{"url": video["url"], "playlist_url": url, "error": None} for video in videos]
+
+    items, seen = [], set()
+    for expanded in await asyncio.gather(*(expand(url) for url in youtube_urls)):
+        for item in expanded:
+            if item["url"] in seen:
+                continue
+            seen.add(item["url"])
+            items.append(item)
+    return items
+
+
+async def _summarize_batch_item(
+    index: int,
+    item: dict,
+    semaphore: asyncio.Semaphore,
+    summary_instruction: str | None,
+    bypass_cache: bool,
+    include_transcript: bool,
+    include_metadata: bool,
+    ) -> dict:
+    line = {"type": "item", "index": index, "url": item["url"], "playlist_url": item["playlist_url"]}
+    if item["error"]:
+        return {**line, "ok": False, "error": item["error"]}
+
+    async with semaphore:
+        try:
+            # every video gets the deadline of a /summary, counted from when its turn comes
+            with deadline(SUMMARY_DEADLINE):
+                response = await generate_summary(item["url"], summary_instruction, bypass_cache, include_metadata=include_metadata)
+        except HTTPException as e:
+            return {**line, "ok": False, "error": {"status_code": e.status_code, "detail": e.detail}}
+        except Exception as e:
+            return {**line, "ok": False, "error": {"status_code": 500, "detail": f"Failed to generate summary: {str(e)}"}}
+
+    result = response.model_dump()
+    if not include_transcript:
+        result["transcript"] = None
+    return {**line, "ok": True, "result": result}
+
+
+async def stream_batch_summary(
+    youtube_urls: list[str],
+    summary_instruction: str | None = None,
+    bypass_cache: bool = False,
+    expand_playlists: bool = False,
+    include_transcript: bool = False,
+    include_metadata: bool = True,
+    ):
+    """
+        Summarizes many videos (BATCH_CONCURRENCY at a time) and streams NDJSON:
+            {"type": "item", "index", "url", "playlist_url", "ok", "result" | "error"}   (completion order)
+            {"type": "done", "total", "succeeded", "failed", "truncated", "input_tokens", "output_tokens"}
+        One failed video never fails the batch.
+    """
+    items = await _expand_batch_urls(youtube_urls, expand_playlists)
+    truncated = len(items) > BATCH_MAX_ITEMS
+    items = items[:BATCH_MAX_ITEMS]
+
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+    tasks = [
+        asyncio.ensure_future(_summarize_batch_item(
+            index, item, semaphore, summary_instruction, bypass_cache, include_transcript, include_metadata
+        ))
+        for index, item in enumerate(items)
+    ]
+    succeeded = input_tokens = output_tokens = 0
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            line = await next_done
+            if line["ok"]:
+                succeeded += 1
+                input_tokens += line["result"]["input_tokens"]
+                output_tokens += line["result"]["output_tokens"]
+            yield ndjson_line(line)
+    finally:
+        # client gone (generator closed): don't keep summarizing for nobody
+        for task in tasks:
+            task.cancel()
 
+    yield ndjson_line({
+        "type": "done",
+        "total": len(items),
+        "succeeded": succeeded,
+        "failed": len(items) - succeeded,
+        "truncated": truncated,
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+    })
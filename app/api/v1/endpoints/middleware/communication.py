@@ -7,6 +7,8 @@ from fastapi import Security, HTTPException, status
 from fastapi.security import APIKeyHeader
 import os
 
+from app.utils.rate_limit import set_tenant
+
 
 API_KEY_NAME = "X-Internal-API-Key"
 API_KEY = os.getenv("API_KEY")
@@ -16,7 +18,9 @@ api_key_header = APIKeyHeader(name=API_KEY_NAME, auto_error=False)
 
 async def get_api_key(api_key_header: str = Security(api_key_header)):
     if api_key_header == API_KEY:
-        return api_key_header  
+        # async on purpose: the LLM quota of the request is counted for this key
+        set_tenant(api_key_header)
+        return api_key_header
     raise HTTPException(
         status_code=status.HTTP_403_FORBIDDEN,
         detail="Invalid or missing API Key"
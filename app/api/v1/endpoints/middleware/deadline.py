@@ -0,0 +1,25 @@
+"""
+    Deadline of the request (app/utils/resilience.py), set when it arrives:
+    the endpoint default (SUMMARY_DEADLINE / QA_DEADLINE), or less when NestJS
+    sends how long it will wait for us in X-Request-Timeout (seconds).
+    The LLM calls of the request never run past it (504).
+"""
+from fastapi import Header
+
+from app.configs.llm import SUMMARY_DEADLINE, QA_DEADLINE
+from app.utils.resilience import set_deadline
+
+
+def _deadline_dependency(default_seconds: float):
+    async def request_deadline(x_request_timeout: float | None = Header(default=None, gt=0)):
+        # async on purpose: it runs in the request's own context, the endpoint
+        # (and the threads it starts) see the deadline
+        set_deadline(min(default_seconds, x_request_timeout or default_seconds))
+    return request_deadline
+
+
+summary_deadline = _deadline_dependency(SUMMARY_DEADLINE)
+qa_deadline = _deadline_dependency(QA_DEADLINE)
+
+# How to use it in an endpoint
+# @router.post("/ask-question", dependencies=[Depends(get_api_key), Depends(qa_deadline)])
@@ -0,0 +1,24 @@
+from .video import get_video_data, invalidate_video, cached_transcript_tokens, video_cache_stats
+from .summary import get_cached_summary, store_summary, invalidate_summaries, purge_stale_summaries, summary_cache_stats
+from .session_notes import store_session_notes
+from .transcripts import store_transcript, load_transcript, load_compressed_transcript
+from .answers import find_cached_answer, store_answer, answer_cache_stats
+
+__all__ = [
+    "get_video_data",
+    "invalidate_video",
+    "cached_transcript_tokens",
+    "video_cache_stats",
+    "get_cached_summary",
+    "store_summary",
+    "invalidate_summaries",
+    "purge_stale_summaries",
+    "summary_cache_stats",
+    "store_session_notes",
+    "store_transcript",
+    "load_transcript",
+    "load_compressed_transcript",
+    "find_cached_answer",
+    "store_answer",
+    "answer_cache_stats",
+]
@@ -0,0 +1,240 @@
+"""
+Semantic cache of the /ask-question answers.
+
+"what is docker?", "what's docker exactly?" and "explain docker" get the same
+answer, only the first one pays for an LLM call. The question is embedded with
+the retrieval embedder (app/retrieval/embedders.py, L2-normalized) and compared
+to the questions already answered with one matrix product, first in the chat
+session, then for the same video in any session (stricter threshold). Only
+answers of the same route (app/ai_agents/intent.py) are compared.
+
+The hashing embedder is lexical, so it embeds the question without the words
+that only say "define / explain this" (`_lexical_form`): "what's docker
+exactly?" -> "docker". Questions that lean on the chat history ("explain it
+more", "and why?") are not cached, their answer depends on the previous turn.
+
+Per scope ("session:{session_id}" or "video:{video_id}"):
+
+    {prefix}:{embedder}:{scope}:vectors  hash entry -> raw float32 question vector
+    {prefix}:{embedder}:{scope}:answers  hash entry -> JSON {"question", "answer", "llm_model", "route"}
+    {prefix}:{embedder}:{scope}:lru      zset entry -> last time it was stored / served
+
+entry = "{route}:{sha256(normalized question)}", the same question overwrites itself.
+Above ANSWER_CACHE_MAX_ENTRIES (ANSWER_CACHE_VIDEO_MAX_ENTRIES) the least recently
+used entries are dropped, every hit refreshes the TTL. Both are Lua scripts, so
+concurrent requests can't leave a vector without its answer.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import re
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+import redis
+
+from app.configs import get_redis_binary
+from app.configs.cache import (
+    ANSWER_CACHE_ENABLED,
+    ANSWER_CACHE_MIN_SIMILARITY,
+    ANSWER_CACHE_VIDEO_MIN_SIMILARITY,
+    ANSWER_CACHE_MIN_WORDS,
+    ANSWER_CACHE_MAX_ENTRIES,
+    ANSWER_CACHE_VIDEO_MAX_ENTRIES,
+    ANSWER_CACHE_TTL,
+    ANSWER_CACHE_KEY_PREFIX,
+)
+from app.retrieval import get_embedder
+from app.utils.concurrency import run_fetch
+from app.utils.metrics import span
+from .lru import CacheStats
+from .session_notes import load_session_video_id
+from .summary import normalize_instruction
+
+logger = logging.getLogger(__name__)
+
+answer_cache_stats = CacheStats("session_hits", "video_hits", "misses", "bypassed", "skipped")
+
+# KEYS: vectors, answers, lru. ARGV: entry, vector, payload, now, max entries, ttl
+_STORE = """
+redis.call('HSET', KEYS[1], ARGV[1], ARGV[2])
+redis.call('HSET', KEYS[2], ARGV[1], ARGV[3])
+redis.call('ZADD', KEYS[3], ARGV[4], ARGV[1])
+local over = redis.call('ZCARD', KEYS[3]) - tonumber(ARGV[5])
+if over > 0 then
+    local ids = redis.call('ZRANGE', KEYS[3], 0, over - 1)
+    redis.call('HDEL', KEYS[1], unpack(ids))
+    redis.call('HDEL', KEYS[2], unpack(ids))
+    redis.call('ZREM', KEYS[3], unpack(ids))
+end
+for i = 1, 3 do redis.call('EXPIRE', KEYS[i], ARGV[6]) end
+return over
+"""
+
+# KEYS: vectors, answers, lru. ARGV: entry, now, ttl
+_HIT = """
+local payload = redis.call('HGET', KEYS[2], ARGV[1])
+if not payload then return false end
+redis.call('ZADD', KEYS[3], 'XX', ARGV[2], ARGV[1])
+for i = 1, 3 do redis.call('EXPIRE', KEYS[i], ARGV[3]) end
+return payload
+"""
+
+_WORD_RE = re.compile(r"[^\W_]+", re.UNICODE)
+# "what is", "explain", "tell me about", "exactly"...: asking for the same thing.
+# why / how / when / where / who / which change the question, they stay
+_DEFINITION_WORDS = frozenset("""
+    a an the is are was were be s what whats do does did can could would you i me us
+    please exactly really actually just tell explain describe define definition meaning mean
+    means about know want to give
+    ما ماذا هو هي هل اشرح شرح عرف تعريف معنى يعني عن
+""".split())
+# the answer depends on the previous turns
+_HISTORY_WORDS = frozenset("""
+    it its this that these those they them more else another again same previous above
+    هذا هذه ذلك تلك اكثر أكثر ايضا أيضا
+""".split())
+_HISTORY_FIRST_WORDS = frozenset("and but so then also or و".split())
+
+_scripts: Dict[str, Any] = {}
+
+
+def _script(source: str):
+    # registered lazily, the redis client only exists once the app started
+    if source not in _scripts:
+        _scripts[source] = get_redis_binary().register_script(source)
+    return _scripts[source]
+
+
+def _keys(scope: str) -> List[str]:
+    # vectors of another embedder can't be compared, they get their own keys
+    embedder = get_embedder()
+    name = embedder.name if embedder.semantic else f"{embedder.name}-lexical"
+    base = f"{ANSWER_CACHE_KEY_PREFIX}:{name}:{scope}"
+    return [f"{base}:vectors", f"{base}:answers", f"{base}:lru"]
+
+
+def _words(question: str) -> List[str]:
+    # "what's" -> "what", "s"
+    return _WORD_RE.findall(question.casefold())
+
+
+def _needs_history(words: List[str]) -> bool:
+    return words[0] in _HISTORY_FIRST_WORDS or any(word in _HISTORY_WORDS for word in words)
+
+
+def _lexical_form(words: List[str]) -> str:
+    return " ".join(word for word in words if word not in _DEFINITION_WORDS)
+
+
+def _route_prefix(route: str | None) -> str:
+    return f"{route or 'agent'}:"
+
+
+def _entry_id(route: str | None, question: str) -> str:
+    digest = hashlib.sha256(normalize_instruction(question).encode("utf-8")).hexdigest()[:32]
+    return _route_prefix(route) + digest
+
+
+def _embed_question(text: str) -> np.ndarray:
+    with span("embed_question"):
+        return get_embedder().embed([text])[0]
+
+
+def _best_match(stored: Dict[bytes, bytes], prefix: str, vector: np.ndarray) -> tuple[bytes, float] | None:
+    prefix = prefix.encode()
+    entries = [(entry, data) for entry, data in stored.items() if entry.startswith(prefix)]
+    if not entries:
+        return None
+    matrix = np.frombuffer(b"".join(data for _, data in entries), dtype=np.float32)
+    if matrix.size != len(entries) * vector.size:
+        return None
+    scores = matrix.reshape(len(entries), vector.size) @ vector
+    best = int(np.argmax(scores))
+    return entries[best][0], float(scores[best])
+
+
+def _scopes(probe: Dict[str, Any]) -> List[tuple[str, float, int]]:
+    scopes = [(f"session:{probe['session_id']}", ANSWER_CACHE_MIN_SIMILARITY, ANSWER_CACHE_MAX_ENTRIES)]
+    if probe["video_id"]:
+        scopes.append((f"video:{probe['video_id']}", ANSWER_CACHE_VIDEO_MIN_SIMILARITY, ANSWER_CACHE_VIDEO_MAX_ENTRIES))
+    return scopes
+
+
+async def find_cached_answer(
+    session_id: str,
+    question: str,
+    route: str | None,
+    bypass_cache: bool = False,
+) -> tuple[Dict[str, Any] | None, Dict[str, Any] | None]:
+    """
+        (cached answer, probe):
+            cached answer  {"question", "answer", "llm_model", "route", "similarity"} or None
+            probe          pass it to store_answer() with the new answer, None when the
+                           question is not cacheable (cache off, too short, needs the history)
+        With bypass_cache the lookup is skipped but the new answer is still stored.
+    """
+    words = _words(question)
+    if not ANSWER_CACHE_ENABLED or len(words) < ANSWER_CACHE_MIN_WORDS or _needs_history(words):
+        answer_cache_stats.incr("skipped")
+        return None, None
+    text = question if get_embedder().semantic else _lexical_form(words)
+    if not text:
+        # only "what is this?"-like words, nothing to compare
+        answer_cache_stats.incr("skipped")
+        return None, None
+    # the embedding (cpu, off the loop) and the video lookup run together
+    vector, video_id = await asyncio.gather(run_fetch(_embed_question, text), load_session_video_id(session_id))
+    probe = {"session_id": session_id, "video_id": video_id, "question": question, "vector": vector}
+    if bypass_cache:
+        answer_cache_stats.incr("bypassed")
+        return None, probe
+
+    scopes = _scopes(probe)
+    prefix = _route_prefix(route)
+    try:
+        with span("redis_answer_cache"):
+            async with get_redis_binary().pipeline(transaction=False) as pipe:
+                for scope, _, _ in scopes:
+                    pipe.hgetall(_keys(scope)[0])
+                stored = await pipe.execute()
+            for (scope, min_similarity, _), vectors in zip(scopes, stored):
+                match = _best_match(vectors, prefix, vector)
+                if match is None or match[1] < min_similarity:
+                    continue
+                payload = await _script(_HIT)(keys=_keys(scope), args=[match[0], time.time(), ANSWER_CACHE_TTL])
+                if payload is None:
+                    # evicted in the meantime
+                    continue
+                answer_cache_stats.incr(f"{scope.split(':', 1)[0]}_hits")
+                return {**json.loads(payload), "similarity": round(match[1], 4)}, probe
+    except redis.exceptions.RedisError as e:
+        logger.warning("answer cache: redis lookup failed: %s", e)
+        return None, probe
+
+    answer_cache_stats.incr("misses")
+    return None, probe
+
+
+async def store_answer(probe: Dict[str, Any], answer: str, llm_model: str, route: str | None) -> None:
+    """
+        Stores the answer for the session and the video of the probe (best effort).
+    """
+    entry = _entry_id(route, probe["question"])
+    payload = json.dumps(
+        {"question": probe["question"], "answer": answer, "llm_model": llm_model, "route": route},
+        ensure_ascii=False,
+    )
+    vector = probe["vector"].astype(np.float32, copy=False).tobytes()
+    try:
+        with span("redis_answer_cache"):
+            for scope, _, max_entries in _scopes(probe):
+                await _script(_STORE)(
+                    keys=_keys(scope),
+                    args=[entry, vector, payload, time.time(), max_entries, ANSWER_CACHE_TTL],
+                )
+    except redis.exceptions.RedisError as e:
+        logger.warning("answer cache: redis store failed: %s", e)
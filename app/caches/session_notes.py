@@ -0,0 +1,68 @@
+"""
+What /summary produced for a chat session, so "re-summarize" / "rewrite the
+summary" in the chat doesn't send the whole transcript to the LLM again.
+
+    {session_id}-summary-notes -> JSON {"video_id", "summary_instruction", "summary", "sections"}
+
+`sections` are the notes of the map-reduce summary (long videos only): the
+whole video in order, in ~SUMMARY_CHUNK_TOKENS. Short videos only keep the
+summary, their transcript is small enough to be fetched when needed.
+
+    {session_id}-video-id -> video_id alone (the answer cache shares answers per video)
+"""
+
+import json
+import logging
+from typing import List
+
+import redis
+
+from app.configs import get_redis
+from app.configs.cache import SESSION_NOTES_TTL
+from app.utils.metrics import span
+
+logger = logging.getLogger(__name__)
+
+
+def session_notes_key(session_id: str) -> str:
+    return f"{session_id}-summary-notes"
+
+
+def session_video_key(session_id: str) -> str:
+    return f"{session_id}-video-id"
+
+
+async def store_session_notes(
+    session_id: str,
+    video_id: str,
+    summary: str,
+    sections: List[str] | None,
+    summary_instruction: str | None,
+) -> None:
+    payload = {
+        "video_id": video_id,
+        "summary_instruction": summary_instruction,
+        "summary": summary,
+        "sections": sections or [],
+    }
+    try:
+        with span("redis_session_notes"):
+            async with get_redis().pipeline(transaction=False) as pipe:
+                pipe.set(session_notes_key(session_id), json.dumps(payload, ensure_ascii=False), ex=SESSION_NOTES_TTL)
+                pipe.set(session_video_key(session_id), video_id, ex=SESSION_NOTES_TTL)
+                await pipe.execute()
+    except redis.exceptions.RedisError as e:
+        # the chat falls back to the full transcript
+        logger.warning("session notes: redis set failed: %s", e)
+
+
+async def load_session_video_id(session_id: str) -> str | None:
+    """
+        The video of the chat session (set by /summary), None if unknown or redis is down.
+    """
+    try:
+        with span("redis_session_notes"):
+            return await get_redis().get(session_video_key(session_id))
+    except redis.exceptions.RedisError as e:
+        logger.warning("session notes: redis get failed: %s", e)
+        return None
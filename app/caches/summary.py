@@ -0,0 +1,132 @@
+"""
+Content-addressed cache for generated summaries.
+
+gemini_llm runs with temperature=0, so the same transcript + instruction + model +
+prompt gives (practically) the same summary. The key is:
+
+    {prefix}:{prompt_version}:{model}:{video_id}:{sha256(normalized instruction)}
+
+SUMMARY_PROMPT_VERSION is a hash of the summary prompts and map-reduce sizes
+(app/ai_agents/prompts.py): editing them makes every old entry unreachable, the
+first worker started with the new version deletes them (`purge_stale_summaries()`,
+SUMMARY_CACHE_PURGE_STALE). `invalidate_summaries()` is also the admin helper
+to drop the summaries of one video.
+"""
+
+import hashlib
+import json
+import logging
+from typing import Any, Dict
+
+import redis
+
+from app.configs import get_redis
+from app.configs.cache import SUMMARY_CACHE_TTL, SUMMARY_CACHE_KEY_PREFIX, SUMMARY_CACHE_PURGE_STALE, SUMMARY_CACHE_PURGE_CLAIM_TTL
+from app.ai_agents.prompts import SUMMARY_PROMPT_VERSION
+from app.utils.metrics import span
+from .lru import CacheStats
+
+logger = logging.getLogger(__name__)
+
+summary_cache_stats = CacheStats("hits", "misses", "bypassed")
+
+
+def normalize_instruction(summary_instruction: str | None) -> str:
+    # "  Make it SHORT " and "make it short" are the same request
+    if not summary_instruction:
+        return ""
+    return " ".join(summary_instruction.split()).casefold()
+
+
+def summary_cache_key(video_id: str, summary_instruction: str | None, model: str) -> str:
+    instruction_hash = hashlib.sha256(normalize_instruction(summary_instruction).encode("utf-8")).hexdigest()[:32]
+    return f"{SUMMARY_CACHE_KEY_PREFIX}:{SUMMARY_PROMPT_VERSION}:{model}:{video_id}:{instruction_hash}"
+
+
+async def _redis_get(key: str) -> Dict[str, Any] | None:
+    try:
+        with span("redis_cache"):
+            data = await get_redis().get(key)
+    except redis.exceptions.RedisError as e:
+        logger.warning("summary cache: redis get failed: %s", e)
+        return None
+    return json.loads(data) if data else None
+
+
+async def _redis_set(key: str, payload: Dict[str, Any]) -> None:
+    try:
+        with span("redis_cache"):
+            await get_redis().set(key, json.dumps(payload, ensure_ascii=False), ex=SUMMARY_CACHE_TTL)
+    except redis.exceptions.RedisError as e:
+        logger.warning("summary cache: redis set failed: %s", e)
+
+
+async def get_cached_summary(video_id: str, summary_instruction: str | None, model: str) -> Dict[str, Any] | None:
+    """
+        Returns the stored {"summary", "llm_model", "sections"} payload or None
+        (entries older than the sections have no "sections").
+    """
+    payload = await _redis_get(summary_cache_key(video_id, summary_instruction, model))
+    summary_cache_stats.incr("hits" if payload else "misses")
+    return payload
+
+
+async def store_summary(
+    video_id: str,
+    summary_instruction: str | None,
+    model: str,
+    summary: str,
+    llm_model: str,
+    sections: list[str] | None = None,
+) -> None:
+    # the transcript/metadata are already in the video cache, don't store them twice
+    # (sections: map-reduce notes, a cache hit still has them for the session notes)
+    payload = {"summary": summary, "llm_model": llm_model, "sections": sections or []}
+    await _redis_set(summary_cache_key(video_id, summary_instruction, model), payload)
+
+
+async def invalidate_summaries(video_id: str | None = None, stale_only: bool = False) -> int:
+    """
+        Deletes cached summaries and returns how many keys were removed.
+        - video_id: only the summaries of this video (any instruction/model/version).
+        - stale_only: only entries made with an older SUMMARY_PROMPT_VERSION
+          (run it after changing the prompt template).
+    """
+    pattern = f"{SUMMARY_CACHE_KEY_PREFIX}:*:*:{video_id}:*" if video_id else f"{SUMMARY_CACHE_KEY_PREFIX}:*"
+    current_prefix = f"{SUMMARY_CACHE_KEY_PREFIX}:{SUMMARY_PROMPT_VERSION}:"
+    client = get_redis()
+    deleted = 0
+    batch = []
+    async for key in client.scan_iter(match=pattern, count=500):
+        if stale_only and key.startswith(current_prefix):
+            continue
+        batch.append(key)
+        if len(batch) >= 500:
+            deleted += await client.delete(*batch)
+            batch = []
+    if batch:
+        deleted += await client.delete(*batch)
+    return deleted
+
+
+async def purge_stale_summaries() -> None:
+    """
+        Startup, in the background: deletes the entries of older prompt versions.
+        A marker key makes it run once per version, not in every worker.
+    """
+    if not SUMMARY_CACHE_PURGE_STALE:
+        return
+    marker = f"{SUMMARY_CACHE_KEY_PREFIX}-purged:{SUMMARY_PROMPT_VERSION}"
+    client = get_redis()
+    try:
+        # short claim while it runs: if this worker fails or stops, the next one retries
+        if not await client.set(marker, "running", nx=True, ex=SUMMARY_CACHE_PURGE_CLAIM_TTL):
+            return
+        deleted = await invalidate_summaries(stale_only=True)
+        # done, after the TTL the old entries are gone anyway
+        await client.set(marker, "done", ex=SUMMARY_CACHE_TTL)
+    except redis.exceptions.RedisError as e:
+        logger.warning("summary cache: stale entries not purged: %s", e)
+        return
+    if deleted:
+        logger.info("summary cache: %s entries of older prompt versions deleted", deleted)
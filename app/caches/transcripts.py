@@ -0,0 +1,97 @@
+"""
+Transcripts stored server-side, so /summary can answer with a small reference
+instead of the full text (SummaryRequest.transcript_by_reference).
+
+Content-addressed: the id is the sha256 of the utf-8 text, storing the same
+transcript again only refreshes the ttl. One redis hash per transcript:
+
+    {prefix}:{sha256}
+        data        -> compressed utf-8 text
+        encoding    -> codec of `data` (gzip | zstd)
+        size_bytes  -> size of the uncompressed text
+"""
+
+import hashlib
+import logging
+from typing import Any, Dict, Tuple
+
+import redis
+
+from app.configs import get_redis_binary
+from app.configs.cache import TRANSCRIPT_STORE_TTL, TRANSCRIPT_STORE_KEY_PREFIX
+from app.configs.compression import TRANSCRIPT_COMPRESSION, TRANSCRIPT_COMPRESSION_LEVEL
+from app.utils.compression import compress, decompress, resolve_codec
+from app.utils.concurrency import run_fetch
+from app.utils.metrics import span
+
+logger = logging.getLogger(__name__)
+
+
+def transcript_key(transcript_id: str) -> str:
+    return f"{TRANSCRIPT_STORE_KEY_PREFIX}:{transcript_id}"
+
+
+def _compress(raw: bytes) -> Tuple[bytes, str]:
+    codec = resolve_codec(TRANSCRIPT_COMPRESSION)
+    return compress(raw, codec, TRANSCRIPT_COMPRESSION_LEVEL), codec
+
+
+async def store_transcript(text: str) -> Dict[str, Any]:
+    """
+        Stores the transcript (if it's not there yet) and returns its reference:
+        {"transcript_id", "size_bytes", "compressed_bytes", "encoding"}.
+        Raises redis errors: a reference to nothing is worse than no reference.
+    """
+    raw = text.encode("utf-8")
+    # sha256 is ~0.5 ms for a 3h transcript, ok on the loop
+    transcript_id = hashlib.sha256(raw).hexdigest()
+    key = transcript_key(transcript_id)
+    client = get_redis_binary()
+    with span("redis_transcript"):
+        # already stored (same video, other session): keep it, refresh the ttl
+        exists = await client.expire(key, TRANSCRIPT_STORE_TTL)
+        if exists:
+            # may have been written with another codec (TRANSCRIPT_COMPRESSION changed)
+            async with client.pipeline(transaction=False) as pipe:
+                pipe.hget(key, "encoding")
+                pipe.hstrlen(key, "data")
+                stored_codec, compressed_bytes = await pipe.execute()
+            codec = stored_codec.decode()
+    if not exists:
+        # compressing is a few ms of cpu, off the event loop
+        data, codec = await run_fetch(_compress, raw)
+        compressed_bytes = len(data)
+        with span("redis_transcript"):
+            async with client.pipeline(transaction=True) as pipe:
+                pipe.hset(key, mapping={"data": data, "encoding": codec, "size_bytes": len(raw)})
+                pipe.expire(key, TRANSCRIPT_STORE_TTL)
+                await pipe.execute()
+    return {
+        "transcript_id": transcript_id,
+        "size_bytes": len(raw),
+        "compressed_bytes": compressed_bytes,
+        "encoding": codec,
+    }
+
+
+async def load_compressed_transcript(transcript_id: str) -> Tuple[bytes, str] | None:
+    """
+        (compressed bytes, encoding) as stored, or None if unknown / expired.
+    """
+    try:
+        with span("redis_transcript"):
+            data, codec = await get_redis_binary().hmget(transcript_key(transcript_id), "data", "encoding")
+    except redis.exceptions.RedisError as e:
+        logger.warning("transcript store: redis get failed: %s", e)
+        return None
+    if data is None:
+        return None
+    return data, codec.decode()
+
+
+async def load_transcript(transcript_id: str) -> str | None:
+    stored = await load_compressed_transcript(transcript_id)
+    if stored is None:
+        return None
+    data, codec = stored
+    return decompress(data, codec).decode("utf-8")
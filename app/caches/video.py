@@ -0,0 +1,195 @@
+"""
+Two-tier cache in front of `get_video_metadata_transcript`, keyed by video_id.
+
+    L1: in-process LRU (size + TTL eviction)
+    L2: redis (shared between workers/pods)
+
+Concurrent misses for the same video collapse into one fetch (single-flight).
+Transcript-only entries (include_metadata=False, no yt-dlp) are stored under the
+same key but only serve transcript-only lookups, a full entry serves both.
+"Transcripts disabled / not found" results are cached for a shorter time,
+other failures (network, metadata errors) are never cached.
+
+In redis the transcript text is not part of the JSON: the timestamped segments
+(`TranscriptSegments`, whose buffer is the text) go to a binary key next to it
+
+    {prefix}:{video_id}           -> JSON, transcript without "text" / "segments"
+    {prefix}:{video_id}:segments  -> TranscriptSegments.to_bytes()
+"""
+
+import json
+import logging
+from typing import Any, Callable, Dict
+
+import redis
+
+from app.configs import get_redis, get_redis_binary
+from app.configs.cache import (
+    VIDEO_CACHE_MAX_ENTRIES,
+    VIDEO_CACHE_MEMORY_TTL,
+    VIDEO_CACHE_REDIS_TTL,
+    VIDEO_CACHE_NEGATIVE_TTL,
+    VIDEO_CACHE_KEY_PREFIX,
+)
+from app.utils.concurrency import run_fetch
+from app.utils.metrics import span
+from app.utils.tokens import estimate_tokens
+from app.utils.transcript_segments import TranscriptSegments
+from app.utils.youtube import (
+    get_video_metadata_transcript,
+    extract_video_id,
+    TRANSCRIPTS_DISABLED_ERROR,
+    NO_TRANSCRIPT_ERROR,
+)
+from .lru import TTLCache, SingleFlight, CacheStats
+
+logger = logging.getLogger(__name__)
+
+_PERMANENT_TRANSCRIPT_ERRORS = {TRANSCRIPTS_DISABLED_ERROR, NO_TRANSCRIPT_ERROR}
+
+_memory_cache = TTLCache(VIDEO_CACHE_MAX_ENTRIES)
+_single_flight = SingleFlight()
+video_cache_stats = CacheStats("memory_hits", "redis_hits", "misses", "coalesced", "uncacheable")
+
+
+def _redis_key(video_id: str) -> str:
+    return f"{VIDEO_CACHE_KEY_PREFIX}:{video_id}"
+
+
+def _segments_key(video_id: str) -> str:
+    return f"{VIDEO_CACHE_KEY_PREFIX}:{video_id}:segments"
+
+
+def _ttls_for(video_data: Dict[str, Any]) -> tuple[int, int] | None:
+    """
+        Returns (memory_ttl, redis_ttl) or None if the result must not be cached.
+    """
+    if video_data["metadata_error"]:
+        return None
+    if video_data["transcript_error"]:
+        if video_data["transcript_error"] not in _PERMANENT_TRANSCRIPT_ERRORS:
+            return None
+        ttl = VIDEO_CACHE_NEGATIVE_TTL
+        return min(ttl, VIDEO_CACHE_MEMORY_TTL), ttl
+    return VIDEO_CACHE_MEMORY_TTL, VIDEO_CACHE_REDIS_TTL
+
+
+async def _redis_get(video_id: str) -> Dict[str, Any] | None:
+    try:
+        with span("redis_cache"):
+            data = await get_redis().get(_redis_key(video_id))
+            if not data:
+                return None
+            video_data = json.loads(data)
+            if video_data["transcript"] is None:
+                return video_data
+            blob = await get_redis_binary().get(_segments_key(video_id))
+    except redis.exceptions.RedisError as e:
+        # cache is best effort, a redis problem must not fail the request
+        logger.warning("video cache: redis get failed: %s", e)
+        return None
+    if blob is None:
+        # the two keys expire together, a lonely JSON is a half written entry
+        return None
+    segments = TranscriptSegments.from_bytes(blob)
+    video_data["transcript"]["segments"] = segments
+    video_data["transcript"]["text"] = segments.text
+    return video_data
+
+
+async def _redis_set(video_id: str, video_data: Dict[str, Any], ttl: int) -> None:
+    transcript = video_data["transcript"]
+    stored = dict(video_data)
+    if transcript is not None:
+        stored["transcript"] = {k: v for k, v in transcript.items() if k not in ("text", "segments")}
+    try:
+        with span("redis_cache"):
+            # segments first: a reader never finds the JSON without them
+            if transcript is not None:
+                await get_redis_binary().set(_segments_key(video_id), transcript["segments"].to_bytes(), ex=ttl)
+            await get_redis().set(_redis_key(video_id), json.dumps(stored, ensure_ascii=False), ex=ttl)
+    except redis.exceptions.RedisError as e:
+        logger.warning("video cache: redis set failed: %s", e)
+
+
+def _serves(video_data: Dict[str, Any] | None, include_metadata: bool) -> bool:
+    return video_data is not None and (not include_metadata or not video_data.get("metadata_skipped"))
+
+
+async def _load(
+    url: str,
+    video_id: str,
+    include_metadata: bool,
+    on_metadata: Callable[[Dict[str, Any]], None] | None,
+) -> Dict[str, Any]:
+    video_data = await _redis_get(video_id)
+    if _serves(video_data, include_metadata):
+        video_cache_stats.incr("redis_hits")
+        # the remaining redis ttl is unknown here, so keep it in memory for the short ttl only
+        memory_ttl = VIDEO_CACHE_NEGATIVE_TTL if video_data["transcript_error"] else VIDEO_CACHE_MEMORY_TTL
+        _memory_cache.set(video_id, video_data, min(memory_ttl, VIDEO_CACHE_MEMORY_TTL))
+        return video_data
+
+    video_cache_stats.incr("misses")
+    video_data = await run_fetch(get_video_metadata_transcript, url, include_metadata, on_metadata)
+    if not include_metadata:
+        video_data["metadata_skipped"] = True
+
+    ttls = _ttls_for(video_data)
+    if ttls is None:
+        video_cache_stats.incr("uncacheable")
+        return video_data
+
+    memory_ttl, redis_ttl = ttls
+    _memory_cache.set(video_id, video_data, memory_ttl)
+    await _redis_set(video_id, video_data, redis_ttl)
+    return video_data
+
+
+async def get_video_data(
+    url: str,
+    include_metadata: bool = True,
+    on_metadata: Callable[[Dict[str, Any]], None] | None = None,
+) -> Dict[str, Any]:
+    """
+        Cached version of `get_video_metadata_transcript` (same return shape).
+        on_metadata is passed to the fetch (called from the fetch thread) on a
+        miss only: cache hits and callers joining another request's fetch just
+        get the full result.
+    """
+    video_id = extract_video_id(url)
+    if video_id is None:
+        # can't build a key without the network, let yt-dlp validate it
+        video_cache_stats.incr("misses")
+        return await run_fetch(get_video_metadata_transcript, url, include_metadata, on_metadata)
+
+    video_data = _memory_cache.get(video_id)
+    if _serves(video_data, include_metadata):
+        video_cache_stats.incr("memory_hits")
+        return video_data
+
+    # a transcript-only fetch can't answer a full request, they don't share a flight
+    flight_key = video_id if include_metadata else f"{video_id}:transcript"
+    if _single_flight.in_flight(flight_key):
+        video_cache_stats.incr("coalesced")
+    return await _single_flight.do(flight_key, lambda: _load(url, video_id, include_metadata, on_metadata))
+
+
+def cached_transcript_tokens(video_id: str) -> int | None:
+    """
+        Estimated tokens of the transcript when the video is in the in-process
+        cache (no I/O, admission control runs it before the request).
+    """
+    video_data = _memory_cache.get(video_id)
+    if video_data is None or not video_data["transcript"]:
+        return None
+    return estimate_tokens(video_data["transcript"]["text"])
+
+
+async def invalidate_video(video_id: str) -> None:
+    _memory_cache.delete(video_id)
+    try:
+        await get_redis().delete(_redis_key(video_id))
+        await get_redis_binary().delete(_segments_key(video_id))
+    except redis.exceptions.RedisError as e:
+        logger.warning("video cache: redis delete failed: %s", e)
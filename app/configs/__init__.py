@@ -1,2 +1,17 @@
-from .ai_agent import gemini_llm
-from .redis import redis_client
+from .ai_agent import get_llm, get_gemini_llm, model_key, GEMINI_MODEL
+from .redis import (
+    init_redis,
+    close_redis,
+    get_redis,
+    get_redis_binary,
+    run_redis_sync,
+    redis_health,
+    redis_pool_stats,
+)
+
+
+def __getattr__(name):
+    # `from app.configs import gemini_llm` still works, but builds the LLM (imports crewai)
+    if name == "gemini_llm":
+        return get_gemini_llm()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
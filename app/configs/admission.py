@@ -0,0 +1,32 @@
+import os
+
+# --- admission control of the AI endpoints (app/utils/admission.py) ---
+# per worker process. Work above these limits is refused right away with
+# 503 + Retry-After instead of piling up (memory, latency of every request)
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+# requests running at the same time: all AI endpoints / summaries (+ stream, batch) / questions
+ADMISSION_MAX_IN_FLIGHT = int(os.getenv("ADMISSION_MAX_IN_FLIGHT", "64"))
+ADMISSION_SUMMARY_MAX_IN_FLIGHT = int(os.getenv("ADMISSION_SUMMARY_MAX_IN_FLIGHT", "16"))
+ADMISSION_QA_MAX_IN_FLIGHT = int(os.getenv("ADMISSION_QA_MAX_IN_FLIGHT", "64"))
+# requests waiting for a slot, the next ones are refused. A freed slot goes to a
+# waiting question before a waiting summary
+ADMISSION_SUMMARY_MAX_QUEUE = int(os.getenv("ADMISSION_SUMMARY_MAX_QUEUE", "16"))
+ADMISSION_QA_MAX_QUEUE = int(os.getenv("ADMISSION_QA_MAX_QUEUE", "64"))
+# seconds a request may wait for its slot (less if X-Request-Timeout says so)
+ADMISSION_MAX_QUEUE_WAIT = float(os.getenv("ADMISSION_MAX_QUEUE_WAIT", "5"))
+
+# --- cost: estimated tokens of the running + waiting work (~ the memory it holds) ---
+ADMISSION_MAX_COST_TOKENS = int(os.getenv("ADMISSION_MAX_COST_TOKENS", "2000000"))
+# summaries can only use this share of it, the rest is kept for the questions
+ADMISSION_SUMMARY_COST_SHARE = float(os.getenv("ADMISSION_SUMMARY_COST_SHARE", "0.75"))
+# a summary of a video whose transcript is not in the in-process cache yet
+ADMISSION_SUMMARY_DEFAULT_TOKENS = int(os.getenv("ADMISSION_SUMMARY_DEFAULT_TOKENS", "10000"))
+# a question: this + the size of the request body (context chunks, history)
+ADMISSION_QA_BASE_TOKENS = int(os.getenv("ADMISSION_QA_BASE_TOKENS", "1500"))
+# summary bodies bigger than this are not parsed to find the video
+ADMISSION_MAX_BODY_PEEK = int(os.getenv("ADMISSION_MAX_BODY_PEEK", "65536"))
+# Retry-After (seconds) is estimated from the recent durations, within [1, this]
+ADMISSION_MAX_RETRY_AFTER = int(os.getenv("ADMISSION_MAX_RETRY_AFTER", "60"))
+
+if not 0 < ADMISSION_SUMMARY_COST_SHARE <= 1:
+    raise ValueError("ADMISSION_SUMMARY_COST_SHARE must be between 0 and 1.")
@@ -1,11 +1,42 @@
-from crewai import LLM
 import os
+from functools import lru_cache
+
+from .llm import LLM_ATTEMPT_TIMEOUT
+
 # Load API Key from environment variable
 api_key = os.getenv("GOOGLE_API_KEY")
 if not api_key:
     raise ValueError("GOOGLE_API_KEY not found in environment variables.")
 
-# Initialize the LLM for crewai
-gemini_llm = LLM(model="gemini/gemini-2.5-flash-lite", temperature=0, api_key=api_key)
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini/gemini-2.5-flash-lite")
+
+
+def model_key(model: str) -> str:
+    """
+        Name of a model in the breakers, latencies, quotas and metrics. crewai
+        drops the provider prefix from llm.model ("gemini/gemini-2.5-flash" =>
+        "gemini-2.5-flash"), the configured names have it: both give the same key.
+    """
+    return model.split("/", 1)[-1]
+
+
+@lru_cache(maxsize=None)
+def get_llm(model: str):
+    """
+        The LLM for crewai of one model, built on first use (importing crewai takes
+        seconds, the app lifespan does it in a background warm-up). One instance
+        per model: the agent pools are keyed by it (app/ai_agents/factory.py).
+    """
+    from crewai import LLM
+    return LLM(
+        model=model,
+        temperature=0,
+        api_key=api_key,
+        # ms, a hung call must free its thread (app/ai_agents/invoke.py stops waiting anyway)
+        client_params={"http_options": {"timeout": int(LLM_ATTEMPT_TIMEOUT * 1000)}},
+    )
 
 
+def get_gemini_llm():
+    # the default model (GEMINI_MODEL), app/ai_agents/routing.py picks the others
+    return get_llm(GEMINI_MODEL)
@@ -0,0 +1,47 @@
+import os
+
+# --- video metadata + transcript cache (keyed by video_id) ---
+# L1: in-process LRU, L2: redis
+VIDEO_CACHE_MAX_ENTRIES = int(os.getenv("VIDEO_CACHE_MAX_ENTRIES", "256"))
+VIDEO_CACHE_MEMORY_TTL = int(os.getenv("VIDEO_CACHE_MEMORY_TTL", "600"))  # seconds
+VIDEO_CACHE_REDIS_TTL = int(os.getenv("VIDEO_CACHE_REDIS_TTL", str(24 * 60 * 60)))
+# "transcripts disabled" / "no transcript" results, uploader may still add captions later
+VIDEO_CACHE_NEGATIVE_TTL = int(os.getenv("VIDEO_CACHE_NEGATIVE_TTL", "300"))
+VIDEO_CACHE_KEY_PREFIX = os.getenv("VIDEO_CACHE_KEY_PREFIX", "ai:video")
+
+# --- summary result cache (video_id + instruction + model + prompt version) ---
+SUMMARY_CACHE_TTL = int(os.getenv("SUMMARY_CACHE_TTL", str(7 * 24 * 60 * 60)))
+SUMMARY_CACHE_KEY_PREFIX = os.getenv("SUMMARY_CACHE_KEY_PREFIX", "ai:summary")
+# at startup, delete the summaries of older SUMMARY_PROMPT_VERSIONs (once per
+# version, in the background) instead of leaving them until their TTL
+SUMMARY_CACHE_PURGE_STALE = os.getenv("SUMMARY_CACHE_PURGE_STALE", "true").lower() == "true"
+# how long a running purge keeps the other workers out, a failed one is retried after it
+SUMMARY_CACHE_PURGE_CLAIM_TTL = int(os.getenv("SUMMARY_CACHE_PURGE_CLAIM_TTL", "300"))  # seconds
+
+# --- transcripts stored server-side (SummaryRequest.transcript_by_reference) ---
+# content-addressed (sha256 of the text), every session of the same video shares the entry
+TRANSCRIPT_STORE_TTL = int(os.getenv("TRANSCRIPT_STORE_TTL", str(7 * 24 * 60 * 60)))
+TRANSCRIPT_STORE_KEY_PREFIX = os.getenv("TRANSCRIPT_STORE_KEY_PREFIX", "ai:transcript")
+
+# --- summary notes of a chat session (re-summarize / rewrite from the chat) ---
+SESSION_NOTES_TTL = int(os.getenv("SESSION_NOTES_TTL", str(7 * 24 * 60 * 60)))
+
+# --- answer cache of /ask-question (app/caches/answers.py) ---
+# a question close enough to one already answered in the same chat session, or for
+# the same video in any session, gets the stored answer without an LLM call
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+# min cosine similarity of the questions (retrieval embedder, EMBEDDER). Other
+# sessions have another history, their answers need a closer question
+ANSWER_CACHE_MIN_SIMILARITY = float(os.getenv("ANSWER_CACHE_MIN_SIMILARITY", "0.92"))
+ANSWER_CACHE_VIDEO_MIN_SIMILARITY = float(os.getenv("ANSWER_CACHE_VIDEO_MIN_SIMILARITY", "0.95"))
+# shorter questions ("why?") only make sense with the chat history
+ANSWER_CACHE_MIN_WORDS = int(os.getenv("ANSWER_CACHE_MIN_WORDS", "2"))
+# answers kept per session / per video, the least recently used go first
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "64"))
+ANSWER_CACHE_VIDEO_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_VIDEO_MAX_ENTRIES", "128"))
+# refreshed on every hit
+ANSWER_CACHE_TTL = int(os.getenv("ANSWER_CACHE_TTL", str(24 * 60 * 60)))
+ANSWER_CACHE_KEY_PREFIX = os.getenv("ANSWER_CACHE_KEY_PREFIX", "ai:answers")
+
+if not 0 < ANSWER_CACHE_MIN_SIMILARITY <= 1 or not 0 < ANSWER_CACHE_VIDEO_MIN_SIMILARITY <= 1:
+    raise ValueError("ANSWER_CACHE_MIN_SIMILARITY and ANSWER_CACHE_VIDEO_MIN_SIMILARITY must be between 0 and 1.")
@@ -0,0 +1,19 @@
+import os
+
+from starlette.middleware.gzip import DEFAULT_EXCLUDED_CONTENT_TYPES
+
+from app.utils.ndjson import NDJSON_MEDIA_TYPE
+
+# --- stored transcripts ---
+# "zstd" needs `pip install zstandard`, falls back to "gzip" when it's missing
+TRANSCRIPT_COMPRESSION = os.getenv("TRANSCRIPT_COMPRESSION", "zstd")
+TRANSCRIPT_COMPRESSION_LEVEL = int(os.getenv("TRANSCRIPT_COMPRESSION_LEVEL", "6"))
+
+# --- http responses (Accept-Encoding: gzip) ---
+RESPONSE_GZIP_ENABLED = os.getenv("RESPONSE_GZIP_ENABLED", "true").lower() == "true"
+# smaller bodies cost more cpu than they save bytes
+RESPONSE_GZIP_MIN_SIZE = int(os.getenv("RESPONSE_GZIP_MIN_SIZE", "1024"))
+# starlette's default (9) is ~3x slower than 6 for ~2% smaller transcripts
+RESPONSE_GZIP_LEVEL = int(os.getenv("RESPONSE_GZIP_LEVEL", "6"))
+# streams must reach the client line by line, gzip would buffer them
+RESPONSE_GZIP_EXCLUDED_TYPES = (*DEFAULT_EXCLUDED_CONTENT_TYPES, NDJSON_MEDIA_TYPE)
@@ -0,0 +1,29 @@
+import os
+
+# Blocking work (yt-dlp / transcript api / Crew.kickoff) never runs on the event loop,
+# it goes to one of these thread pools. Each stage has its own pool so a burst of slow
+# LLM calls can't starve the (much cheaper) YouTube fetches and the other way around.
+FETCH_MAX_WORKERS = int(os.getenv("FETCH_MAX_WORKERS", "16"))
+LLM_MAX_WORKERS = int(os.getenv("LLM_MAX_WORKERS", "32"))
+
+# How many calls of each stage may run at the same time (per worker process).
+# Requests above the limit wait on the event loop (cheap) and not inside the pool,
+# so a client that disconnects while waiting never occupies a thread.
+FETCH_CONCURRENCY = int(os.getenv("FETCH_CONCURRENCY", str(FETCH_MAX_WORKERS)))
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", str(LLM_MAX_WORKERS)))
+
+# how often (seconds) we check if the client is still connected
+DISCONNECT_POLL_INTERVAL = float(os.getenv("DISCONNECT_POLL_INTERVAL", "0.5"))
+
+if FETCH_CONCURRENCY > FETCH_MAX_WORKERS or LLM_CONCURRENCY > LLM_MAX_WORKERS:
+    raise ValueError("Stage concurrency can't be bigger than the executor size.")
+
+# idle CrewAI agents kept per agent kind + LLM (app/ai_agents/factory.py),
+# more than LLM_CONCURRENCY can never be busy at the same time
+AGENT_POOL_MAX_IDLE = int(os.getenv("AGENT_POOL_MAX_IDLE", str(LLM_CONCURRENCY)))
+
+# /summary/batch: videos summarized at the same time for ONE batch request (the
+# fetch/LLM limits above still apply on top), and max videos per batch
+# (after playlist expansion)
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "50"))
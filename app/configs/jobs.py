@@ -0,0 +1,29 @@
+import os
+
+# --- background summary jobs (app/jobs) ---
+# "redis": shared queue, consumed by `python -m app.jobs.worker` processes
+# "memory": in-process queue (tests / local dev), consumed inside the API process
+JOBS_BACKEND = os.getenv("JOBS_BACKEND", "redis").lower()
+JOBS_KEY_PREFIX = os.getenv("JOBS_KEY_PREFIX", "ai:jobs")
+
+# a failed job (network / LLM error, worker died) is tried this many times in total
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+# seconds before a retry, multiplied by the attempt number
+JOB_RETRY_BACKOFF = float(os.getenv("JOB_RETRY_BACKOFF", "5"))
+# a running job that isn't heartbeated for this long is given to another worker
+JOB_VISIBILITY_TIMEOUT = float(os.getenv("JOB_VISIBILITY_TIMEOUT", "120"))
+# how long finished jobs (and their SummaryResponse) can be polled
+JOB_RESULT_TTL = int(os.getenv("JOB_RESULT_TTL", str(24 * 60 * 60)))
+
+# worker processes started by `python -m app.jobs.worker` and jobs run at the same time by each
+JOB_WORKER_PROCESSES = int(os.getenv("JOB_WORKER_PROCESSES", "2"))
+JOB_WORKER_CONCURRENCY = int(os.getenv("JOB_WORKER_CONCURRENCY", "4"))
+# jobs run inside the API process (needed by the memory backend, 0 = none)
+JOB_INLINE_CONCURRENCY = int(os.getenv(
+    "JOB_INLINE_CONCURRENCY", str(JOB_WORKER_CONCURRENCY if JOBS_BACKEND == "memory" else 0)
+))
+# seconds an idle worker waits before polling the queue again
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "0.5"))
+
+if JOBS_BACKEND not in ("redis", "memory"):
+    raise ValueError("JOBS_BACKEND must be 'redis' or 'memory'.")
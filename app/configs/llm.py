@@ -0,0 +1,46 @@
+import os
+
+# --- deadlines (app/utils/resilience.py) ---
+# seconds a request may spend in total, counted from when it arrives. NestJS can ask
+# for less with the X-Request-Timeout header (seconds), never for more. LLM calls
+# never start (or keep being waited for) past the deadline => 504
+SUMMARY_DEADLINE = float(os.getenv("SUMMARY_DEADLINE", "300"))
+QA_DEADLINE = float(os.getenv("QA_DEADLINE", "60"))
+
+# --- one LLM call (app/ai_agents/invoke.py) ---
+# http timeout of the Gemini client, so a hung call always frees its thread
+LLM_ATTEMPT_TIMEOUT = float(os.getenv("LLM_ATTEMPT_TIMEOUT", "120"))
+# retryable errors (429, 5xx, timeouts, connection errors) are retried with
+# exponential backoff + full jitter, as long as the deadline leaves time for it
+LLM_MAX_ATTEMPTS = int(os.getenv("LLM_MAX_ATTEMPTS", "3"))
+LLM_RETRY_BASE_DELAY = float(os.getenv("LLM_RETRY_BASE_DELAY", "0.5"))
+LLM_RETRY_MAX_DELAY = float(os.getenv("LLM_RETRY_MAX_DELAY", "8"))
+
+# --- hedging ---
+# a call slower than this percentile of the recent calls (same agent) gets an
+# identical backup call, the first one to answer wins. Streaming calls are never hedged
+LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "true").lower() == "true"
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "0.95"))
+# never hedge before this many seconds, nor before we know enough latencies
+LLM_HEDGE_MIN_DELAY = float(os.getenv("LLM_HEDGE_MIN_DELAY", "1"))
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+# recent latencies kept per agent
+LLM_HEDGE_WINDOW = int(os.getenv("LLM_HEDGE_WINDOW", "200"))
+# backups can't be more than this share of the calls (each one costs tokens)
+LLM_HEDGE_MAX_RATIO = float(os.getenv("LLM_HEDGE_MAX_RATIO", "0.1"))
+
+# --- circuit breaker (one per model) ---
+# opens when at least LLM_BREAKER_ERROR_RATE of the calls of the last
+# LLM_BREAKER_WINDOW seconds failed (and there were LLM_BREAKER_MIN_CALLS of them).
+# While open every call fails right away (503), after LLM_BREAKER_OPEN_SECONDS one
+# probe call is let through: ok => closed again, failed => open again
+LLM_BREAKER_ENABLED = os.getenv("LLM_BREAKER_ENABLED", "true").lower() == "true"
+LLM_BREAKER_WINDOW = float(os.getenv("LLM_BREAKER_WINDOW", "30"))
+LLM_BREAKER_MIN_CALLS = int(os.getenv("LLM_BREAKER_MIN_CALLS", "10"))
+LLM_BREAKER_ERROR_RATE = float(os.getenv("LLM_BREAKER_ERROR_RATE", "0.5"))
+LLM_BREAKER_OPEN_SECONDS = float(os.getenv("LLM_BREAKER_OPEN_SECONDS", "20"))
+
+if LLM_MAX_ATTEMPTS < 1:
+    raise ValueError("LLM_MAX_ATTEMPTS must be at least 1.")
+if not 0 < LLM_HEDGE_PERCENTILE < 1 or not 0 < LLM_BREAKER_ERROR_RATE <= 1:
+    raise ValueError("LLM_HEDGE_PERCENTILE and LLM_BREAKER_ERROR_RATE must be between 0 and 1.")
@@ -0,0 +1,12 @@
+import os
+
+# Prometheus metrics on GET /metrics (app/utils/metrics.py)
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+# one JSON log line per request with the timing of every stage (logger "app.metrics")
+METRICS_LOG_SPANS = os.getenv("METRICS_LOG_SPANS", "false").lower() in ("1", "true", "yes")
+# histogram buckets (seconds), from a redis GET to a map-reduce summary
+METRICS_BUCKETS = tuple(
+    float(bucket) for bucket in os.getenv(
+        "METRICS_BUCKETS", "0.001,0.005,0.01,0.025,0.05,0.1,0.25,0.5,1,2.5,5,10,30,60,120"
+    ).split(",")
+)
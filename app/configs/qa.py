@@ -0,0 +1,32 @@
+import os
+
+# max estimated tokens of the whole /ask-question prompt (instructions + context +
+# history + question), the context and the history are trimmed to fit
+QA_PROMPT_TOKEN_BUDGET = int(os.getenv("QA_PROMPT_TOKEN_BUDGET", "6000"))
+# the history can't take more than this share of what's left after the fixed parts,
+# unless the context doesn't need it
+QA_HISTORY_MAX_SHARE = float(os.getenv("QA_HISTORY_MAX_SHARE", "0.35"))
+# two chunks sharing at least this many words (end of one == start of the other)
+# are merged into one
+QA_MIN_OVERLAP_WORDS = int(os.getenv("QA_MIN_OVERLAP_WORDS", "6"))
+# the last chunk that doesn't fit is cut, unless less than this would be left of it
+QA_MIN_CHUNK_TOKENS = int(os.getenv("QA_MIN_CHUNK_TOKENS", "40"))
+
+if not 0 <= QA_HISTORY_MAX_SHARE <= 1:
+    raise ValueError("QA_HISTORY_MAX_SHARE must be between 0 and 1.")
+
+# --- intent router (app/ai_agents/intent.py) ---
+# routes every question (summarize / qa / out_of_scope) before the LLM, each route
+# gets its own small prompt without tools. false => the agent decides with its tools
+INTENT_ROUTER_ENABLED = os.getenv("INTENT_ROUTER_ENABLED", "true").lower() == "true"
+# "" => rules only, "embedding" => questions the rules don't catch are compared to
+# example questions with the retrieval embedder (EMBEDDER)
+INTENT_MODEL = os.getenv("INTENT_MODEL", "")
+# min cosine similarity to an example for the model to decide, below => qa
+INTENT_MODEL_MIN_SIMILARITY = float(os.getenv("INTENT_MODEL_MIN_SIMILARITY", "0.45"))
+# summarize route of a session without the NestJS transcript key: max seconds to get
+# the transcript from the video cache (fetched again, transcript only, if it expired)
+RESUMMARIZE_TRANSCRIPT_TIMEOUT = float(os.getenv("RESUMMARIZE_TRANSCRIPT_TIMEOUT", "30"))
+
+if INTENT_MODEL not in ("", "embedding"):
+    raise ValueError("INTENT_MODEL must be '' or 'embedding'.")
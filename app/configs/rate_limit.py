@@ -0,0 +1,45 @@
+import os
+
+from .ai_agent import model_key
+
+# --- Gemini quota (app/utils/rate_limit.py) ---
+# token buckets shared by every worker / pod through redis: requests per minute and
+# tokens per minute of each model, checked before every LLM call (retries and
+# hedges included). false => calls go straight to the provider
+LLM_RATE_LIMIT_ENABLED = os.getenv("LLM_RATE_LIMIT_ENABLED", "true").lower() == "true"
+LLM_RATE_RPM = float(os.getenv("LLM_RATE_RPM", "1000"))
+LLM_RATE_TPM = float(os.getenv("LLM_RATE_TPM", "1000000"))
+# per model quotas, "model=rpm:tpm,model=rpm:tpm" (models not listed: LLM_RATE_RPM / LLM_RATE_TPM),
+# with or without the "gemini/" prefix
+LLM_RATE_MODEL_LIMITS = {
+    model_key(model.strip()): tuple(float(value) for value in limits.split(":"))
+    for model, limits in (
+        item.rsplit("=", 1) for item in os.getenv("LLM_RATE_MODEL_LIMITS", "").split(",") if item.strip()
+    )
+}
+# size of a bucket, in seconds of its rate: how big a burst can be after a quiet period
+LLM_RATE_BURST_SECONDS = float(os.getenv("LLM_RATE_BURST_SECONDS", "10"))
+# share of the quota one tenant (one API key) can use alone, < 1 keeps room for
+# the others when several clients share the quota
+LLM_RATE_TENANT_SHARE = float(os.getenv("LLM_RATE_TENANT_SHARE", "1"))
+# tokens counted for the answer before the call, corrected with the real usage after it
+LLM_RATE_OUTPUT_TOKENS = int(os.getenv("LLM_RATE_OUTPUT_TOKENS", "600"))
+# a call over the quota waits for it at most this long (and never past the request
+# deadline), then fails with 429 + Retry-After
+LLM_RATE_MAX_WAIT = float(os.getenv("LLM_RATE_MAX_WAIT", "10"))
+LLM_RATE_KEY_PREFIX = os.getenv("LLM_RATE_KEY_PREFIX", "ai:ratelimit")
+
+# --- when redis can't be reached ---
+# every process limits itself to its share of the quota: quota / LLM_RATE_LOCAL_WORKERS
+# (how many processes share it), and redis is tried again after LLM_RATE_REDIS_RETRY seconds
+LLM_RATE_LOCAL_WORKERS = int(os.getenv("LLM_RATE_LOCAL_WORKERS", "4"))
+LLM_RATE_REDIS_RETRY = float(os.getenv("LLM_RATE_REDIS_RETRY", "10"))
+# a rate limit check never waits longer than this for redis
+LLM_RATE_REDIS_TIMEOUT = float(os.getenv("LLM_RATE_REDIS_TIMEOUT", "0.5"))
+
+if not 0 < LLM_RATE_TENANT_SHARE <= 1:
+    raise ValueError("LLM_RATE_TENANT_SHARE must be between 0 and 1.")
+if LLM_RATE_LOCAL_WORKERS < 1:
+    raise ValueError("LLM_RATE_LOCAL_WORKERS must be at least 1.")
+if any(len(limits) != 2 for limits in LLM_RATE_MODEL_LIMITS.values()):
+    raise ValueError("LLM_RATE_MODEL_LIMITS must look like 'model=rpm:tpm,model=rpm:tpm'.")
@@ -1,8 +1,29 @@
-import redis
+"""
+Redis connection pools (redis.asyncio).
+
+Nothing connects at import time: the pools are created in the FastAPI lifespan
+(`init_redis()`) and closed on shutdown (`close_redis()`).
+
+    - get_redis():        str responses (decode_responses=True)
+    - get_redis_binary(): raw bytes (float32 matrices, compressed blobs...)
+
+Code running in a worker thread (CrewAI tools, anything inside run_llm/run_fetch)
+can't await, it uses `run_redis_sync()`, which runs the command on the event loop
+through the SAME pool and waits for it with a timeout.
+"""
+
+import asyncio
 import os
+import time
+from typing import Any, Awaitable, Callable, TypeVar
+
+import redis
+import redis.asyncio as aioredis
+
+T = TypeVar("T")
 
 _REDIS_HOST = os.getenv("REDIS_HOST")
-_REDIS_PORT = int(os.getenv("REDIS_PORT"))
+_REDIS_PORT = int(os.getenv("REDIS_PORT") or 0)
 _REDIS_PASSWORD = os.getenv("REDIS_PASSWORD")
 # add this in production ""
 if os.getenv("SYSTEM_ENV") == "development":
@@ -12,24 +33,123 @@ else:
     if not _REDIS_HOST or not _REDIS_PORT or not _REDIS_PASSWORD:
         raise ValueError("REDIS configeration not found in environment variables.")
 
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", "50"))
+REDIS_BINARY_MAX_CONNECTIONS = int(os.getenv("REDIS_BINARY_MAX_CONNECTIONS", "10"))
+# seconds to wait for a free connection of the pool before failing
+REDIS_POOL_TIMEOUT = float(os.getenv("REDIS_POOL_TIMEOUT", "5"))
+REDIS_CONNECT_TIMEOUT = float(os.getenv("REDIS_CONNECT_TIMEOUT", "2"))
+REDIS_SOCKET_TIMEOUT = float(os.getenv("REDIS_SOCKET_TIMEOUT", "5"))
+# max time a worker thread waits for a command sent through run_redis_sync()
+REDIS_SYNC_TIMEOUT = float(os.getenv("REDIS_SYNC_TIMEOUT", "5"))
+
+_redis: aioredis.Redis | None = None
+_redis_binary: aioredis.Redis | None = None
+_loop: asyncio.AbstractEventLoop | None = None
+
+
+def _make_client(max_connections: int, decode_responses: bool) -> aioredis.Redis:
+    pool = aioredis.BlockingConnectionPool(
+        host=_REDIS_HOST,
+        port=_REDIS_PORT,
+        password=_REDIS_PASSWORD,
+        db=0,
+        max_connections=max_connections,
+        timeout=REDIS_POOL_TIMEOUT,
+        socket_connect_timeout=REDIS_CONNECT_TIMEOUT,
+        socket_timeout=REDIS_SOCKET_TIMEOUT,
+        health_check_interval=30,
+        decode_responses=decode_responses,
+    )
+    return aioredis.Redis(connection_pool=pool)
+
+
+def init_redis() -> None:
+    """
+        Creates the pools (lazy: connections are opened on first use).
+        Must be called from the event loop (FastAPI lifespan).
+    """
+    global _redis, _redis_binary, _loop
+    if _redis is not None:
+        return
+    _loop = asyncio.get_running_loop()
+    _redis = _make_client(REDIS_MAX_CONNECTIONS, decode_responses=True)
+    _redis_binary = _make_client(REDIS_BINARY_MAX_CONNECTIONS, decode_responses=False)
+
+
+async def close_redis() -> None:
+    global _redis, _redis_binary, _loop
+    for client in (_redis, _redis_binary):
+        if client is not None:
+            await client.aclose(close_connection_pool=True)
+    _redis = _redis_binary = _loop = None
+
+
+def get_redis() -> aioredis.Redis:
+    if _redis is None:
+        raise RuntimeError("Redis is not initialized, call init_redis() in the app lifespan.")
+    return _redis
+
+
+def get_redis_binary() -> aioredis.Redis:
+    if _redis_binary is None:
+        raise RuntimeError("Redis is not initialized, call init_redis() in the app lifespan.")
+    return _redis_binary
+
+
+def run_redis_sync(
+    command: Callable[[aioredis.Redis], Awaitable[T]],
+    timeout: float = REDIS_SYNC_TIMEOUT,
+    binary: bool = False,
+) -> T:
+    """
+        For worker threads only (never call it from the event loop, it would deadlock):
+            data = run_redis_sync(lambda r: r.get(key))
+        binary=True runs it on the raw bytes client.
+        Raises redis.exceptions.TimeoutError if it takes more than `timeout` seconds.
+    """
+    if _loop is None:
+        raise RuntimeError("Redis is not initialized, call init_redis() in the app lifespan.")
+    client = get_redis_binary() if binary else get_redis()
+    future = asyncio.run_coroutine_threadsafe(command(client), _loop)
+    try:
+        return future.result(timeout)
+    except TimeoutError:
+        future.cancel()
+        raise redis.exceptions.TimeoutError(f"Redis command took more than {timeout}s.")
+
+
+def _pool_stats(client: aioredis.Redis | None) -> dict[str, Any] | None:
+    if client is None:
+        return None
+    pool = client.connection_pool
+    in_use = len(pool._in_use_connections)
+    return {
+        "max_connections": pool.max_connections,
+        "created": in_use + len(pool._available_connections),
+        "in_use": in_use,
+        "idle": len(pool._available_connections),
+        "utilization": round(in_use / pool.max_connections, 3),
+    }
+
+
+def redis_pool_stats() -> dict[str, dict[str, Any] | None]:
+    return {"pool": _pool_stats(_redis), "binary_pool": _pool_stats(_redis_binary)}
 
-# Connect to Redis
-redis_client = redis.Redis(
-    host=_REDIS_HOST,
-    port=_REDIS_PORT,
-    password=_REDIS_PASSWORD,
-    db=0,
-    decode_responses=True # Ensure strings are returned as strings
-)
 
-def check_redis_connection() -> bool:
+async def redis_health() -> dict[str, Any]:
+    """
+        Pings redis and reports the pool usage, used by the /health readiness probe.
+    """
+    report: dict[str, Any] = {"ok": False, "latency_ms": None}
+    if _redis is None:
+        report["error"] = "not initialized"
+        return report
+    started = time.perf_counter()
     try:
-        redis_client.ping()
-        print("✅✅✅✅ Redis connection successful.")
-        return True
-    except redis.exceptions.RedisError:
-        print("❌❌❌❌ Redis connection failed.")
-        return False
-
-if not check_redis_connection():
-    raise ValueError("Redis connection failed.")
+        await _redis.ping()
+        report["ok"] = True
+        report["latency_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    except redis.exceptions.RedisError as e:
+        report["error"] = str(e)
+    report.update(redis_pool_stats())
+    return report
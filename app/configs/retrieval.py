@@ -0,0 +1,15 @@
+import os
+
+# "hashing" (numpy only, no model download) or "sentence-transformers"
+# (needs `pip install sentence-transformers`)
+EMBEDDER = os.getenv("EMBEDDER", "hashing")
+HASHING_EMBEDDER_DIM = int(os.getenv("HASHING_EMBEDDER_DIM", "1024"))
+SENTENCE_TRANSFORMER_MODEL = os.getenv("SENTENCE_TRANSFORMER_MODEL", "all-MiniLM-L6-v2")
+
+# size of one retrievable transcript chunk (estimated tokens)
+RETRIEVAL_CHUNK_TOKENS = int(os.getenv("RETRIEVAL_CHUNK_TOKENS", "200"))
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "5"))
+# MMR trade-off: 1.0 = pure relevance, lower = more diverse chunks. Empty => MMR off.
+_mmr_lambda = os.getenv("RETRIEVAL_MMR_LAMBDA", "0.7")
+RETRIEVAL_MMR_LAMBDA = float(_mmr_lambda) if _mmr_lambda else None
+RETRIEVAL_INDEX_TTL = int(os.getenv("RETRIEVAL_INDEX_TTL", str(7 * 24 * 60 * 60)))
@@ -0,0 +1,35 @@
+import os
+
+from .ai_agent import GEMINI_MODEL, model_key
+from .concurrency import LLM_CONCURRENCY
+
+# --- model routing (app/ai_agents/routing.py) ---
+# false => every call uses GEMINI_MODEL, as before
+LLM_ROUTING_ENABLED = os.getenv("LLM_ROUTING_ENABLED", "true").lower() == "true"
+# summaries of transcripts above LLM_ROUTING_LONG_TOKENS (estimated tokens) and
+# chat re-summaries go to this model, everything else to GEMINI_MODEL
+LLM_LONG_MODEL = os.getenv("LLM_LONG_MODEL", "gemini/gemini-2.5-flash")
+LLM_ROUTING_LONG_TOKENS = int(os.getenv("LLM_ROUTING_LONG_TOKENS", "12000"))
+# used instead of the routed model when it's overloaded: circuit breaker open,
+# no concurrency headroom, too slow, or its call failed with 429/5xx. "" => no fallback
+LLM_FALLBACK_MODEL = os.getenv("LLM_FALLBACK_MODEL", "gemini/gemini-2.0-flash")
+
+# requests running on one model at the same time (per worker process) before it
+# counts as saturated, "model=n,model=n" (models not listed: LLM_CONCURRENCY),
+# with or without the "gemini/" prefix
+LLM_MODEL_MAX_CONCURRENCY = {
+    model_key(model.strip()): int(limit)
+    for model, limit in (
+        item.rsplit("=", 1) for item in os.getenv("LLM_MODEL_MAX_CONCURRENCY", "").split(",") if item.strip()
+    )
+}
+LLM_MODEL_DEFAULT_MAX_CONCURRENCY = LLM_CONCURRENCY
+# a model whose recent calls have a p90 above this (seconds) counts as slow, with
+# at least LLM_ROUTING_MIN_SAMPLES calls known
+LLM_ROUTING_SLOW_SECONDS = float(os.getenv("LLM_ROUTING_SLOW_SECONDS", "30"))
+LLM_ROUTING_MIN_SAMPLES = int(os.getenv("LLM_ROUTING_MIN_SAMPLES", "20"))
+
+if not LLM_LONG_MODEL:
+    LLM_LONG_MODEL = GEMINI_MODEL
+if any(limit < 1 for limit in LLM_MODEL_MAX_CONCURRENCY.values()):
+    raise ValueError("LLM_MODEL_MAX_CONCURRENCY limits must be at least 1.")
@@ -0,0 +1,12 @@
+import os
+
+# transcripts above this size (estimated tokens) are summarized with map-reduce
+# instead of one single prompt
+SUMMARY_MAP_REDUCE_THRESHOLD_TOKENS = int(os.getenv("SUMMARY_MAP_REDUCE_THRESHOLD_TOKENS", "30000"))
+# max size of one chunk (map step) / one group of partial summaries (reduce step)
+SUMMARY_CHUNK_TOKENS = int(os.getenv("SUMMARY_CHUNK_TOKENS", "8000"))
+# how many chunk summaries run at the same time (shared by all requests of the worker)
+SUMMARY_MAP_CONCURRENCY = int(os.getenv("SUMMARY_MAP_CONCURRENCY", "4"))
+
+if SUMMARY_CHUNK_TOKENS >= SUMMARY_MAP_REDUCE_THRESHOLD_TOKENS:
+    raise ValueError("SUMMARY_CHUNK_TOKENS must be smaller than SUMMARY_MAP_REDUCE_THRESHOLD_TOKENS.")
@@ -0,0 +1,13 @@
+import os
+
+from .concurrency import FETCH_MAX_WORKERS
+
+# --- pooled yt-dlp instances (app/utils/ytdlp_pool.py) ---
+# idle YoutubeDL objects kept per option set, more than the fetch pool can't be busy at once
+YTDLP_POOL_SIZE = int(os.getenv("YTDLP_POOL_SIZE", str(FETCH_MAX_WORKERS)))
+# an instance is closed and rebuilt after this many extractions (caches / cookies grow)
+YTDLP_MAX_USES = int(os.getenv("YTDLP_MAX_USES", "200"))
+# only these extractors are loaded (all ~1800 of them cost ~75ms per YoutubeDL)
+YTDLP_EXTRACTORS = tuple(
+    key.strip() for key in os.getenv("YTDLP_EXTRACTORS", "Youtube,YoutubeTab").split(",") if key.strip()
+)
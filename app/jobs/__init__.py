@@ -0,0 +1,15 @@
+from functools import lru_cache
+
+from app.configs.jobs import JOBS_BACKEND
+from .backends import JobQueue, InMemoryJobQueue, RedisJobQueue, public_job
+
+
+@lru_cache(maxsize=1)
+def get_job_queue() -> JobQueue:
+    if JOBS_BACKEND == "memory":
+        return InMemoryJobQueue()
+    return RedisJobQueue()
+
+
+# this for => from app.jobs import *
+__all__ = ["get_job_queue", "JobQueue", "InMemoryJobQueue", "RedisJobQueue", "public_job"]
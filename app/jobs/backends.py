@@ -0,0 +1,337 @@
+"""
+Job queues for the background summaries.
+
+A job is a plain dict:
+
+    {"id", "status", "payload", "attempts", "max_attempts", "created_at",
+     "started_at", "finished_at", "error", "result"}
+
+status: queued -> running -> succeeded | failed
+                    └-> retrying (waits the backoff) -> queued ...
+
+A worker `reserve()`s a job and gets a lease on it for JOB_VISIBILITY_TIMEOUT
+seconds (renewed with `extend()` while it works). If the worker dies the lease
+expires and `requeue_expired()` puts the job back in the queue (or fails it
+after max_attempts). complete/fail/retry only apply with the current lease, so a
+worker that lost its job (too slow) can't overwrite the result of the next one.
+
+    RedisJobQueue:    shared by every API / worker process
+    InMemoryJobQueue: same behaviour inside one process (tests, local dev)
+"""
+
+import json
+import time
+import uuid
+from collections import deque
+from typing import Any, Dict
+
+from app.configs import get_redis
+from app.configs.jobs import (
+    JOBS_KEY_PREFIX,
+    JOB_MAX_ATTEMPTS,
+    JOB_VISIBILITY_TIMEOUT,
+    JOB_RESULT_TTL,
+)
+
+QUEUED, RUNNING, RETRYING, SUCCEEDED, FAILED = "queued", "running", "retrying", "succeeded", "failed"
+VISIBILITY_TIMEOUT_ERROR = "The worker didn't finish the job in time."
+
+
+def new_job(payload: Dict[str, Any], max_attempts: int = JOB_MAX_ATTEMPTS) -> Dict[str, Any]:
+    return {
+        "id": uuid.uuid4().hex,
+        "status": QUEUED,
+        "payload": payload,
+        "attempts": 0,
+        "max_attempts": max_attempts,
+        "created_at": time.time(),
+        "started_at": None,
+        "finished_at": None,
+        "error": None,
+        "result": None,
+    }
+
+
+class JobQueue:
+    """
+        Interface of the backends, every method is a coroutine.
+        `lease` is the token returned in job["lease"] by reserve().
+    """
+
+    async def enqueue(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    async def get(self, job_id: str) -> Dict[str, Any] | None:
+        raise NotImplementedError
+
+    async def reserve(self) -> Dict[str, Any] | None:
+        # next queued job (now running, with a lease) or None if the queue is empty
+        raise NotImplementedError
+
+    async def extend(self, job_id: str, lease: str) -> bool:
+        # heartbeat: pushes the visibility deadline, False if the lease was lost
+        raise NotImplementedError
+
+    async def complete(self, job_id: str, lease: str, result: Dict[str, Any]) -> bool:
+        raise NotImplementedError
+
+    async def fail(self, job_id: str, lease: str, error: str) -> bool:
+        raise NotImplementedError
+
+    async def retry(self, job_id: str, lease: str, error: str, delay: float) -> bool:
+        raise NotImplementedError
+
+    async def requeue_expired(self) -> int:
+        raise NotImplementedError
+
+
+class InMemoryJobQueue(JobQueue):
+    """
+        Single process, single event loop: no awaits inside the methods, so no locks.
+    """
+
+    def __init__(self, visibility_timeout: float = JOB_VISIBILITY_TIMEOUT):
+        self._visibility_timeout = visibility_timeout
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._queue: deque[str] = deque()
+        # job_id -> deadline (lease expiry or end of the retry backoff)
+        self._deadlines: Dict[str, float] = {}
+
+    async def enqueue(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        job = new_job(payload)
+        self._jobs[job["id"]] = job
+        self._queue.append(job["id"])
+        return dict(job)
+
+    async def get(self, job_id: str) -> Dict[str, Any] | None:
+        job = self._jobs.get(job_id)
+        return dict(job) if job else None
+
+    async def reserve(self) -> Dict[str, Any] | None:
+        if not self._queue:
+            return None
+        job = self._jobs[self._queue.popleft()]
+        now = time.time()
+        job.update(status=RUNNING, attempts=job["attempts"] + 1, started_at=now, lease=uuid.uuid4().hex)
+        self._deadlines[job["id"]] = now + self._visibility_timeout
+        return dict(job)
+
+    def _leased(self, job_id: str, lease: str) -> Dict[str, Any] | None:
+        job = self._jobs.get(job_id)
+        return job if job and job.get("lease") == lease else None
+
+    async def extend(self, job_id: str, lease: str) -> bool:
+        if not self._leased(job_id, lease):
+            return False
+        self._deadlines[job_id] = time.time() + self._visibility_timeout
+        return True
+
+    def _finish(self, job_id: str, lease: str, **fields) -> bool:
+        job = self._leased(job_id, lease)
+        if not job:
+            return False
+        job.update(fields, finished_at=time.time(), lease=None)
+        self._deadlines.pop(job_id, None)
+        return True
+
+    async def complete(self, job_id: str, lease: str, result: Dict[str, Any]) -> bool:
+        return self._finish(job_id, lease, status=SUCCEEDED, result=result, error=None)
+
+    async def fail(self, job_id: str, lease: str, error: str) -> bool:
+        return self._finish(job_id, lease, status=FAILED, error=error)
+
+    async def retry(self, job_id: str, lease: str, error: str, delay: float) -> bool:
+        job = self._leased(job_id, lease)
+        if not job:
+            return False
+        job.update(status=RETRYING, error=error, lease=None)
+        self._deadlines[job_id] = time.time() + delay
+        return True
+
+    async def requeue_expired(self) -> int:
+        now = time.time()
+        expired = [job_id for job_id, deadline in self._deadlines.items() if deadline <= now]
+        for job_id in expired:
+            del self._deadlines[job_id]
+            job = self._jobs[job_id]
+            if job["status"] == RUNNING and job["attempts"] >= job["max_attempts"]:
+                job.update(status=FAILED, error=VISIBILITY_TIMEOUT_ERROR, finished_at=now, lease=None)
+            else:
+                job.update(status=QUEUED, lease=None)
+                self._queue.append(job_id)
+        # finished jobs are forgotten after JOB_RESULT_TTL like the redis keys
+        for job_id in [job_id for job_id, job in self._jobs.items() if job["finished_at"] and job["finished_at"] + JOB_RESULT_TTL <= now]:
+            del self._jobs[job_id]
+        return len(expired)
+
+
+# --- redis ---
+# every state change is one Lua script so two workers (or a worker and the
+# reaper) can never both own a job
+
+_RESERVE = """
+local id = redis.call('RPOP', KEYS[1])
+if not id then return false end
+local key = ARGV[4] .. id
+if redis.call('EXISTS', key) == 0 then return false end
+redis.call('ZADD', KEYS[2], tonumber(ARGV[1]) + tonumber(ARGV[2]), id)
+redis.call('HINCRBY', key, 'attempts', 1)
+redis.call('HSET', key, 'status', 'running', 'lease', ARGV[3], 'started_at', ARGV[1])
+return id
+"""
+
+_EXTEND = """
+local key = ARGV[4] .. ARGV[1]
+if redis.call('HGET', key, 'lease') ~= ARGV[2] then return 0 end
+redis.call('ZADD', KEYS[1], 'XX', ARGV[3], ARGV[1])
+return 1
+"""
+
+# ARGV: id, lease, status, field, value, finished_at, ttl, prefix
+_FINISH = """
+local key = ARGV[8] .. ARGV[1]
+if redis.call('HGET', key, 'lease') ~= ARGV[2] then return 0 end
+redis.call('ZREM', KEYS[1], ARGV[1])
+-- the error of a previous attempt doesn't belong to a succeeded job
+redis.call('HDEL', key, 'lease', 'error')
+redis.call('HSET', key, 'status', ARGV[3], ARGV[4], ARGV[5], 'finished_at', ARGV[6])
+redis.call('EXPIRE', key, ARGV[7])
+return 1
+"""
+
+# ARGV: id, lease, error, ready_at, prefix
+_RETRY = """
+local key = ARGV[5] .. ARGV[1]
+if redis.call('HGET', key, 'lease') ~= ARGV[2] then return 0 end
+redis.call('HDEL', key, 'lease')
+redis.call('HSET', key, 'status', 'retrying', 'error', ARGV[3])
+redis.call('ZADD', KEYS[1], ARGV[4], ARGV[1])
+return 1
+"""
+
+# ARGV: now, prefix, ttl, timeout error
+_REQUEUE_EXPIRED = """
+local ids = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', ARGV[1], 'LIMIT', 0, 100)
+for _, id in ipairs(ids) do
+    redis.call('ZREM', KEYS[2], id)
+    local key = ARGV[2] .. id
+    local job = redis.call('HMGET', key, 'status', 'attempts', 'max_attempts')
+    if job[1] then
+        redis.call('HDEL', key, 'lease')
+        if job[1] == 'running' and tonumber(job[2]) >= tonumber(job[3]) then
+            redis.call('HSET', key, 'status', 'failed', 'error', ARGV[4], 'finished_at', ARGV[1])
+            redis.call('EXPIRE', key, ARGV[3])
+        else
+            redis.call('HSET', key, 'status', 'queued')
+            redis.call('LPUSH', KEYS[1], id)
+        end
+    end
+end
+return #ids
+"""
+
+_JSON_FIELDS = ("payload", "result")
+_FLOAT_FIELDS = ("created_at", "started_at", "finished_at")
+_INT_FIELDS = ("attempts", "max_attempts")
+
+
+def _to_hash(job: Dict[str, Any]) -> Dict[str, str]:
+    # redis hashes have no null, missing field == None
+    fields = {}
+    for name, value in job.items():
+        if value is None:
+            continue
+        fields[name] = json.dumps(value, ensure_ascii=False) if name in _JSON_FIELDS else str(value)
+    return fields
+
+
+def _from_hash(fields: Dict[str, str]) -> Dict[str, Any]:
+    job: Dict[str, Any] = {name: None for name in ("error", "result", "started_at", "finished_at", "lease")}
+    for name, value in fields.items():
+        if name in _JSON_FIELDS:
+            job[name] = json.loads(value)
+        elif name in _FLOAT_FIELDS:
+            job[name] = float(value)
+        elif name in _INT_FIELDS:
+            job[name] = int(value)
+        else:
+            job[name] = value
+    return job
+
+
+class RedisJobQueue(JobQueue):
+    """
+        {prefix}:queue       list of queued job ids (LPUSH / RPOP => FIFO)
+        {prefix}:processing  zset job id -> deadline (running leases + retry backoffs)
+        {prefix}:job:{id}    hash with the job fields (expires JOB_RESULT_TTL after it ends)
+    """
+
+    def __init__(self, prefix: str = JOBS_KEY_PREFIX, visibility_timeout: float = JOB_VISIBILITY_TIMEOUT):
+        self._visibility_timeout = visibility_timeout
+        self._queue_key = f"{prefix}:queue"
+        self._processing_key = f"{prefix}:processing"
+        self._job_prefix = f"{prefix}:job:"
+        self._scripts: Dict[str, Any] = {}
+
+    def _script(self, source: str):
+        # registered lazily, the redis client only exists once the app started
+        if source not in self._scripts:
+            self._scripts[source] = get_redis().register_script(source)
+        return self._scripts[source]
+
+    async def enqueue(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        job = new_job(payload)
+        async with get_redis().pipeline(transaction=True) as pipe:
+            pipe.hset(self._job_prefix + job["id"], mapping=_to_hash(job))
+            # a job nobody picks up still goes away eventually
+            pipe.expire(self._job_prefix + job["id"], JOB_RESULT_TTL)
+            pipe.lpush(self._queue_key, job["id"])
+            await pipe.execute()
+        return job
+
+    async def get(self, job_id: str) -> Dict[str, Any] | None:
+        fields = await get_redis().hgetall(self._job_prefix + job_id)
+        return _from_hash(fields) if fields else None
+
+    async def reserve(self) -> Dict[str, Any] | None:
+        job_id = await self._script(_RESERVE)(
+            keys=[self._queue_key, self._processing_key],
+            args=[time.time(), self._visibility_timeout, uuid.uuid4().hex, self._job_prefix],
+        )
+        return await self.get(job_id) if job_id else None
+
+    async def extend(self, job_id: str, lease: str) -> bool:
+        return bool(await self._script(_EXTEND)(
+            keys=[self._processing_key],
+            args=[job_id, lease, time.time() + self._visibility_timeout, self._job_prefix],
+        ))
+
+    async def _finish(self, job_id: str, lease: str, status: str, field: str, value: str) -> bool:
+        return bool(await self._script(_FINISH)(
+            keys=[self._processing_key],
+            args=[job_id, lease, status, field, value, time.time(), JOB_RESULT_TTL, self._job_prefix],
+        ))
+
+    async def complete(self, job_id: str, lease: str, result: Dict[str, Any]) -> bool:
+        return await self._finish(job_id, lease, SUCCEEDED, "result", json.dumps(result, ensure_ascii=False))
+
+    async def fail(self, job_id: str, lease: str, error: str) -> bool:
+        return await self._finish(job_id, lease, FAILED, "error", error)
+
+    async def retry(self, job_id: str, lease: str, error: str, delay: float) -> bool:
+        return bool(await self._script(_RETRY)(
+            keys=[self._processing_key],
+            args=[job_id, lease, error, time.time() + delay, self._job_prefix],
+        ))
+
+    async def requeue_expired(self) -> int:
+        return await self._script(_REQUEUE_EXPIRED)(
+            keys=[self._queue_key, self._processing_key],
+            args=[time.time(), self._job_prefix, JOB_RESULT_TTL, VISIBILITY_TIMEOUT_ERROR],
+        )
+
+
+def public_job(job: Dict[str, Any]) -> Dict[str, Any]:
+    # the lease is the worker's secret
+    return {name: value for name, value in job.items() if name != "lease"}
+
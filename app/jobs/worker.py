@@ -0,0 +1,198 @@
+"""
+Workers that run the queued summary jobs.
+
+    python -m app.jobs.worker                      # JOB_WORKER_PROCESSES x JOB_WORKER_CONCURRENCY
+    python -m app.jobs.worker --processes 4 --concurrency 2
+
+Each process has its own event loop, redis pools and fetch/LLM executors, and
+runs `concurrency` consumers + one reaper that gives expired jobs back to the
+queue. SIGTERM / Ctrl+C: stop taking jobs, finish the running ones, exit.
+
+With JOBS_BACKEND=memory the consumers run inside the API process instead
+(`start_inline_workers()` from the app lifespan).
+"""
+
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import signal
+
+from fastapi import HTTPException
+
+from app.configs.llm import SUMMARY_DEADLINE
+from app.configs.jobs import (
+    JOB_MAX_ATTEMPTS,
+    JOB_RETRY_BACKOFF,
+    JOB_VISIBILITY_TIMEOUT,
+    JOB_WORKER_PROCESSES,
+    JOB_WORKER_CONCURRENCY,
+    JOB_POLL_INTERVAL,
+)
+from app.utils.resilience import deadline
+from .backends import JobQueue
+
+# fixed name: in the spawned processes this module is __mp_main__
+logger = logging.getLogger("app.jobs.worker")
+
+
+async def _heartbeat(queue: JobQueue, job: dict) -> None:
+    while True:
+        await asyncio.sleep(JOB_VISIBILITY_TIMEOUT / 3)
+        if not await queue.extend(job["id"], job["lease"]):
+            logger.warning("job %s: lease lost", job["id"])
+            return
+
+
+async def process_job(queue: JobQueue, job: dict) -> None:
+    """
+        Runs one summary job (same code path as /summary: caches, executors, limits).
+        Client errors (bad url, playlist...) fail the job, anything else is retried.
+    """
+    # import here: the API imports app.jobs, and the service imports the agents lazily anyway
+    from app.api.v1.endpoints.ai.service import generate_summary
+
+    job_id, lease = job["id"], job["lease"]
+    heartbeat = asyncio.ensure_future(_heartbeat(queue, job))
+    try:
+        # nobody waits on a job, but a stuck attempt must still end (504 => retried)
+        with deadline(SUMMARY_DEADLINE):
+            response = await generate_summary(**job["payload"])
+    except HTTPException as e:
+        # 429: the LLM quota was used up, it will be back
+        error, retryable = str(e.detail), e.status_code >= 500 or e.status_code == 429
+    except Exception as e:
+        error, retryable = f"Failed to generate summary: {str(e)}", True
+    else:
+        await queue.complete(job_id, lease, response.model_dump())
+        return
+    finally:
+        heartbeat.cancel()
+
+    if retryable and job["attempts"] < job.get("max_attempts", JOB_MAX_ATTEMPTS):
+        logger.warning("job %s: attempt %s failed, retrying: %s", job_id, job["attempts"], error)
+        await queue.retry(job_id, lease, error, JOB_RETRY_BACKOFF * job["attempts"])
+    else:
+        logger.error("job %s failed: %s", job_id, error)
+        await queue.fail(job_id, lease, error)
+
+
+async def _consume(queue: JobQueue, stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        try:
+            job = await queue.reserve()
+        except Exception as e:
+            # redis down... keep the worker alive and try again
+            logger.error("jobs: reserve failed: %s", e)
+            job = None
+        if job is None:
+            try:
+                await asyncio.wait_for(stop.wait(), JOB_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            continue
+        try:
+            await process_job(queue, job)
+        except Exception as e:
+            # couldn't even store the outcome, the lease expires and the reaper retries it
+            logger.error("job %s: %s", job["id"], e)
+
+
+async def _reap(queue: JobQueue, stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        try:
+            await queue.requeue_expired()
+        except Exception as e:
+            logger.error("jobs: requeue failed: %s", e)
+        try:
+            await asyncio.wait_for(stop.wait(), JOB_POLL_INTERVAL * 2)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def run_workers(queue: JobQueue, concurrency: int, stop: asyncio.Event) -> None:
+    """
+        `concurrency` consumers + the reaper until `stop` is set.
+        The running jobs are finished before returning.
+    """
+    await asyncio.gather(_reap(queue, stop), *(_consume(queue, stop) for _ in range(concurrency)))
+
+
+_inline_stop: asyncio.Event | None = None
+_inline_task: asyncio.Task | None = None
+
+
+def start_inline_workers(concurrency: int) -> None:
+    """
+        Consumers inside the API process (JOBS_BACKEND=memory or JOB_INLINE_CONCURRENCY).
+    """
+    global _inline_stop, _inline_task
+    if concurrency <= 0 or _inline_task is not None:
+        return
+    from . import get_job_queue
+
+    _inline_stop = asyncio.Event()
+    _inline_task = asyncio.ensure_future(run_workers(get_job_queue(), concurrency, _inline_stop))
+
+
+async def stop_inline_workers(timeout: float = 10) -> None:
+    global _inline_stop, _inline_task
+    if _inline_task is None:
+        return
+    _inline_stop.set()
+    try:
+        await asyncio.wait_for(_inline_task, timeout)
+    except asyncio.TimeoutError:
+        # the unfinished jobs are retried after their lease expires
+        pass
+    _inline_stop = _inline_task = None
+
+
+async def _worker_process_main(concurrency: int) -> None:
+    from app.configs import init_redis, close_redis
+    from app.utils.concurrency import shutdown_executors
+    from . import get_job_queue
+
+    init_redis()
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop.set)
+    try:
+        await run_workers(get_job_queue(), concurrency, stop)
+    finally:
+        shutdown_executors()
+        await close_redis()
+
+
+def _worker_process(concurrency: int) -> None:
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_worker_process_main(concurrency))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Summary job workers")
+    parser.add_argument("--processes", type=int, default=JOB_WORKER_PROCESSES)
+    parser.add_argument("--concurrency", type=int, default=JOB_WORKER_CONCURRENCY)
+    args = parser.parse_args()
+
+    # spawn: no half-copied event loops / thread pools from the parent
+    context = multiprocessing.get_context("spawn")
+    processes = [
+        context.Process(target=_worker_process, args=(args.concurrency,), name=f"summary-worker-{i}")
+        for i in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+    # Ctrl+C reaches the children too (same process group), they stop on their own
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, lambda *_: [p.terminate() for p in processes if p.is_alive()])
+    for process in processes:
+        process.join()
+
+
+if __name__ == "__main__":
+    main()
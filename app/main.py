@@ -1,12 +1,105 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse, Response
 from .api.v1.router import router as api_router
+from .configs import init_redis, close_redis, redis_health, redis_pool_stats
+from .caches import video_cache_stats, summary_cache_stats, answer_cache_stats, purge_stale_summaries
+from .utils.concurrency import shutdown_executors
+from .utils.warmup import start_warm_up, warm_up_status
+from .utils.admission import AdmissionMiddleware
+from .utils.metrics import MetricsMiddleware, registry, render_metrics, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from .configs.jobs import JOB_INLINE_CONCURRENCY
+from .configs.compression import (
+    RESPONSE_GZIP_ENABLED,
+    RESPONSE_GZIP_MIN_SIZE,
+    RESPONSE_GZIP_LEVEL,
+    RESPONSE_GZIP_EXCLUDED_TYPES,
+)
+from .jobs.worker import start_inline_workers, stop_inline_workers
 from dotenv import load_dotenv
 
 load_dotenv()
-app = FastAPI(title="YouTube Video Agent API")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # only creates the pools, connections are opened on first use
+    init_redis()
+    # summaries of an older prompt version, never served again
+    purge_task = asyncio.create_task(purge_stale_summaries())
+    # crewai / LLM / yt-dlp are loaded in the background, the app is ready right away
+    start_warm_up()
+    # summary jobs consumed in this process (memory backend), normally it's app.jobs.worker
+    start_inline_workers(JOB_INLINE_CONCURRENCY)
+    yield
+    purge_task.cancel()
+    await stop_inline_workers()
+    # don't keep the process alive for queued work of clients that are gone
+    shutdown_executors()
+    await close_redis()
+
+app = FastAPI(title="YouTube Video Agent API", lifespan=lifespan)
+if RESPONSE_GZIP_ENABLED:
+    # only for clients sending Accept-Encoding: gzip (big inline transcripts), never the SSE/NDJSON streams
+    app.add_middleware(
+        GZipMiddleware,
+        minimum_size=RESPONSE_GZIP_MIN_SIZE,
+        compresslevel=RESPONSE_GZIP_LEVEL,
+        exclude_content_types=RESPONSE_GZIP_EXCLUDED_TYPES,
+    )
+API_PREFIX = "/api/v1"
+# summaries / questions beyond the limits get a 503 before reaching the router
+app.add_middleware(AdmissionMiddleware, prefix=f"{API_PREFIX}/ai")
+# added last = outermost, the latencies include the compression and the shed requests
+app.add_middleware(MetricsMiddleware)
 
 # Include the API router
-app.include_router(api_router, prefix="/api/v1")
+app.include_router(api_router, prefix=API_PREFIX)
+
+
+@app.get("/health")
+async def health():
+    """
+        Readiness probe: 200 when redis answers, 503 otherwise (+ pool utilization).
+        The warm-up state is informative only, requests work (slower) while it runs.
+    """
+    redis_report = await redis_health()
+    status_code = 200 if redis_report["ok"] else 503
+    return JSONResponse(
+        status_code=status_code,
+        content={
+            "status": "ok" if redis_report["ok"] else "unavailable",
+            "redis": redis_report,
+            "warm_up": warm_up_status(),
+        },
+    )
+
+
+def _cache_metrics() -> list[str]:
+    lines = ["# HELP ai_cache_events_total Cache lookups by cache and result.", "# TYPE ai_cache_events_total counter"]
+    for cache, stats in (("video", video_cache_stats), ("summary", summary_cache_stats), ("answer", answer_cache_stats)):
+        for event, value in stats.snapshot().items():
+            lines.append(f'ai_cache_events_total{{cache="{cache}",event="{event}"}} {value}')
+    return lines
+
+
+def _redis_pool_metrics() -> list[str]:
+    lines = ["# HELP ai_redis_pool_connections Redis pool connections by state.", "# TYPE ai_redis_pool_connections gauge"]
+    for pool, stats in redis_pool_stats().items():
+        if stats:
+            for state in ("max_connections", "in_use", "idle"):
+                lines.append(f'ai_redis_pool_connections{{pool="{pool}",state="{state}"}} {stats[state]}')
+    return lines
+
 
+registry.add_collector(_cache_metrics)
+registry.add_collector(_redis_pool_metrics)
 
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """
+        Prometheus scrape endpoint (stage latencies, request latencies, LLM tokens, caches, redis pools).
+    """
+    return Response(render_metrics(), media_type=METRICS_CONTENT_TYPE)
@@ -0,0 +1,4 @@
+from .index import build_transcript_index, retrieve_chunks, search
+from .embedders import get_embedder
+
+__all__ = ["build_transcript_index", "retrieve_chunks", "search", "get_embedder"]
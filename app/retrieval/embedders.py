@@ -0,0 +1,93 @@
+"""
+Local embedders (no API calls). Every embedder returns L2-normalized float32
+rows, so cosine similarity is just a dot product.
+
+    - HashingEmbedder: numpy only, word uni/bi-grams hashed into a fixed size
+      vector. Lexical (no synonyms) but fast and good enough to find the part of
+      the video a question is about.
+    - SentenceTransformerEmbedder: real semantic embeddings, optional dependency.
+"""
+
+import re
+import zlib
+from functools import lru_cache
+from typing import List, Protocol
+
+import numpy as np
+
+from app.configs.retrieval import EMBEDDER, HASHING_EMBEDDER_DIM, SENTENCE_TRANSFORMER_MODEL
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+class Embedder(Protocol):
+    # stored next to the vectors, vectors of different embedders can't be compared
+    name: str
+    dim: int
+    # similar vectors mean similar meaning (not only the same words)
+    semantic: bool
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        ...
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32, copy=False)
+
+
+class HashingEmbedder:
+    def __init__(self, dim: int = HASHING_EMBEDDER_DIM):
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+        self.semantic = False
+
+    def _features(self, text: str) -> List[str]:
+        words = _WORD_RE.findall(text.casefold())
+        return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            # crc32 and not hash(): python's hash is randomized per process and
+            # the vectors are shared between workers through redis
+            hashes = np.fromiter(
+                (zlib.crc32(f.encode("utf-8")) for f in self._features(text)),
+                dtype=np.uint32,
+            )
+            if hashes.size == 0:
+                continue
+            buckets = (hashes % self.dim).astype(np.intp)
+            signs = np.where(hashes & 0x80000000, -1.0, 1.0).astype(np.float32)
+            np.add.at(matrix[row], buckets, signs)
+        # sublinear tf so one repeated word doesn't dominate the chunk
+        matrix = np.sign(matrix) * np.log1p(np.abs(matrix))
+        return _normalize(matrix)
+
+
+class SentenceTransformerEmbedder:
+    def __init__(self, model_name: str = SENTENCE_TRANSFORMER_MODEL):
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError as e:
+            raise ImportError(
+                "EMBEDDER=sentence-transformers needs `pip install sentence-transformers`."
+            ) from e
+        self._model = SentenceTransformer(model_name)
+        self.dim = self._model.get_sentence_embedding_dimension()
+        self.name = f"st-{model_name}"
+        self.semantic = True
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        vectors = self._model.encode(texts, convert_to_numpy=True, normalize_embeddings=True)
+        return np.asarray(vectors, dtype=np.float32)
+
+
+@lru_cache(maxsize=1)
+def get_embedder() -> Embedder:
+    if EMBEDDER == "hashing":
+        return HashingEmbedder()
+    if EMBEDDER == "sentence-transformers":
+        return SentenceTransformerEmbedder()
+    raise ValueError(f"Unknown EMBEDDER: {EMBEDDER!r} (use 'hashing' or 'sentence-transformers').")
@@ -0,0 +1,176 @@
+"""
+Per-session transcript chunk index, stored in redis.
+
+On /summary the transcript is split into small sentence-aligned chunks and
+embedded once. The vectors are stored as ONE raw float32 matrix (n_chunks x dim)
+in a redis hash next to the chunk texts:
+
+    {session_id}-index
+        matrix   -> raw bytes (float32, row-major, rows are L2-normalized)
+        dim      -> vector size
+        embedder -> name of the embedder that made the vectors
+        chunks   -> JSON list of the chunk texts
+        starts   -> raw float32 start second of every chunk (only when the
+                    transcript came with its timed segments)
+
+On /ask-question the question is embedded and a top-k cosine search (one matrix
+product) picks the chunks, optionally re-ranked with MMR to drop near-duplicates.
+Timed chunks are returned as "[mm:ss] text" so the answer can cite the moment.
+"""
+
+import json
+import logging
+from typing import List
+
+import numpy as np
+import redis
+
+from app.configs import get_redis_binary
+from app.configs.retrieval import (
+    RETRIEVAL_CHUNK_TOKENS,
+    RETRIEVAL_TOP_K,
+    RETRIEVAL_MMR_LAMBDA,
+    RETRIEVAL_INDEX_TTL,
+)
+from app.utils.concurrency import run_fetch
+from app.utils.metrics import span
+from app.utils.tokens import split_into_chunks
+from app.utils.transcript_segments import TranscriptSegments, format_timestamp
+from .embedders import get_embedder
+
+logger = logging.getLogger(__name__)
+
+
+def _index_key(session_id: str) -> str:
+    return f"{session_id}-index"
+
+
+def _embed_transcript(
+    transcript_text: str,
+    segments: TranscriptSegments | None,
+) -> tuple[list[str], np.ndarray | None, np.ndarray, str]:
+    with span("embed_transcript"):
+        if segments is not None and len(segments):
+            # cut on segment boundaries so every chunk knows when it starts
+            timed = segments.chunks(RETRIEVAL_CHUNK_TOKENS)
+            chunks = [text for _, text in timed]
+            starts = np.array([start for start, _ in timed], dtype=np.float32)
+        else:
+            chunks, starts = split_into_chunks(transcript_text, RETRIEVAL_CHUNK_TOKENS), None
+        embedder = get_embedder()
+        return chunks, starts, embedder.embed(chunks), embedder.name
+
+
+async def build_transcript_index(
+    session_id: str,
+    transcript_text: str,
+    segments: TranscriptSegments | None = None,
+) -> int:
+    """
+        Chunks + embeds the transcript and stores it for the session.
+        With the timed segments the chunks follow the captions and keep their start time.
+        Returns the number of chunks.
+    """
+    if not transcript_text.strip():
+        return 0
+    # cpu work (numpy releases the GIL) off the event loop
+    chunks, starts, matrix, embedder_name = await run_fetch(_embed_transcript, transcript_text, segments)
+
+    key = _index_key(session_id)
+    with span("redis_index"):
+        await _store_index(key, chunks, starts, matrix, embedder_name)
+    return len(chunks)
+
+
+async def _store_index(key: str, chunks: list[str], starts: np.ndarray | None, matrix: np.ndarray, embedder_name: str) -> None:
+    mapping = {
+        "matrix": matrix.tobytes(),
+        "dim": matrix.shape[1],
+        "embedder": embedder_name,
+        "chunks": json.dumps(chunks, ensure_ascii=False),
+    }
+    if starts is not None:
+        mapping["starts"] = starts.tobytes()
+    async with get_redis_binary().pipeline(transaction=True) as pipe:
+        pipe.delete(key)
+        pipe.hset(key, mapping=mapping)
+        pipe.expire(key, RETRIEVAL_INDEX_TTL)
+        await pipe.execute()
+
+
+def _mmr(matrix: np.ndarray, scores: np.ndarray, candidates: np.ndarray, k: int, lambda_: float) -> List[int]:
+    # Maximal Marginal Relevance: greedily take the chunk that is relevant to the
+    # question but not similar to the chunks already taken
+    selected: List[int] = []
+    candidate_vectors = matrix[candidates]
+    similarity = candidate_vectors @ candidate_vectors.T
+    remaining = list(range(len(candidates)))
+    while remaining and len(selected) < k:
+        if selected:
+            redundancy = similarity[np.ix_(remaining, selected)].max(axis=1)
+        else:
+            redundancy = np.zeros(len(remaining), dtype=np.float32)
+        mmr_scores = lambda_ * scores[candidates[remaining]] - (1 - lambda_) * redundancy
+        best = remaining[int(np.argmax(mmr_scores))]
+        selected.append(best)
+        remaining.remove(best)
+    return [int(candidates[i]) for i in selected]
+
+
+def search(
+    matrix: np.ndarray,
+    query_vector: np.ndarray,
+    top_k: int = RETRIEVAL_TOP_K,
+    mmr_lambda: float | None = RETRIEVAL_MMR_LAMBDA,
+) -> List[int]:
+    """
+        Returns the row indexes of the best chunks, most relevant first.
+    """
+    if matrix.shape[0] == 0 or top_k <= 0:
+        return []
+    scores = matrix @ query_vector
+    # MMR needs a few more candidates than k to be able to skip duplicates
+    n_candidates = min(matrix.shape[0], top_k * 4 if mmr_lambda is not None else top_k)
+    candidates = np.argpartition(-scores, n_candidates - 1)[:n_candidates]
+    candidates = candidates[np.argsort(-scores[candidates])]
+    if mmr_lambda is None:
+        return [int(i) for i in candidates[:top_k]]
+    return _mmr(matrix, scores, candidates, top_k, mmr_lambda)
+
+
+def _rank(stored: dict, question: str, top_k: int) -> List[str]:
+    embedder = get_embedder()
+    if stored[b"embedder"].decode() != embedder.name:
+        # vectors from another embedder are meaningless for this one
+        logger.warning("retrieval: index was built with %s", stored[b"embedder"].decode())
+        return []
+
+    dim = int(stored[b"dim"])
+    # zero-copy view over the redis bytes
+    matrix = np.frombuffer(stored[b"matrix"], dtype=np.float32).reshape(-1, dim)
+    chunks = json.loads(stored[b"chunks"])
+
+    with span("retrieval_search"):
+        query_vector = embedder.embed([question])[0]
+        best = search(matrix, query_vector, top_k)
+    if b"starts" not in stored:
+        return [chunks[i] for i in sorted(best)]
+    starts = np.frombuffer(stored[b"starts"], dtype=np.float32)
+    return [f"[{format_timestamp(starts[i])}] {chunks[i]}" for i in sorted(best)]
+
+
+async def retrieve_chunks(session_id: str, question: str, top_k: int = RETRIEVAL_TOP_K) -> List[str]:
+    """
+        The transcript chunks of the session most related to the question
+        (in transcript order, "[mm:ss] " prefixed when the index is timed).
+        Empty list if the session has no index.
+    """
+    try:
+        with span("redis_index"):
+            stored = await get_redis_binary().hgetall(_index_key(session_id))
+    except redis.exceptions.RedisError as e:
+        logger.warning("retrieval: redis get failed: %s", e)
+        return []
+    if not stored:
+        return []
+    return await run_fetch(_rank, stored, question, top_k)
@@ -0,0 +1,365 @@
+"""
+Admission control of the AI endpoints, in front of the router.
+
+Every POST to a summary or question endpoint needs a slot of its class before
+it reaches the app:
+
+    summary  /summary, /summary/stream, /summary/batch   (expensive: a whole transcript)
+    qa       /ask-question, /ask-question/stream           (cheap: a few chunks)
+
+Its cost is estimated up front, in tokens: the transcript when the video is in
+the in-process cache (else ADMISSION_SUMMARY_DEFAULT_TOKENS, per video of a
+batch running at once), the body size for a question. Without a free slot the
+request waits (ADMISSION_MAX_QUEUE_WAIT at most, never longer than its
+X-Request-Timeout); a full queue, a cost over the budget or a wait that runs
+out => 503 + Retry-After right away, before any transcript is fetched.
+
+Questions go first: a freed slot goes to a waiting question before a waiting
+summary, a summary never jumps a waiting question and summaries only get
+ADMISSION_SUMMARY_COST_SHARE of the cost budget.
+
+The slot is held until the response is sent (streams included). Everything
+runs on the event loop, no locks. Per worker process, like the executors.
+"""
+
+import asyncio
+import json
+import logging
+import math
+import time
+from collections import deque
+from typing import Deque, Dict, Tuple
+
+from app.caches import cached_transcript_tokens
+from app.configs.admission import (
+    ADMISSION_ENABLED,
+    ADMISSION_MAX_IN_FLIGHT,
+    ADMISSION_SUMMARY_MAX_IN_FLIGHT,
+    ADMISSION_QA_MAX_IN_FLIGHT,
+    ADMISSION_SUMMARY_MAX_QUEUE,
+    ADMISSION_QA_MAX_QUEUE,
+    ADMISSION_MAX_QUEUE_WAIT,
+    ADMISSION_MAX_COST_TOKENS,
+    ADMISSION_SUMMARY_COST_SHARE,
+    ADMISSION_SUMMARY_DEFAULT_TOKENS,
+    ADMISSION_QA_BASE_TOKENS,
+    ADMISSION_MAX_BODY_PEEK,
+    ADMISSION_MAX_RETRY_AFTER,
+)
+from app.configs.concurrency import BATCH_CONCURRENCY
+from app.configs.metrics import METRICS_ENABLED
+from .metrics import admission_shed, registry, span
+from .tokens import CHARS_PER_TOKEN
+from .youtube import extract_video_id
+
+logger = logging.getLogger(__name__)
+
+SUMMARY = "summary"
+QA = "qa"
+
+# cheapest first
+_PRIORITY = (QA, SUMMARY)
+
+# path below the AI router prefix -> class
+_ENDPOINTS = {
+    "/summary": SUMMARY,
+    "/summary/stream": SUMMARY,
+    "/summary/batch": SUMMARY,
+    "/ask-question": QA,
+    "/ask-question/stream": QA,
+}
+
+# weight of the last request in the average duration (Retry-After)
+_EWMA_WEIGHT = 0.2
+
+
+class Shed(Exception):
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(f"shed: {reason}")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+        await controller.acquire(cls, endpoint, cost, max_wait)   # or raises Shed
+        ... request ...
+        controller.release(cls, endpoint, cost, duration)
+    """
+
+    def __init__(
+        self,
+        max_in_flight: int = ADMISSION_MAX_IN_FLIGHT,
+        class_max_in_flight: Dict[str, int] | None = None,
+        class_max_queue: Dict[str, int] | None = None,
+        max_cost: int = ADMISSION_MAX_COST_TOKENS,
+        summary_cost_share: float = ADMISSION_SUMMARY_COST_SHARE,
+    ):
+        self.max_in_flight = max_in_flight
+        self.class_max_in_flight = class_max_in_flight or {
+            SUMMARY: ADMISSION_SUMMARY_MAX_IN_FLIGHT,
+            QA: ADMISSION_QA_MAX_IN_FLIGHT,
+        }
+        self.class_max_queue = class_max_queue or {SUMMARY: ADMISSION_SUMMARY_MAX_QUEUE, QA: ADMISSION_QA_MAX_QUEUE}
+        self.max_cost = max_cost
+        self.summary_cost_share = summary_cost_share
+        self._in_flight = {cls: 0 for cls in _PRIORITY}
+        # waiters in arrival order: (future, endpoint)
+        self._queues: Dict[str, Deque[Tuple[asyncio.Future, str]]] = {cls: deque() for cls in _PRIORITY}
+        # estimated tokens of the running + waiting requests
+        self._cost = 0
+        # average seconds a request holds its slot
+        self._duration = {cls: 0.0 for cls in _PRIORITY}
+        # endpoint -> {"in_flight", "queued"}
+        self._endpoints: Dict[str, Dict[str, int]] = {}
+
+    def _can_start(self, cls: str) -> bool:
+        return (
+            sum(self._in_flight.values()) < self.max_in_flight
+            and self._in_flight[cls] < self.class_max_in_flight[cls]
+        )
+
+    def _count(self, endpoint: str, state: str, delta: int) -> None:
+        counts = self._endpoints.setdefault(endpoint, {"in_flight": 0, "queued": 0})
+        counts[state] += delta
+
+    def retry_after(self, cls: str) -> int:
+        """
+            Seconds until a slot of the class is likely free: the waiting requests
+            ahead, run the average duration, as many at a time as the class allows.
+        """
+        waves = (len(self._queues[cls]) + 1) / max(self.class_max_in_flight[cls], 1)
+        return min(ADMISSION_MAX_RETRY_AFTER, max(1, math.ceil(self._duration[cls] * waves)))
+
+    async def acquire(self, cls: str, endpoint: str, cost: int, max_wait: float) -> float:
+        """
+            Takes a slot of the class, waiting up to max_wait for it.
+            Returns the seconds waited, raises Shed.
+        """
+        budget = self.max_cost * (self.summary_cost_share if cls == SUMMARY else 1.0)
+        # a single request above the budget still runs when nothing else does
+        if self._cost > 0 and self._cost + cost > budget:
+            raise Shed("cost", self.retry_after(cls))
+
+        # a summary doesn't jump the waiting questions
+        ahead = self._queues[QA] if cls == SUMMARY else ()
+        if not self._queues[cls] and not ahead and self._can_start(cls):
+            self._start(cls, endpoint, cost)
+            return 0.0
+        if len(self._queues[cls]) >= self.class_max_queue[cls] or max_wait <= 0:
+            raise Shed("queue_full", self.retry_after(cls))
+
+        future = asyncio.get_running_loop().create_future()
+        entry = (future, endpoint)
+        self._queues[cls].append(entry)
+        self._count(endpoint, "queued", 1)
+        self._cost += cost
+        started = time.monotonic()
+        try:
+            with span("admission_queue"):
+                await asyncio.wait_for(asyncio.shield(future), max_wait)
+        except asyncio.TimeoutError:
+            if not future.done():
+                self._dequeue(cls, entry, cost)
+                raise Shed("queue_timeout", self.retry_after(cls))
+            # the slot came with the timeout, keep it
+        except asyncio.CancelledError:
+            if future.done():
+                self.release(cls, endpoint, cost, 0.0, observe=False)
+            else:
+                self._dequeue(cls, entry, cost)
+            raise
+        return time.monotonic() - started
+
+    def _start(self, cls: str, endpoint: str, cost: int) -> None:
+        self._in_flight[cls] += 1
+        self._count(endpoint, "in_flight", 1)
+        self._cost += cost
+
+    def _dequeue(self, cls: str, entry: Tuple[asyncio.Future, str], cost: int) -> None:
+        self._queues[cls].remove(entry)
+        self._count(entry[1], "queued", -1)
+        self._cost -= cost
+        # a question leaving can unblock the summaries behind it
+        self._wake()
+
+    def release(self, cls: str, endpoint: str, cost: int, duration: float, observe: bool = True) -> None:
+        self._in_flight[cls] -= 1
+        self._count(endpoint, "in_flight", -1)
+        self._cost -= cost
+        if observe:
+            self._duration[cls] += _EWMA_WEIGHT * (duration - self._duration[cls])
+        self._wake()
+
+    def _wake(self) -> None:
+        for cls in _PRIORITY:
+            queue = self._queues[cls]
+            while queue and self._can_start(cls):
+                future, endpoint = queue.popleft()
+                # their cost is already counted since they queued
+                self._in_flight[cls] += 1
+                self._count(endpoint, "queued", -1)
+                self._count(endpoint, "in_flight", 1)
+                future.set_result(None)
+            if queue:
+                # questions still waiting: the summaries wait behind them
+                return
+
+    def snapshot(self) -> Dict[str, object]:
+        return {
+            "cost_tokens": self._cost,
+            "endpoints": {endpoint: dict(counts) for endpoint, counts in self._endpoints.items()},
+        }
+
+
+admission_controller = AdmissionController()
+
+
+def _header(scope, name: bytes) -> str | None:
+    for key, value in scope["headers"]:
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+
+def _float_header(scope, name: bytes) -> float | None:
+    try:
+        value = float(_header(scope, name) or "")
+    except ValueError:
+        return None
+    return value if value > 0 else None
+
+
+async def _buffer_body(receive):
+    """
+        (body, receive): reads the whole request body, the returned receive
+        replays it to the app, then goes on with the client (disconnects).
+    """
+    chunks = []
+    while True:
+        message = await receive()
+        if message["type"] != "http.request":
+            # gone already, the app sees the disconnect
+            replayed = [message]
+            break
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body"):
+            replayed = [{"type": "http.request", "body": b"".join(chunks), "more_body": False}]
+            break
+
+    async def replay():
+        if replayed:
+            return replayed.pop()
+        return await receive()
+
+    return b"".join(chunks), replay
+
+
+def _video_tokens(url) -> int:
+    video_id = extract_video_id(url) if isinstance(url, str) else None
+    return (cached_transcript_tokens(video_id) if video_id else None) or ADMISSION_SUMMARY_DEFAULT_TOKENS
+
+
+async def _estimate_cost(cls: str, endpoint: str, scope, receive):
+    """
+        (estimated tokens, receive to pass to the app)
+    """
+    content_length = int(_float_header(scope, b"content-length") or 0)
+    if cls == QA:
+        # the context chunks and the history are in the body
+        return ADMISSION_QA_BASE_TOKENS + content_length // CHARS_PER_TOKEN, receive
+    if content_length > ADMISSION_MAX_BODY_PEEK:
+        return ADMISSION_SUMMARY_DEFAULT_TOKENS, receive
+
+    body, receive = await _buffer_body(receive)
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        # the app answers 422
+        return ADMISSION_SUMMARY_DEFAULT_TOKENS, receive
+    if not isinstance(payload, dict):
+        return ADMISSION_SUMMARY_DEFAULT_TOKENS, receive
+    if endpoint == "/summary/batch":
+        urls = payload.get("youtube_urls")
+        # BATCH_CONCURRENCY videos are in memory at a time
+        urls = urls[:BATCH_CONCURRENCY] if isinstance(urls, list) and urls else [None]
+    else:
+        urls = [payload.get("youtube_url")]
+    return sum(_video_tokens(url) for url in urls), receive
+
+
+async def _send_shed(send, shed: Shed) -> None:
+    body = json.dumps({"detail": "The service is overloaded, try again later."}).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": 503,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(shed.retry_after).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+class AdmissionMiddleware:
+    """
+        Pure ASGI, like MetricsMiddleware (the streams are not buffered, their
+        slot is held until the last chunk). `prefix` is where the AI router is
+        mounted, the other paths go straight through.
+    """
+
+    def __init__(self, app, prefix: str, controller: AdmissionController = admission_controller):
+        self.app = app
+        self.prefix = prefix
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send):
+        cls = None
+        if scope["type"] == "http" and scope["method"] == "POST" and ADMISSION_ENABLED:
+            path = scope["path"]
+            endpoint = path[len(self.prefix):] if path.startswith(self.prefix) else None
+            cls = _ENDPOINTS.get(endpoint.rstrip("/")) if endpoint else None
+        if cls is None:
+            await self.app(scope, receive, send)
+            return
+
+        endpoint = endpoint.rstrip("/")
+        cost, receive = await _estimate_cost(cls, endpoint, scope, receive)
+        request_timeout = _float_header(scope, b"x-request-timeout")
+        max_wait = min(ADMISSION_MAX_QUEUE_WAIT, request_timeout or ADMISSION_MAX_QUEUE_WAIT)
+        try:
+            await self.controller.acquire(cls, endpoint, cost, max_wait)
+        except Shed as shed:
+            logger.warning("admission: %s request to %s shed (%s, ~%s tokens)", cls, endpoint, shed.reason, cost)
+            if METRICS_ENABLED:
+                admission_shed.inc(endpoint=endpoint, reason=shed.reason)
+            await _send_shed(send, shed)
+            return
+
+        started = time.monotonic()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(cls, endpoint, cost, time.monotonic() - started)
+
+
+def _admission_metrics() -> list[str]:
+    snapshot = admission_controller.snapshot()
+    lines = [
+        "# HELP ai_admission_requests AI requests holding a slot (in_flight) or waiting for one (queued), per endpoint.",
+        "# TYPE ai_admission_requests gauge",
+    ]
+    for endpoint, counts in snapshot["endpoints"].items():
+        for state, value in counts.items():
+            lines.append(f'ai_admission_requests{{endpoint="{endpoint}",state="{state}"}} {value}')
+    lines += [
+        "# HELP ai_admission_cost_tokens Estimated tokens of the admitted and queued AI requests, and the budget.",
+        "# TYPE ai_admission_cost_tokens gauge",
+        f'ai_admission_cost_tokens{{state="used"}} {snapshot["cost_tokens"]}',
+        f'ai_admission_cost_tokens{{state="limit"}} {admission_controller.max_cost}',
+    ]
+    return lines
+
+
+registry.add_collector(_admission_metrics)
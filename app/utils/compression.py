@@ -0,0 +1,76 @@
+"""
+Compression codecs for blobs we store (transcripts...).
+
+    gzip: stdlib, also a valid HTTP Content-Encoding, always available
+    zstd: faster and smaller, needs the optional `zstandard` package
+
+The codec name is stored next to the blob, so changing TRANSCRIPT_COMPRESSION
+never breaks the entries already written.
+"""
+
+import gzip
+import logging
+from functools import lru_cache
+
+logger = logging.getLogger(__name__)
+
+CODECS = ("gzip", "zstd")
+
+
+@lru_cache(maxsize=1)
+def _zstd():
+    try:
+        import zstandard
+    except ImportError:
+        return None
+    return zstandard
+
+
+def resolve_codec(codec: str) -> str:
+    """
+        The codec to write with: `codec`, or gzip when zstd is not installed.
+    """
+    if codec not in CODECS:
+        raise ValueError(f"Unknown compression codec: {codec!r} (use one of {CODECS}).")
+    if codec == "zstd" and _zstd() is None:
+        logger.warning("compression: zstandard is not installed, using gzip")
+        return "gzip"
+    return codec
+
+
+def compress(data: bytes, codec: str, level: int = 6) -> bytes:
+    if codec == "zstd":
+        return _zstd().ZstdCompressor(level=level).compress(data)
+    # mtime=0: same input -> same bytes
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+def decompress(data: bytes, codec: str) -> bytes:
+    if codec == "zstd":
+        if _zstd() is None:
+            raise RuntimeError("This blob is zstd compressed, `pip install zstandard` to read it.")
+        return _zstd().ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+
+def accepts_encoding(accept_encoding: str | None, codec: str) -> bool:
+    """
+        True when an Accept-Encoding header allows `codec` (q > 0): "gzip;q=0"
+        or "identity" don't, "*" does unless the codec is listed with q=0.
+    """
+    weights = {}
+    for item in (accept_encoding or "").split(","):
+        name, _, params = item.partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights["gzip" if name == "x-gzip" else name] = q
+    return weights.get(codec, weights.get("*", 0.0)) > 0
@@ -0,0 +1,125 @@
+"""
+Execution layer for the blocking parts of a request.
+
+yt-dlp, youtube_transcript_api and Crew.kickoff() are all synchronous, so calling
+them from an `async def` blocks the whole event loop (every other request in the
+worker waits). Here we offload them to two bounded thread pools:
+    - fetch: network calls to YouTube
+    - llm: CrewAI / Gemini calls
+and cancel the request when the client goes away.
+"""
+
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Awaitable, Callable, Tuple, TypeVar
+
+from fastapi import HTTPException, Request
+
+from app.configs.concurrency import (
+    FETCH_MAX_WORKERS,
+    LLM_MAX_WORKERS,
+    FETCH_CONCURRENCY,
+    LLM_CONCURRENCY,
+    DISCONNECT_POLL_INTERVAL,
+)
+
+T = TypeVar("T")
+
+_fetch_executor = ThreadPoolExecutor(max_workers=FETCH_MAX_WORKERS, thread_name_prefix="fetch")
+_llm_executor = ThreadPoolExecutor(max_workers=LLM_MAX_WORKERS, thread_name_prefix="llm")
+
+_fetch_limit = asyncio.Semaphore(FETCH_CONCURRENCY)
+_llm_limit = asyncio.Semaphore(LLM_CONCURRENCY)
+
+
+async def _run_in(
+    executor: ThreadPoolExecutor,
+    limit: asyncio.Semaphore,
+    func: Callable[..., T],
+    *args: Any,
+    **kwargs: Any,
+) -> T:
+    # wait for a slot on the event loop first, so a cancelled request
+    # never gets submitted to the pool at all
+    async with limit:
+        loop = asyncio.get_running_loop()
+        # run_in_executor doesn't carry contextvars (metrics of the request) to the thread
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(executor, functools.partial(context.run, func, *args, **kwargs))
+
+
+async def run_fetch(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """
+        Runs a blocking YouTube/network call in the fetch pool.
+    """
+    return await _run_in(_fetch_executor, _fetch_limit, func, *args, **kwargs)
+
+
+async def run_llm(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """
+        Runs a blocking LLM (Crew.kickoff) call in the llm pool.
+    """
+    return await _run_in(_llm_executor, _llm_limit, func, *args, **kwargs)
+
+
+async def stream_llm(func: Callable[..., Any], *args: Any, **kwargs: Any) -> AsyncIterator[Tuple[str, Any]]:
+    """
+        Runs `func(*args, on_token=..., **kwargs)` in the llm pool and yields
+            ("token", text) for every token the thread reports, then
+            ("result", return value of func)
+        Exceptions of func are raised from the iteration.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+
+    def on_token(text: str) -> None:
+        # called from the worker thread
+        loop.call_soon_threadsafe(queue.put_nowait, text)
+
+    task = asyncio.ensure_future(run_llm(func, *args, on_token=on_token, **kwargs))
+    # scheduled after every token of the thread, so it always comes last
+    task.add_done_callback(lambda _: queue.put_nowait(None))
+    try:
+        while (text := await queue.get()) is not None:
+            yield "token", text
+        yield "result", task.result()
+    finally:
+        if not task.done():
+            task.cancel()
+
+
+async def _wait_for_disconnect(request: Request) -> None:
+    while not await request.is_disconnected():
+        await asyncio.sleep(DISCONNECT_POLL_INTERVAL)
+
+
+async def cancel_on_disconnect(request: Request, work: Awaitable[T]) -> T:
+    """
+        Awaits `work` but cancels it as soon as the client disconnects.
+
+        Note: a thread that is already running can't be killed, so a started
+        kickoff() will finish in the background, but everything after it
+        (and anything still waiting for a slot) is dropped.
+    """
+    task = asyncio.ensure_future(work)
+    watcher = asyncio.ensure_future(_wait_for_disconnect(request))
+    try:
+        await asyncio.wait({task, watcher}, return_when=asyncio.FIRST_COMPLETED)
+    except asyncio.CancelledError:
+        task.cancel()
+        raise
+    finally:
+        watcher.cancel()
+
+    if not task.done():
+        task.cancel()
+        # 499 = "Client Closed Request" (nginx convention), nobody will read it anyway
+        raise HTTPException(status_code=499, detail="Client disconnected.")
+    return task.result()
+
+
+def shutdown_executors() -> None:
+    _fetch_executor.shutdown(wait=False, cancel_futures=True)
+    _llm_executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,258 @@
+"""
+In-process metrics in the Prometheus text format (no client library needed).
+
+    with span("yt_dlp_metadata"):
+        ...
+
+records the duration in `ai_stage_duration_seconds{stage, outcome}` and, when
+METRICS_LOG_SPANS is on, in the trace of the current request (one JSON log line
+per request, see MetricsMiddleware). The request context is copied into the
+fetch/llm threads (app/utils/concurrency.py), so spans of a thread belong to
+the request that started it.
+
+Cost on the hot path: two perf_counter() calls, a dict lookup and a lock per
+observation (~1-2us).
+"""
+
+import bisect
+import contextvars
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Tuple
+
+from app.configs.metrics import METRICS_ENABLED, METRICS_LOG_SPANS, METRICS_BUCKETS
+
+logger = logging.getLogger("app.metrics")
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# ASGI scope of the current request (the route is only known after routing)
+_current_scope: contextvars.ContextVar[dict | None] = contextvars.ContextVar("current_scope", default=None)
+_current_trace: contextvars.ContextVar[List[dict] | None] = contextvars.ContextVar("current_trace", default=None)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels_text(labelnames: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = list(self._values.items())
+        lines += [f"{self.name}{_labels_text(self.labelnames, key)} {value}" for key, value in items]
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = (), buckets: Tuple[float, ...] = METRICS_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = tuple(sorted(buckets))
+        self._bounds = [f'le="{bound}"' for bound in self.buckets] + ['le="+Inf"']
+        # labels -> [count per bucket (not cumulative) + overflow, sum]
+        self._values: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][index] += 1
+            state[1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = [(key, list(counts), total) for key, (counts, total) in self._values.items()]
+        for key, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self._bounds, counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_labels_text(self.labelnames, key, bound)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels_text(self.labelnames, key)} {total}")
+            lines.append(f"{self.name}_count{_labels_text(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: list = []
+        # called at scrape time, return already formatted lines (cache stats, pools...)
+        self._collectors: List[Callable[[], List[str]]] = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Callable[[], List[str]]) -> None:
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines += metric.render()
+        for collector in self._collectors:
+            try:
+                lines += collector()
+            except Exception as e:
+                logger.warning("metrics collector failed: %s", e)
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+stage_duration = registry.register(Histogram(
+    "ai_stage_duration_seconds", "Duration of one stage (yt-dlp, transcript, redis, LLM...).", ("stage", "outcome")
+))
+request_duration = registry.register(Histogram(
+    "ai_http_request_duration_seconds", "HTTP request duration by route.", ("endpoint", "method", "status")
+))
+llm_tokens = registry.register(Counter(
+    "ai_llm_tokens_total", "LLM tokens by model, endpoint and direction (input/output).", ("model", "endpoint", "direction")
+))
+llm_calls = registry.register(Counter(
+    "ai_llm_calls_total", "Crew kickoffs by model and endpoint.", ("model", "endpoint")
+))
+intent_routes = registry.register(Counter(
+    "ai_intent_routes_total", "Chat questions by route and by what decided it (rules/model/default).", ("route", "source")
+))
+llm_resilience = registry.register(Counter(
+    "ai_llm_resilience_events_total",
+    "LLM call events: retry, hedge, hedge_won, attempt_timeout, deadline_exceeded, breaker_opened, breaker_rejected.",
+    ("model", "event"),
+))
+llm_routes = registry.register(Counter(
+    "ai_llm_routes_total",
+    "LLM requests by kind (summary/qa), model that answered and why it was picked (short, long, route, breaker_open, saturated, slow, overloaded).",
+    ("kind", "model", "reason"),
+))
+llm_route_fallbacks = registry.register(Counter(
+    "ai_llm_route_fallbacks_total", "Requests moved from their routed model to the fallback model, by cause.", ("model", "fallback", "cause")
+))
+admission_shed = registry.register(Counter(
+    "ai_admission_shed_total", "Requests refused with 503 by admission control, by endpoint and reason (queue_full, cost, queue_timeout).", ("endpoint", "reason")
+))
+llm_rate_limit = registry.register(Counter(
+    "ai_llm_rate_limit_total",
+    "LLM quota checks by model, outcome (allowed, waited, rejected, skipped hedge) and where the buckets were (redis/local).",
+    ("model", "outcome", "backend"),
+))
+
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    """
+        Times the block as `stage` (outcome="error" if it raises).
+    """
+    if not METRICS_ENABLED:
+        yield
+        return
+    started = time.perf_counter()
+    outcome = "ok"
+    try:
+        yield
+    except BaseException:
+        outcome = "error"
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        stage_duration.observe(elapsed, stage=stage, outcome=outcome)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.append({"stage": stage, "ms": round(elapsed * 1000, 2), "outcome": outcome})
+
+
+def _route_of(scope: dict | None) -> str:
+    if scope is None:
+        # jobs worker, warm-up...
+        return "background"
+    template = getattr(scope.get("route"), "path", None)
+    if not template:
+        return "unmatched"
+    # routes of included routers only know their own path ("/summary/jobs/{job_id}"),
+    # the prefix is the part of the real path before the same number of segments
+    segments = template.count("/")
+    prefix = scope["path"].rsplit("/", segments)[0] if segments else scope["path"]
+    return prefix + template
+
+
+def record_llm_usage(model: str, input_tokens: int, output_tokens: int) -> None:
+    if not METRICS_ENABLED:
+        return
+    endpoint = _route_of(_current_scope.get())
+    llm_calls.inc(model=model, endpoint=endpoint)
+    llm_tokens.inc(input_tokens or 0, model=model, endpoint=endpoint, direction="input")
+    llm_tokens.inc(output_tokens or 0, model=model, endpoint=endpoint, direction="output")
+
+
+def render_metrics() -> str:
+    return registry.render()
+
+
+class MetricsMiddleware:
+    """
+        Pure ASGI (no BaseHTTPMiddleware: it would buffer the streaming responses).
+        Labels requests by route template, so /summary/jobs/{job_id} is one series.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        status = {"code": 500}
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        trace: List[dict] | None = [] if METRICS_LOG_SPANS else None
+        trace_token = _current_trace.set(trace)
+        scope_token = _current_scope.set(scope)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            endpoint = _route_of(scope)
+            request_duration.observe(elapsed, endpoint=endpoint, method=scope["method"], status=status["code"])
+            if trace is not None:
+                logger.info(json.dumps({
+                    "endpoint": endpoint,
+                    "status": status["code"],
+                    "ms": round(elapsed * 1000, 2),
+                    "spans": trace,
+                }))
+            _current_trace.reset(trace_token)
+            _current_scope.reset(scope_token)
@@ -0,0 +1,13 @@
+"""
+Newline-delimited JSON for the batch endpoints: one JSON object per line,
+flushed as soon as it is ready.
+"""
+
+import json
+from typing import Any, Dict
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+def ndjson_line(data: Dict[str, Any]) -> str:
+    return json.dumps(data, ensure_ascii=False) + "\n"
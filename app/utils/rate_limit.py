@@ -0,0 +1,276 @@
+"""
+Cluster-wide quota of the LLM provider (Gemini counts requests AND tokens per
+minute, per model, for the whole project: every uvicorn worker of every pod).
+
+Token buckets in redis, per model:
+
+    {prefix}:{model}:all:rpm / :tpm              the whole quota
+    {prefix}:{model}:tenant:{tenant}:rpm / :tpm  LLM_RATE_TENANT_SHARE of it, per API key
+
+A call takes 1 request + its estimated tokens from every bucket at once (one Lua
+script, all or nothing, redis TIME so the pods' clocks don't matter) or gets
+how long to wait for them. It waits (LLM_RATE_MAX_WAIT at most, never past the
+request deadline) and tries again, else RateLimitedError (429 + Retry-After)
+instead of a cascade of provider 429s. The real token usage corrects the
+estimate after the call (settle).
+
+When redis can't be reached the same buckets live in the process, with
+1/LLM_RATE_LOCAL_WORKERS of the quota, until redis answers again.
+"""
+
+import contextvars
+import hashlib
+import logging
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+import redis
+
+from app.configs import get_redis, model_key, run_redis_sync
+from app.configs.metrics import METRICS_ENABLED
+from app.configs.rate_limit import (
+    LLM_RATE_RPM,
+    LLM_RATE_TPM,
+    LLM_RATE_MODEL_LIMITS,
+    LLM_RATE_BURST_SECONDS,
+    LLM_RATE_TENANT_SHARE,
+    LLM_RATE_MAX_WAIT,
+    LLM_RATE_KEY_PREFIX,
+    LLM_RATE_LOCAL_WORKERS,
+    LLM_RATE_REDIS_RETRY,
+    LLM_RATE_REDIS_TIMEOUT,
+)
+from .metrics import llm_rate_limit, span
+from .resilience import remaining
+
+logger = logging.getLogger(__name__)
+
+# hash of the API key of the current request, jobs / warm-up have none
+_tenant: contextvars.ContextVar[str] = contextvars.ContextVar("tenant", default="background")
+
+# (key, refill per second, capacity, cost)
+Bucket = Tuple[str, float, float, float]
+
+# KEYS: buckets. ARGV: rate, capacity, cost of every bucket, in order.
+# Returns "0" (taken from every bucket) or the seconds to wait (nothing taken).
+# A missing bucket is full, an idle one expires once it would be full again.
+_TAKE = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local levels = {}
+local wait = 0
+for i = 1, #KEYS do
+    local rate, capacity, cost = tonumber(ARGV[3 * i - 2]), tonumber(ARGV[3 * i - 1]), tonumber(ARGV[3 * i])
+    local bucket = redis.call('HMGET', KEYS[i], 'level', 'at')
+    local level = tonumber(bucket[1]) or capacity
+    local at = tonumber(bucket[2]) or now
+    level = math.min(capacity, level + math.max(0, now - at) * rate)
+    levels[i] = level
+    -- a cost above the capacity goes through on a full bucket (and leaves a debt)
+    local needed = math.min(cost, capacity)
+    if level < needed then
+        wait = math.max(wait, (needed - level) / rate)
+    end
+end
+if wait > 0 then
+    return tostring(wait)
+end
+for i = 1, #KEYS do
+    local rate, capacity, cost = tonumber(ARGV[3 * i - 2]), tonumber(ARGV[3 * i - 1]), tonumber(ARGV[3 * i])
+    local level = levels[i] - cost
+    redis.call('HSET', KEYS[i], 'level', tostring(level), 'at', tostring(now))
+    redis.call('PEXPIRE', KEYS[i], math.ceil((capacity - level) / rate * 1000) + 1000)
+end
+return '0'
+"""
+
+# KEYS: buckets. ARGV: tokens to give back (negative: taken too few)
+_REFUND = """
+for i = 1, #KEYS do
+    if redis.call('EXISTS', KEYS[i]) == 1 then
+        redis.call('HINCRBYFLOAT', KEYS[i], 'level', ARGV[1])
+    end
+end
+return #KEYS
+"""
+
+
+class RateLimitedError(Exception):
+    def __init__(self, model: str, retry_after: float):
+        super().__init__(f"The quota of {model} is used up, try again in {retry_after:.0f}s.")
+        self.retry_after = retry_after
+
+
+def tenant_id(api_key: str | None) -> str:
+    # the key itself never goes to redis or the metrics
+    if not api_key:
+        return "anonymous"
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:12]
+
+
+def set_tenant(api_key: str | None) -> None:
+    """
+        The current request is counted for this API key (sticks to the current context).
+    """
+    _tenant.set(tenant_id(api_key))
+
+
+def current_tenant() -> str:
+    return _tenant.get()
+
+
+class LocalTokenBuckets:
+    """
+        Same buckets as the _TAKE / _REFUND scripts, in the process.
+    """
+
+    def __init__(self):
+        # key -> [level, at]
+        self._buckets: Dict[str, list] = {}
+        self._lock = threading.Lock()
+
+    def take(self, buckets: List[Bucket]) -> float:
+        now = time.monotonic()
+        with self._lock:
+            levels, wait = [], 0.0
+            for key, rate, capacity, cost in buckets:
+                level, at = self._buckets.get(key, (capacity, now))
+                level = min(capacity, level + max(0.0, now - at) * rate)
+                levels.append(level)
+                needed = min(cost, capacity)
+                if level < needed:
+                    wait = max(wait, (needed - level) / rate)
+            if wait > 0:
+                return wait
+            for (key, _, _, cost), level in zip(buckets, levels):
+                self._buckets[key] = [level - cost, now]
+            return 0.0
+
+    def refund(self, keys: List[str], amount: float) -> None:
+        with self._lock:
+            for key in keys:
+                if key in self._buckets:
+                    self._buckets[key][0] += amount
+
+
+_scripts: Dict[str, Any] = {}
+
+
+def _redis_script(source: str, keys: List[str], args: List[Any]) -> Any:
+    # registered lazily, the redis client only exists once the app started
+    if source not in _scripts:
+        _scripts[source] = get_redis().register_script(source)
+    script = _scripts[source]
+    return run_redis_sync(lambda r: script(keys=keys, args=args), timeout=LLM_RATE_REDIS_TIMEOUT)
+
+
+class RateLimiter:
+    """
+        limiter.acquire(model, tokens)        # waits for the quota or raises RateLimitedError
+        ... call ...
+        limiter.settle(model, tokens, used)   # real usage
+
+        `run_script(source, keys, args)` runs a Lua script on the shared redis
+        (run_redis_sync on the app pool by default).
+    """
+
+    def __init__(
+        self,
+        run_script: Callable[[str, List[str], List[Any]], Any] = _redis_script,
+        local_workers: int = LLM_RATE_LOCAL_WORKERS,
+    ):
+        self._run_script = run_script
+        self._local_workers = local_workers
+        self._local = LocalTokenBuckets()
+        self._redis_down_until = 0.0
+
+    def _buckets(self, model: str, tenant: str, tokens: int, share: float = 1.0) -> List[Bucket]:
+        # llm.model or a configured name, one quota either way
+        model = model_key(model)
+        rpm, tpm = LLM_RATE_MODEL_LIMITS.get(model, (LLM_RATE_RPM, LLM_RATE_TPM))
+        scopes = [("all", 1.0)]
+        if LLM_RATE_TENANT_SHARE < 1:
+            scopes.append((f"tenant:{tenant}", LLM_RATE_TENANT_SHARE))
+        buckets = []
+        for scope, scope_share in scopes:
+            for name, per_minute, cost in (("rpm", rpm, 1), ("tpm", tpm, tokens)):
+                rate = per_minute * scope_share * share / 60
+                # at least one request / one call of this size must fit
+                capacity = max(rate * LLM_RATE_BURST_SECONDS, 1.0)
+                buckets.append((f"{LLM_RATE_KEY_PREFIX}:{model}:{scope}:{name}", rate, capacity, cost))
+        return buckets
+
+    def _take(self, model: str, tenant: str, tokens: int) -> Tuple[float, str]:
+        """
+            (seconds to wait, 0 => taken; backend that decided: redis | local)
+        """
+        if time.monotonic() >= self._redis_down_until:
+            buckets = self._buckets(model, tenant, tokens)
+            args = [value for _, rate, capacity, cost in buckets for value in (rate, capacity, cost)]
+            try:
+                return float(self._run_script(_TAKE, [key for key, _, _, _ in buckets], args)), "redis"
+            except (redis.exceptions.RedisError, ConnectionError, RuntimeError) as e:
+                logger.warning("rate limit: redis unreachable, limiting in the process for %ss: %s", LLM_RATE_REDIS_RETRY, e)
+                self._redis_down_until = time.monotonic() + LLM_RATE_REDIS_RETRY
+        # this process' share of the quota
+        return self._local.take(self._buckets(model, tenant, tokens, 1 / self._local_workers)), "local"
+
+    def try_acquire(self, model: str, tokens: int) -> bool:
+        """
+            Takes the quota of one call only if it's there right away (hedges).
+        """
+        wait, backend = self._take(model, current_tenant(), tokens)
+        self._count(model, "allowed" if wait == 0 else "skipped", backend)
+        return wait == 0
+
+    def acquire(self, model: str, tokens: int, max_wait: float = LLM_RATE_MAX_WAIT) -> float:
+        """
+            Takes 1 request + `tokens` of the model's quota (global and tenant),
+            waiting for them up to max_wait and the request deadline.
+            Returns the seconds waited, raises RateLimitedError.
+        """
+        tenant = current_tenant()
+        started = time.monotonic()
+        wait, backend = self._take(model, tenant, tokens)
+        if wait == 0:
+            self._count(model, "allowed", backend)
+            return 0.0
+        with span("llm_rate_limit_wait"):
+            while wait > 0:
+                waited = time.monotonic() - started
+                left = remaining()
+                budget = max_wait - waited if left is None else min(max_wait - waited, left)
+                if wait > budget:
+                    self._count(model, "rejected", backend)
+                    raise RateLimitedError(model, wait)
+                # jitter: the callers woken by the same refill don't all come back together
+                time.sleep(wait * random.uniform(1.0, 1.2))
+                wait, backend = self._take(model, tenant, tokens)
+        self._count(model, "waited", backend)
+        return time.monotonic() - started
+
+    def settle(self, model: str, estimated: int, used: int) -> None:
+        """
+            Gives back (or takes) the difference between the estimated and the real tokens.
+        """
+        if used == estimated:
+            return
+        buckets = self._buckets(model, current_tenant(), 0)
+        keys = [key for key, _, _, _ in buckets if key.endswith(":tpm")]
+        if time.monotonic() >= self._redis_down_until:
+            try:
+                self._run_script(_REFUND, keys, [estimated - used])
+                return
+            except (redis.exceptions.RedisError, ConnectionError, RuntimeError):
+                self._redis_down_until = time.monotonic() + LLM_RATE_REDIS_RETRY
+        self._local.refund(keys, estimated - used)
+
+    @staticmethod
+    def _count(model: str, outcome: str, backend: str) -> None:
+        if METRICS_ENABLED:
+            llm_rate_limit.inc(model=model, outcome=outcome, backend=backend)
+
+
+rate_limiter = RateLimiter()
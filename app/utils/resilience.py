@@ -0,0 +1,195 @@
+"""
+Building blocks for calling a slow / flaky dependency (the LLM provider):
+
+    - deadline of the request: a contextvar, so it follows the request into the
+      fetch/llm threads (app/utils/concurrency.py copies the context)
+    - LatencyTracker: recent latencies, to know when a call is "slow" (hedging)
+    - CircuitBreaker: fails fast while the dependency keeps failing
+    - backoff_delay: exponential backoff with full jitter
+
+Nothing here knows about crewai, app/ai_agents/invoke.py puts them together.
+"""
+
+import bisect
+import contextvars
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Iterator
+
+# time.monotonic() after which the current request is useless for its client
+_deadline: contextvars.ContextVar[float | None] = contextvars.ContextVar("deadline", default=None)
+
+
+class DeadlineExceeded(TimeoutError):
+    pass
+
+
+class CircuitOpenError(Exception):
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"{name} is failing, calls are paused for {retry_after:.0f}s.")
+        self.retry_after = retry_after
+
+
+def set_deadline(seconds: float) -> None:
+    """
+        The current request must be done within `seconds` (an earlier deadline wins).
+        Sticks to the current context, use `deadline()` to undo it after a block.
+    """
+    at = time.monotonic() + seconds
+    current = _deadline.get()
+    _deadline.set(at if current is None else min(current, at))
+
+
+@contextmanager
+def deadline(seconds: float | None) -> Iterator[None]:
+    """
+        with deadline(60): ...   (None => no extra deadline)
+    """
+    token = _deadline.set(_deadline.get())
+    try:
+        if seconds is not None:
+            set_deadline(seconds)
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining() -> float | None:
+    """
+        Seconds left before the deadline (<= 0 when it's passed), None without a deadline.
+    """
+    at = _deadline.get()
+    return None if at is None else at - time.monotonic()
+
+
+def check_deadline() -> None:
+    left = remaining()
+    if left is not None and left <= 0:
+        raise DeadlineExceeded("The request deadline was exceeded.")
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    # "full jitter": uniform in [0, base * 2^(attempt-1)], retries of many
+    # requests failing together don't come back together
+    return random.uniform(0, min(cap, base * 2 ** (attempt - 1)))
+
+
+class LatencyTracker:
+    """
+        The last `window` latencies (seconds), sorted, for percentiles.
+    """
+
+    def __init__(self, window: int):
+        self._recent: deque = deque(maxlen=window)
+        self._sorted: list = []
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            if len(self._recent) == self._recent.maxlen:
+                oldest = self._recent[0]
+                del self._sorted[bisect.bisect_left(self._sorted, oldest)]
+            self._recent.append(seconds)
+            bisect.insort(self._sorted, seconds)
+
+    def percentile(self, q: float) -> float | None:
+        with self._lock:
+            if not self._sorted:
+                return None
+            return self._sorted[min(len(self._sorted) - 1, int(q * len(self._sorted)))]
+
+    def __len__(self) -> int:
+        return len(self._recent)
+
+
+class CircuitBreaker:
+    """
+        closed -> open      error rate of the last `window` seconds >= error_rate
+                            (with at least min_calls calls)
+        open -> half_open   after open_seconds, ONE probe call is let through
+        half_open -> closed the probe worked / -> open it failed
+
+        generation = breaker.before_call()   # raises CircuitOpenError while open
+        ... call ...
+        breaker.record(ok, generation)
+
+        Every state change starts a new generation: the answer of a call started
+        in an older one (before the breaker opened) is dropped, only the probe
+        decides how half_open ends.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, name: str, window: float, min_calls: int, error_rate: float, open_seconds: float):
+        self.name = name
+        self.window = window
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.open_seconds = open_seconds
+        self.state = self.CLOSED
+        self.opened = 0
+        # (time, ok) of the recent calls
+        self._calls: deque = deque()
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def _trim(self, now: float) -> None:
+        while self._calls and self._calls[0][0] < now - self.window:
+            _, ok = self._calls.popleft()
+            if not ok:
+                self._failures -= 1
+
+    def before_call(self) -> int:
+        """
+            The generation to pass to record(), raises CircuitOpenError.
+        """
+        with self._lock:
+            if self.state == self.CLOSED:
+                return self._generation
+            wait = self._opened_at + self.open_seconds - time.monotonic()
+            if self.state == self.OPEN and wait <= 0:
+                self.state = self.HALF_OPEN
+                self._generation += 1
+            if self.state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return self._generation
+            raise CircuitOpenError(self.name, max(wait, 1.0))
+
+    def record(self, ok: bool, generation: int) -> None:
+        now = time.monotonic()
+        with self._lock:
+            if generation != self._generation or self.state == self.OPEN:
+                # late answers of calls started before the last state change
+                return
+            if self.state == self.HALF_OPEN:
+                # only the probe has this generation
+                self._probing = False
+                if ok:
+                    self.state = self.CLOSED
+                    self._generation += 1
+                    self._calls.clear()
+                    self._failures = 0
+                else:
+                    self._open(now)
+                return
+            self._calls.append((now, ok))
+            if not ok:
+                self._failures += 1
+            self._trim(now)
+            if len(self._calls) >= self.min_calls and self._failures / len(self._calls) >= self.error_rate:
+                self._open(now)
+
+    def _open(self, now: float) -> None:
+        self.state = self.OPEN
+        self._generation += 1
+        self.opened += 1
+        self._opened_at = now
+
+    def retry_after(self) -> float:
+        return max(0.0, self._opened_at + self.open_seconds - time.monotonic())
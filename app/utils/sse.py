@@ -0,0 +1,22 @@
+"""
+Server-Sent Events helpers for the /stream endpoints.
+
+Every event is `event: <name>` + one JSON `data:` line, e.g.
+
+    event: token
+    data: {"text": "Docker is"}
+"""
+
+import json
+from typing import Any, Dict
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "Connection": "keep-alive",
+    # nginx buffers responses by default, that would kill the time to first byte
+    "X-Accel-Buffering": "no",
+}
+
+
+def sse_event(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
@@ -0,0 +1,81 @@
+"""
+Cheap token counting / text splitting helpers (no tokenizer download needed).
+
+Gemini doesn't ship a local tokenizer, so we estimate: ~4 characters per token
+is what the usage metrics show for English transcripts, and it errs on the
+safe (bigger) side for most other languages.
+"""
+
+import re
+from typing import List
+
+CHARS_PER_TOKEN = 4
+
+# end of sentence in latin, arabic and cjk punctuation
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?؟。！？])\s+")
+
+
+def estimate_tokens(text: str) -> int:
+    if not text:
+        return 0
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def split_sentences(text: str) -> List[str]:
+    return [s for s in _SENTENCE_END_RE.split(text.strip()) if s]
+
+
+def _split_words(text: str, max_tokens: int) -> List[str]:
+    # auto-generated transcripts often have no punctuation at all,
+    # so a "sentence" can be the whole video, fall back to word boundaries
+    parts, current, current_tokens = [], [], 0
+    for word in text.split():
+        word_tokens = estimate_tokens(word) + 1
+        if current and current_tokens + word_tokens > max_tokens:
+            parts.append(" ".join(current))
+            current, current_tokens = [], 0
+        current.append(word)
+        current_tokens += word_tokens
+    if current:
+        parts.append(" ".join(current))
+    return parts
+
+
+def split_into_chunks(text: str, max_tokens: int) -> List[str]:
+    """
+    Splits text into chunks of at most ~max_tokens, cutting only between sentences
+    (or between words when a single sentence is bigger than max_tokens).
+    """
+    chunks, current, current_tokens = [], [], 0
+    for sentence in split_sentences(text):
+        sentence_tokens = estimate_tokens(sentence) + 1
+        pieces = [sentence] if sentence_tokens <= max_tokens else _split_words(sentence, max_tokens)
+        for piece in pieces:
+            piece_tokens = estimate_tokens(piece) + 1
+            if current and current_tokens + piece_tokens > max_tokens:
+                chunks.append(" ".join(current))
+                current, current_tokens = [], 0
+            current.append(piece)
+            current_tokens += piece_tokens
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
+
+
+def truncate_to_tokens(text: str, max_tokens: int, keep: str = "head") -> str:
+    """
+    Cuts text to at most ~max_tokens (estimate_tokens(result) <= max_tokens),
+    on a word boundary when there is one. keep="tail" keeps the end instead.
+    """
+    if max_tokens <= 0:
+        return ""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if keep == "tail":
+        cut = text[-max_chars:]
+        space = cut.find(" ")
+        return cut[space + 1:] if 0 <= space < len(cut) // 2 else cut
+    cut = text[:max_chars]
+    space = cut.rfind(" ")
+    return cut[:space] if space > len(cut) // 2 else cut
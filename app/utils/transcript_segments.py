@@ -0,0 +1,166 @@
+"""
+Compact, timestamped transcript: the text of every caption segment in ONE
+utf-8 buffer (segments separated by a space, so the buffer IS the flat
+transcript text) plus three array columns:
+
+    starts[i]     float32 seconds
+    durations[i]  float32 seconds
+    offsets[i]    uint32 byte offset of segment i in the buffer (n + 1 entries)
+
+Time lookups are a bisect over `starts` (O(log n)), text spans are memoryview
+slices of the buffer (no copy until decoded).
+
+Binary format (little endian), used for redis:
+
+    b"TSG1" | uint32 n | float32[n] starts | float32[n] durations | uint32[n + 1] offsets | utf-8 text
+"""
+
+import bisect
+import struct
+import sys
+from array import array
+from typing import Iterable, List, Tuple
+
+from app.utils.tokens import CHARS_PER_TOKEN
+
+_MAGIC = b"TSG1"
+_HEADER = struct.Struct("<4sI")
+_LITTLE_ENDIAN = sys.byteorder == "little"
+
+
+def format_timestamp(seconds: float) -> str:
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes:02d}:{seconds:02d}"
+
+
+def _column(typecode: str, values=()) -> array:
+    column = array(typecode, values)
+    if column.itemsize != struct.calcsize(typecode):
+        raise RuntimeError(f"array('{typecode}') has an unexpected item size on this platform")
+    return column
+
+
+class TranscriptSegments:
+    __slots__ = ("starts", "durations", "offsets", "_buffer", "_text")
+
+    def __init__(self, starts: array, durations: array, offsets: array, buffer: bytes | memoryview):
+        self.starts = starts
+        self.durations = durations
+        self.offsets = offsets
+        self._buffer = memoryview(buffer)
+        self._text: str | None = None
+
+    @classmethod
+    def from_snippets(cls, snippets: Iterable) -> "TranscriptSegments":
+        """
+            From youtube_transcript_api snippets (.text, .start, .duration).
+            Newlines are removed like the flat transcript always did.
+        """
+        starts, durations, offsets = _column("f"), _column("f"), _column("I")
+        parts: List[bytes] = []
+        position = 0
+        for snippet in snippets:
+            encoded = snippet.text.replace("\n", "").encode("utf-8")
+            starts.append(snippet.start)
+            durations.append(snippet.duration)
+            offsets.append(position)
+            parts.append(encoded)
+            position += len(encoded) + 1
+        # end of the last segment (+1 for the missing separator)
+        offsets.append(position)
+        return cls(starts, durations, offsets, b" ".join(parts))
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    @property
+    def text(self) -> str:
+        # the flat transcript, decoded once
+        if self._text is None:
+            self._text = str(self._buffer, "utf-8")
+        return self._text
+
+    @property
+    def duration(self) -> float:
+        if not self.starts:
+            return 0.0
+        return self.starts[-1] + self.durations[-1]
+
+    # --- lookups ---
+
+    def index_at(self, seconds: float) -> int:
+        """
+            The segment being spoken at `seconds` (the last one that started before it).
+        """
+        return max(bisect.bisect_right(self.starts, seconds) - 1, 0)
+
+    def range_for(self, start: float, end: float) -> Tuple[int, int]:
+        """
+            [i, j) of the segments that overlap the time range [start, end).
+        """
+        i = bisect.bisect_right(self.starts, start) - 1
+        if i < 0 or self.starts[i] + self.durations[i] <= start:
+            i += 1
+        j = bisect.bisect_left(self.starts, end)
+        return i, max(i, j)
+
+    def view(self, i: int, j: int) -> memoryview:
+        """
+            Zero-copy utf-8 bytes of segments [i, j) (separators included).
+        """
+        if i >= j:
+            return self._buffer[0:0]
+        return self._buffer[self.offsets[i]:self.offsets[j] - 1]
+
+    def text_between(self, start: float, end: float) -> str:
+        return str(self.view(*self.range_for(start, end)), "utf-8")
+
+    def chunks(self, max_tokens: int) -> List[Tuple[float, str]]:
+        """
+            Consecutive segments grouped in chunks of ~max_tokens: [(start seconds, text)].
+        """
+        result: List[Tuple[float, str]] = []
+        first, tokens = 0, 0
+        for i in range(len(self)):
+            # bytes / 4: same estimate as estimate_tokens, a bit bigger for non-latin text
+            segment_tokens = (self.offsets[i + 1] - self.offsets[i] + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+            if i > first and tokens + segment_tokens > max_tokens:
+                result.append((self.starts[first], str(self.view(first, i), "utf-8")))
+                first, tokens = i, 0
+            tokens += segment_tokens
+        if first < len(self):
+            result.append((self.starts[first], str(self.view(first, len(self)), "utf-8")))
+        return result
+
+    # --- serialization ---
+
+    def to_bytes(self) -> bytes:
+        columns = [self.starts, self.durations, self.offsets]
+        if not _LITTLE_ENDIAN:
+            columns = [array(c.typecode, c) for c in columns]
+            for column in columns:
+                column.byteswap()
+        return b"".join([_HEADER.pack(_MAGIC, len(self)), *(c.tobytes() for c in columns), self._buffer])
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "TranscriptSegments":
+        """
+            The text stays a view over `data` (no copy), the columns are copied (12 bytes / segment).
+        """
+        view = memoryview(data)
+        magic, n = _HEADER.unpack_from(view)
+        if magic != _MAGIC:
+            raise ValueError("Not a transcript segments blob.")
+        position = _HEADER.size
+        columns = []
+        for typecode, count in (("f", n), ("f", n), ("I", n + 1)):
+            column = _column(typecode)
+            size = count * column.itemsize
+            column.frombytes(view[position:position + size])
+            if not _LITTLE_ENDIAN:
+                column.byteswap()
+            columns.append(column)
+            position += size
+        return cls(*columns, view[position:])
@@ -0,0 +1,64 @@
+"""
+Background warm-up of the heavy parts, started from the app lifespan.
+
+The app answers (/health, cached responses...) right away, while a daemon
+thread imports crewai, builds the LLM + a first pooled agent of each kind and
+loads the yt-dlp extractors. A request that arrives before it's done just
+waits for the same import (python import lock), nothing is done twice.
+"""
+
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+WARM_UP_ON_STARTUP = os.getenv("WARM_UP_ON_STARTUP", "true").lower() in ("1", "true", "yes")
+
+_status = {"state": "not started", "seconds": None, "error": None}
+
+
+def _warm_up() -> None:
+    started = time.perf_counter()
+    _status["state"] = "running"
+    try:
+        from app.configs import get_gemini_llm, get_llm
+        from app.configs.routing import LLM_ROUTING_ENABLED, LLM_LONG_MODEL
+        from app.ai_agents import summary_agent, qa_agent, intent
+        from app.retrieval import get_embedder
+        from app.utils.ytdlp_pool import metadata_pool
+
+        llm = get_gemini_llm()
+        summary_agent.summary_pool.warm_up(llm)
+        qa_agent.qa_pool.warm_up(llm)
+        qa_agent.answer_pool.warm_up(llm)
+        if LLM_ROUTING_ENABLED:
+            # long transcripts and chat re-summaries (app/ai_agents/routing.py)
+            summary_agent.summary_pool.warm_up(get_llm(LLM_LONG_MODEL))
+            qa_agent.answer_pool.warm_up(get_llm(LLM_LONG_MODEL))
+        # first YoutubeDL: imports the extractor modules
+        metadata_pool.warm_up()
+        get_embedder()
+        intent.warm_up()
+
+        _status["state"] = "done"
+    except Exception as e:
+        # not fatal, the same work will happen lazily on the first request
+        logger.error("warm-up failed: %s", e)
+        _status["state"] = "failed"
+        _status["error"] = str(e)
+    finally:
+        _status["seconds"] = round(time.perf_counter() - started, 3)
+
+
+def start_warm_up() -> threading.Thread | None:
+    if not WARM_UP_ON_STARTUP:
+        return None
+    thread = threading.Thread(target=_warm_up, name="warm-up", daemon=True)
+    thread.start()
+    return thread
+
+
+def warm_up_status() -> dict:
+    return dict(_status)
@@ -16,11 +16,18 @@ Robust YouTube Fetcher:
 3. Returns a detailed dictionary including specific error messages for any failures.
 """
 
+import contextvars
 import logging
-from typing import Dict, Any, List, Optional
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Any, List, Optional, Tuple
+from urllib.parse import urlparse, parse_qs
 
-import yt_dlp
 from yt_dlp.utils import DownloadError, ExtractorError
+from app.configs.concurrency import FETCH_MAX_WORKERS
+from app.utils.metrics import span
+from app.utils.ytdlp_pool import metadata_pool, playlist_pool
+from app.utils.transcript_segments import TranscriptSegments
 from youtube_transcript_api import (
     YouTubeTranscriptApi,
     TranscriptsDisabled,
@@ -33,25 +40,96 @@ from youtube_transcript_api import (
 logging.basicConfig(level=logging.ERROR)
 logger = logging.getLogger(__name__)
 
+# transcript errors that won't change on retry (used by the cache for negative results)
+TRANSCRIPTS_DISABLED_ERROR = "Transcripts are disabled for this video by the uploader."
+NO_TRANSCRIPT_ERROR = "No transcripts found (manual or auto-generated)."
+
+# get_video_metadata_transcript already runs in a fetch pool thread, the transcript
+# request runs next to it here (same size: at most one per running fetch)
+_transcript_executor = ThreadPoolExecutor(max_workers=FETCH_MAX_WORKERS, thread_name_prefix="transcript")
+
+_VIDEO_ID_RE = re.compile(r"^[A-Za-z0-9_-]{11}$")
+_YOUTUBE_HOSTS = {"youtube.com", "www.youtube.com", "m.youtube.com", "music.youtube.com", "youtube-nocookie.com", "www.youtube-nocookie.com"}
+
+
+def extract_video_id(url: str) -> Optional[str]:
+    """
+    Parses the video id from a YouTube URL locally (no network).
+    Returns None if the URL is not a recognizable single-video URL.
+    """
+    try:
+        parsed = urlparse(url.strip())
+    except ValueError:
+        return None
+
+    host = (parsed.hostname or "").lower()
+    candidate = None
+    if host in ("youtu.be", "www.youtu.be"):
+        candidate = parsed.path.lstrip("/").split("/")[0]
+    elif host in _YOUTUBE_HOSTS:
+        if parsed.path == "/watch":
+            candidate = parse_qs(parsed.query).get("v", [None])[0]
+        else:
+            parts = parsed.path.strip("/").split("/")
+            if len(parts) >= 2 and parts[0] in ("shorts", "embed", "live", "v"):
+                candidate = parts[1]
+
+    if candidate and _VIDEO_ID_RE.match(candidate):
+        return candidate
+    return None
+
+
+def extract_playlist_id(url: str) -> Optional[str]:
+    """
+    Returns the `list=` id of a YouTube URL (/playlist?list=... or /watch?v=...&list=...),
+    None if the URL has no playlist.
+    """
+    try:
+        parsed = urlparse(url.strip())
+    except ValueError:
+        return None
+    if (parsed.hostname or "").lower() not in _YOUTUBE_HOSTS:
+        return None
+    return parse_qs(parsed.query).get("list", [None])[0] or None
+
+
+def expand_playlist(url: str, max_items: int) -> List[Dict[str, Any]]:
+    """
+    Lists the videos of a playlist with yt-dlp flat extraction (one request for
+    the listing, no per-video metadata). Returns [{"video_id", "url", "title"}]
+    (at most BATCH_MAX_ITEMS are listed, then max_items are kept).
+    Raises DownloadError / ExtractorError like _fetch_video_metadata.
+    """
+    with span("yt_dlp_playlist"), playlist_pool.checkout() as ydl:
+        info = ydl.extract_info(url, download=False)
+
+    if info.get("_type") != "playlist":
+        # not a playlist after all, it's the video itself
+        return [{"video_id": info.get("id"), "url": url, "title": info.get("title")}]
+
+    videos = []
+    for entry in info.get("entries") or []:
+        # deleted / private videos come back without an id
+        if not entry or not entry.get("id"):
+            continue
+        videos.append({
+            "video_id": entry["id"],
+            "url": f"https://www.youtube.com/watch?v={entry['id']}",
+            "title": entry.get("title"),
+        })
+    return videos[:max_items]
+
 
 def _fetch_video_metadata(url: str) -> Dict[str, Any]:
     """
-    Fetches metadata for a single video.
+    Fetches metadata for a single video (pooled YoutubeDL, YouTube extractors only).
     Raises specific exceptions if fetching fails.
     """
-    options = {
-        "skip_download": True,
-        "noplaylist": True,
-        "quiet": True,
-        "no_warnings": True,
-        "logger": None,
-    }
-
-    with yt_dlp.YoutubeDL(options) as ydl:
+    with span("yt_dlp_metadata"), metadata_pool.checkout() as ydl:
         info = ydl.extract_info(url, download=False)
 
     if info.get("_type") == "playlist":
-        raise ValueError("Playlists are not supported. Please provide a single video URL.")
+        raise ValueError("Playlists are not supported here. Please provide a single video URL (or use /summary/batch with expand_playlists).")
 
     return {
         "video_id": info.get("id"),
@@ -65,65 +143,106 @@ def _fetch_video_metadata(url: str) -> Dict[str, Any]:
 
 
 def _format_transcript(transcript_obj, transcript_data: List[Dict]) -> Dict[str, Any]:
-    transcript_extra_data = " ".join(item.text for item in transcript_data)
-    clean_text = transcript_extra_data.replace("\n", "")
+    # the segments keep the timing, their buffer is the flat text (no second copy)
+    segments = TranscriptSegments.from_snippets(transcript_data)
     return {
         "language": transcript_obj.language,
         "language_code": transcript_obj.language_code,
         "is_generated": transcript_obj.is_generated,
-        "text": clean_text,
+        "text": segments.text,
+        "segments": segments,
     }
 
 
+def _select_transcript(transcript_list, languages: List[str]):
+    """
+    Picks the transcript from the listing (in memory, no request):
+    manual in `languages` order, then auto-generated, then any language.
+    """
+    for lang in languages:
+        try:
+            return transcript_list.find_manually_created_transcript([lang])
+        except NoTranscriptFound:
+            continue
+    for lang in languages:
+        try:
+            return transcript_list.find_generated_transcript([lang])
+        except NoTranscriptFound:
+            continue
+    try:
+        return next(iter(transcript_list))
+    except StopIteration:
+        # This specific exception means we iterated but found nothing
+        raise NoTranscriptFound("No transcripts found in any language.")
+
+
 def _fetch_transcript(
     video_id: str, languages: Optional[List[str]] = None
 ) -> Dict[str, Any]:
     """
-    Fetches transcript with specific fallback logic.
+    Fetches transcript with specific fallback logic: one listing request,
+    the choice is made in memory, then one fetch of the chosen transcript.
     Raises exceptions if no transcript is found or fetching fails.
     """
     if languages is None:
         languages = ["en"]
 
-    transcript_list = YouTubeTranscriptApi().list(video_id)
-
-    # Helper to try fetching specific types
-    def try_fetch(transcript_list, lang_codes, generated=False):
-        for lang in lang_codes:
-            try:
-                if generated:
-                    t = transcript_list.find_generated_transcript([lang])
-                else:
-                    t = transcript_list.find_transcript([lang])
-                return _format_transcript(t, t.fetch())
-            except NoTranscriptFound:
-                continue
-        return None
+    with span("transcript_fetch"):
+        transcript_list = YouTubeTranscriptApi().list(video_id)
+        transcript = _select_transcript(transcript_list, languages)
+        return _format_transcript(transcript, transcript.fetch())
 
-    # 1. Try manual
-    result = try_fetch(transcript_list, languages, generated=False)
-    if result:
-        return result
 
-    # 2. Try auto-generated
-    result = try_fetch(transcript_list, languages, generated=True)
-    if result:
-        return result
+def _metadata_result(url: str) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    # (metadata, metadata_error)
+    try:
+        return _fetch_video_metadata(url), None
+    except ValueError as e:
+        # Specific handling for the custom playlist error
+        return None, str(e)
+    except DownloadError as e:
+        # yt-dlp download error (e.g. Geo-blocking, private video)
+        return None, f"Video unavailable or restricted: {str(e)}"
+    except ExtractorError as e:
+        # yt-dlp extractor error (e.g. Invalid URL)
+        return None, f"Invalid URL or extraction error: {str(e)}"
+    except Exception as e:
+        return None, f"Unexpected error fetching metadata: {str(e)}"
 
 
-    # 3. Fallback to ANY available
+def _transcript_result(video_id: str) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    # (transcript, transcript_error), errors are caught independently
+    # so that a transcript failure doesn't hide the valid metadata.
     try:
-        available_transcript = next(iter(transcript_list))
-        return _format_transcript(available_transcript, available_transcript.fetch())
-    except StopIteration:
-        # This specific exception means we iterated but found nothing
-        raise NoTranscriptFound("No transcripts found in any language.")
+        return _fetch_transcript(video_id), None
+    except TranscriptsDisabled:
+        return None, TRANSCRIPTS_DISABLED_ERROR
+    except NoTranscriptFound:
+        return None, NO_TRANSCRIPT_ERROR
+    except VideoUnavailable:
+        # Rare case where metadata passes but transcript API sees it as gone
+        return None, "Video became unavailable while fetching transcript."
+    except CouldNotRetrieveTranscript as e:
+        # Network issues or YouTube API refusing connection
+        return None, f"Could not retrieve transcript (API error): {str(e)}"
+    except Exception as e:
+        return None, f"Unexpected error fetching transcript: {str(e)}"
 
 
-def get_video_metadata_transcript(url: str) -> Dict[str, Any]:
+def get_video_metadata_transcript(
+    url: str,
+    include_metadata: bool = True,
+    on_metadata: Callable[[Dict[str, Any]], None] | None = None,
+) -> Dict[str, Any]:
     """
     Main function to fetch video data and handle all exceptions explicitly for the user.
-    
+
+    When the video id can be read from the URL, the metadata (yt-dlp) and the
+    transcript are fetched at the same time. include_metadata=False skips yt-dlp
+    (metadata is then only {"video_id": ...}).
+    on_metadata, if given, is called (in this thread) with {"metadata", "metadata_error"}
+    as soon as they are known, before waiting for the transcript.
+
     Returns a dictionary with:
     - metadata: (dict or None)
     - transcript: (dict or None)
@@ -137,46 +256,40 @@ def get_video_metadata_transcript(url: str) -> Dict[str, Any]:
         "metadata_error": None,
         "transcript_error": None,
     }
+    video_id = extract_video_id(url)
 
-    # --- STEP 1: FETCH METADATA ---
-    try:
-        result["metadata"] = _fetch_video_metadata(url)
-    except ValueError as e:
-        # Specific handling for the custom playlist error
-        result["metadata_error"] = str(e)
-    except DownloadError as e:
-        # yt-dlp download error (e.g. Geo-blocking, private video)
-        result["metadata_error"] = f"Video unavailable or restricted: {str(e)}"
-    except ExtractorError as e:
-        # yt-dlp extractor error (e.g. Invalid URL)
-        result["metadata_error"] = f"Invalid URL or extraction error: {str(e)}"
-    except Exception as e:
-        result["metadata_error"] = f"Unexpected error fetching metadata: {str(e)}"
+    def metadata_known() -> None:
+        if on_metadata is not None:
+            on_metadata({"metadata": result["metadata"], "metadata_error": result["metadata_error"]})
 
-    # If metadata failed completely, we cannot get a transcript (no video_id)
-    if result["metadata_error"]:
+    if not include_metadata:
+        if video_id is None:
+            result["metadata_error"] = "Transcript-only mode needs a YouTube video URL with a readable video id."
+            metadata_known()
+            return result
+        result["metadata"] = {"video_id": video_id}
+        metadata_known()
+        result["transcript"], result["transcript_error"] = _transcript_result(video_id)
         return result
 
-    # --- STEP 2: FETCH TRANSCRIPT ---
-    # We only run this if metadata succeeded, but we catch errors independently
-    # so that a transcript failure doesn't hide the valid metadata.
-    try:
-        video_id = result["metadata"]["video_id"]
-        result["transcript"] = _fetch_transcript(video_id)
+    if video_id is None:
+        # unusual URL: yt-dlp has to tell us the video id first
+        result["metadata"], result["metadata_error"] = _metadata_result(url)
+        metadata_known()
+        if result["metadata_error"]:
+            return result
+        result["transcript"], result["transcript_error"] = _transcript_result(result["metadata"]["video_id"])
+        return result
 
-    except TranscriptsDisabled:
-        result["transcript_error"] = "Transcripts are disabled for this video by the uploader."
-    except NoTranscriptFound:
-        result["transcript_error"] = "No transcripts found (manual or auto-generated)."
-    except VideoUnavailable:
-        # Rare case where metadata passes but transcript API sees it as gone
-        result["transcript_error"] = "Video became unavailable while fetching transcript."
-    except CouldNotRetrieveTranscript as e:
-        # Network issues or YouTube API refusing connection
-        result["transcript_error"] = f"Could not retrieve transcript (API error): {str(e)}"
-    except Exception as e:
-        result["transcript_error"] = f"Unexpected error fetching transcript: {str(e)}"
+    # both requests at the same time, the transcript in the side pool
+    transcript_future = _transcript_executor.submit(contextvars.copy_context().run, _transcript_result, video_id)
+    result["metadata"], result["metadata_error"] = _metadata_result(url)
+    metadata_known()
+    result["transcript"], result["transcript_error"] = transcript_future.result()
 
+    # If metadata failed completely (private, removed...) the transcript is not returned either
+    if result["metadata_error"]:
+        result["transcript"] = result["transcript_error"] = None
     return result
 
 
@@ -0,0 +1,92 @@
+"""
+Micro-benchmark of the per-request CrewAI overhead (app/ai_agents/factory.py).
+
+The LLM is a stub that answers instantly, so what is measured is only the cost
+of building/rendering the Agent, Task, Crew and prompt plus kickoff() itself:
+
+    before: new Agent + Task + Crew on every request
+    after:  pooled worker (agent/task/crew built once) + precompiled prompt template
+
+    python -m benchmarks.agent_overhead --requests 200
+"""
+
+import argparse
+import json
+import os
+import time
+from unittest import mock
+
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+os.environ.setdefault("REDIS_HOST", "localhost")
+os.environ.setdefault("REDIS_PORT", "6379")
+os.environ.setdefault("REDIS_PASSWORD", "benchmark")
+os.environ.setdefault("CREWAI_DISABLE_TELEMETRY", "true")
+os.environ.setdefault("OTEL_SDK_DISABLED", "true")
+
+from crewai import Crew, Process, Task  # noqa: E402
+from crewai.llms.base_llm import BaseLLM  # noqa: E402
+
+
+class StubLLM(BaseLLM):
+    def call(self, messages, *args, **kwargs):
+        return "Final Answer: stub answer"
+
+
+def _qa_args(i: int) -> dict:
+    return {
+        "session_id": f"session-{i}",
+        "question": "What is docker?",
+        "relative_parts_from_transcript": ["docker is a container runtime. " * 40] * 5,
+        "last_few_message": ["user: hi", "assistant: hello"] * 5,
+    }
+
+
+def _before(qa_agent_module, llm, args: dict) -> str:
+    # what run_qa_crew did before the pool: agent, task and crew built per request
+    from app.ai_agents.qa_context import assemble_qa_prompt
+
+    agent = qa_agent_module._get_qa_agent(llm)
+    task = Task(
+        description=assemble_qa_prompt(**args)[0],
+        expected_output=qa_agent_module.QA_EXPECTED_OUTPUT,
+        agent=agent,
+    )
+    crew = Crew(agents=[agent], tasks=[task], process=Process.sequential)
+    return crew.kickoff().raw
+
+
+def _after(qa_agent_module, llm, args: dict) -> str:
+    return qa_agent_module.run_qa_crew(llm=llm, **args)["answer"]
+
+
+def _measure(fn, requests: int) -> float:
+    fn(0)  # warm up (imports, first pool worker)
+    started = time.perf_counter()
+    for i in range(requests):
+        fn(i)
+    return (time.perf_counter() - started) / requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    from app.ai_agents import qa_agent
+
+    llm = StubLLM(model="stub")
+    # run_qa_crew prints the usage of every request
+    with mock.patch("builtins.print"):
+        before = _measure(lambda i: _before(qa_agent, llm, _qa_args(i)), args.requests)
+        after = _measure(lambda i: _after(qa_agent, llm, _qa_args(i)), args.requests)
+
+    print(json.dumps({
+        "requests": args.requests,
+        "before_ms_per_request": round(before * 1000, 3),
+        "after_ms_per_request": round(after * 1000, 3),
+        "speedup": round(before / after, 2),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
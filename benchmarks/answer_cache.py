@@ -0,0 +1,106 @@
+"""
+Hits and misses of the /ask-question answer cache (app/caches/answers.py) with
+the configured EMBEDDER, on fakeredis. Every case stores the answer of one
+question, then asks another one:
+
+    hit    rephrasings that must get the stored answer ("what is docker?" ->
+           "what's docker exactly?"), in the same session and in another
+           session of the same video
+    miss   close but different questions ("... postgres ..." / "... redis ..."),
+           another route, questions that need the chat history
+
+    python -m benchmarks.answer_cache
+
+Exits 1 when a case doesn't get the expected outcome.
+"""
+
+import asyncio
+import json
+import os
+
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+os.environ.setdefault("REDIS_HOST", "localhost")
+os.environ.setdefault("REDIS_PORT", "6379")
+os.environ.setdefault("REDIS_PASSWORD", "benchmark")
+os.environ.setdefault("METRICS_ENABLED", "false")
+
+HIT, MISS = "hit", "miss"
+
+# (stored question, asked question, expected, same session)
+CASES = [
+    ("what is docker?", "what is docker exactly?", HIT, True),
+    ("what is docker?", "what's docker?", HIT, True),
+    ("what is docker?", "explain docker", HIT, True),
+    ("what is docker?", "tell me about docker", HIT, True),
+    ("how does docker compose work?", "how does docker compose work exactly?", HIT, True),
+    ("how does the speaker deploy the app to kubernetes?", "how does the speaker deploy the app to kubernetes exactly?", HIT, True),
+    ("ما هو docker؟", "اشرح docker", HIT, True),
+    ("what is docker?", "what's docker exactly?", HIT, False),
+    ("how does docker compose work?", "how does docker compose work exactly?", HIT, False),
+    ("how do I connect to postgres from the app container?", "how do I connect to redis from the app container?", MISS, True),
+    ("what is docker?", "what is kubernetes?", MISS, True),
+    ("why does docker use layers?", "how does docker use layers?", MISS, True),
+    ("what does the speaker say about volumes?", "what does the speaker say about networks?", MISS, False),
+    ("what is docker?", "explain it more", MISS, True),
+    ("why is docker fast?", "and why?", MISS, True),
+]
+
+
+async def _run() -> tuple[list[dict], int]:
+    import fakeredis
+    from app.configs import redis as redis_config
+    from app.caches import answers
+    from app.caches.session_notes import session_video_key
+    from app.retrieval import get_embedder
+
+    server = fakeredis.FakeServer()
+    redis_config._make_client = lambda max_connections, decode_responses: fakeredis.FakeAsyncRedis(
+        server=server, decode_responses=decode_responses
+    )
+    redis_config.init_redis()
+    client = redis_config.get_redis()
+
+    results, wrong = [], 0
+    for i, (stored, asked, expected, same_session) in enumerate(CASES):
+        video_id = f"video{i:06d}"
+        first, second = f"case-{i}-a", f"case-{i}-a" if same_session else f"case-{i}-b"
+        for session_id in (first, second):
+            await client.set(session_video_key(session_id), video_id)
+
+        _, probe = await answers.find_cached_answer(first, stored, "qa")
+        await answers.store_answer(probe, f"answer {i}", "stub", "qa")
+        cached, _ = await answers.find_cached_answer(second, asked, "qa")
+
+        outcome = HIT if cached else MISS
+        wrong += outcome != expected
+        results.append({
+            "stored": stored,
+            "asked": asked,
+            "scope": "session" if same_session else "video",
+            "expected": expected,
+            "outcome": outcome,
+            "similarity": cached["similarity"] if cached else None,
+        })
+
+    # the same question on another route is another answer
+    _, probe = await answers.find_cached_answer("route-a", "what is docker?", "qa")
+    await answers.store_answer(probe, "answer", "stub", "qa")
+    cached, _ = await answers.find_cached_answer("route-a", "what is docker?", "summarize")
+    wrong += cached is not None
+    results.append({"stored": "what is docker? (qa)", "asked": "what is docker? (summarize)",
+                    "scope": "session", "expected": MISS, "outcome": HIT if cached else MISS, "similarity": None})
+
+    print(json.dumps({"embedder": get_embedder().name, "cases": results}, indent=2, ensure_ascii=False))
+    await redis_config.close_redis()
+    return results, wrong
+
+
+def main() -> None:
+    results, wrong = asyncio.run(_run())
+    print(json.dumps({"cases": len(results), "wrong": wrong}))
+    if wrong:
+        raise SystemExit(f"{wrong} answer cache cases didn't get the expected outcome")
+
+
+if __name__ == "__main__":
+    main()
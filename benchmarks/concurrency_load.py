@@ -0,0 +1,121 @@
+"""
+Load test for the execution layer (app/utils/concurrency.py).
+
+The YouTube fetch and the LLM call are replaced by `time.sleep` (they are blocking
+calls, exactly like yt-dlp and Crew.kickoff()), then N requests are fired at the
+same time against one worker. If the event loop were blocked the wall time would be
+N * (fetch + llm); with the executors it should stay close to a single request.
+
+    python -m benchmarks.concurrency_load --requests 32 --fetch-latency 0.3 --llm-latency 1.0
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import threading
+import time
+
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+os.environ.setdefault("REDIS_HOST", "localhost")
+os.environ.setdefault("REDIS_PORT", "6379")
+os.environ.setdefault("REDIS_PASSWORD", "benchmark")
+os.environ.setdefault("API_KEY", "benchmark")
+
+import httpx  # noqa: E402
+
+
+class _InFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.current = 0
+        self.peak = 0
+
+    def __enter__(self):
+        with self._lock:
+            self.current += 1
+            self.peak = max(self.peak, self.current)
+
+    def __exit__(self, *exc):
+        with self._lock:
+            self.current -= 1
+
+
+async def _run(args) -> dict:
+    from app.main import app
+    from app.ai_agents import summary_agent, routing
+    from app.caches import video as video_cache, summary as summary_cache
+
+    in_flight = _InFlight()
+
+    def fake_fetch(url, include_metadata=True, on_metadata=None):
+        with in_flight:
+            time.sleep(args.fetch_latency)
+        return {
+            "metadata": {"video_id": url[-11:]},
+            "transcript": {"text": "hello " * 100},
+            "metadata_error": None,
+            "transcript_error": None,
+        }
+
+    def fake_summary(transcript_text, summary_instruction=None, llm=None, on_token=None):
+        with in_flight:
+            time.sleep(args.llm_latency)
+        return {"llm_model": "stub", "summary": "ok", "input_tokens": 1, "output_tokens": 1}
+
+    # every url is a different video so each request is a cache miss
+    video_cache.get_video_metadata_transcript = fake_fetch
+    # no redis here (and ASGITransport doesn't run the lifespan), the caches are only misses
+    async def no_redis(*args):
+        return None
+
+    video_cache._redis_get = video_cache._redis_set = no_redis
+    summary_cache._redis_get = summary_cache._redis_set = no_redis
+    # service resolves app.ai_agents.run_summary_crew lazily, patch the real module
+    summary_agent.run_summary_crew = fake_summary
+    routing.get_llm = lambda model: None
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        async def one(i):
+            started = time.perf_counter()
+            response = await client.post(
+                "/api/v1/ai/summary",
+                json={"youtube_url": f"https://www.youtube.com/watch?v={i:011d}"},
+                headers={"X-Internal-API-Key": os.environ["API_KEY"]},
+            )
+            response.raise_for_status()
+            return time.perf_counter() - started
+
+        started = time.perf_counter()
+        latencies = sorted(await asyncio.gather(*(one(i) for i in range(args.requests))))
+        wall = time.perf_counter() - started
+
+    single = args.fetch_latency + args.llm_latency
+    return {
+        "requests": args.requests,
+        "peak_in_flight": in_flight.peak,
+        "wall_seconds": round(wall, 3),
+        "serial_seconds": round(single * args.requests, 3),
+        "p50_seconds": round(latencies[len(latencies) // 2], 3),
+        "max_seconds": round(latencies[-1], 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=32)
+    parser.add_argument("--fetch-latency", type=float, default=0.3)
+    parser.add_argument("--llm-latency", type=float, default=1.0)
+    args = parser.parse_args()
+
+    report = asyncio.run(_run(args))
+    print(json.dumps(report, indent=2))
+
+    # with the blocking calls on the event loop only one request is ever in flight
+    if report["peak_in_flight"] < 2:
+        raise SystemExit("requests were serialized, the event loop is blocked")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+"""
+Offline stand-ins for the external services, used by the benchmarks:
+
+    FakeLLM              crewai BaseLLM (gemini_llm)    latency + token distributions
+    FakeYoutubeDL        yt_dlp.YoutubeDL               latency, metadata
+    FakeTranscriptApi    YouTubeTranscriptApi           latency, transcript length distribution
+    fakeredis            redis pools of app.configs.redis
+
+`install_fakes(profile)` patches them in where the app uses them. The real code
+paths run (caches, executors, CrewAI pool/kickoff, retrieval), only the network
+is replaced. Everything is deterministic per video id so caching behaves like
+with the real services.
+"""
+
+import hashlib
+import math
+import os
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass
+from types import SimpleNamespace
+
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+os.environ.setdefault("REDIS_HOST", "localhost")
+os.environ.setdefault("REDIS_PORT", "6379")
+os.environ.setdefault("REDIS_PASSWORD", "benchmark")
+os.environ.setdefault("API_KEY", "benchmark")
+os.environ.setdefault("WARM_UP_ON_STARTUP", "false")
+os.environ.setdefault("CREWAI_DISABLE_TELEMETRY", "true")
+os.environ.setdefault("OTEL_SDK_DISABLED", "true")
+
+from crewai.llms.base_llm import BaseLLM  # noqa: E402
+
+_VOCABULARY = (
+    "docker container image volume network kubernetes pod deploy build cache layer service "
+    "python api request response database index query latency memory thread process "
+    "the a of to and in is it that this we you for with on are as be so now here"
+).split()
+
+
+@dataclass
+class Profile:
+    # seconds, log-normal: median * exp(sigma * N(0, 1))
+    llm_latency_median: float = 1.0
+    llm_latency_sigma: float = 0.3
+    llm_output_tokens_min: int = 150
+    llm_output_tokens_max: int = 600
+    fetch_latency_median: float = 0.3
+    fetch_latency_sigma: float = 0.3
+    # transcript length in words, log-normal too (~150 words per spoken minute)
+    transcript_words_median: int = 3000
+    transcript_words_sigma: float = 0.8
+    transcript_words_max: int = 60000
+    seed: int = 1
+
+
+_rng = random.Random(1)
+_rng_lock = threading.Lock()
+
+
+def _lognormal(median: float, sigma: float) -> float:
+    with _rng_lock:
+        return median * math.exp(sigma * _rng.gauss(0, 1))
+
+
+def _sleep(median: float, sigma: float) -> None:
+    if median > 0:
+        time.sleep(_lognormal(median, sigma))
+
+
+def _video_rng(video_id: str, seed: int) -> random.Random:
+    digest = hashlib.sha256(f"{seed}:{video_id}".encode()).digest()
+    return random.Random(int.from_bytes(digest[:8], "big"))
+
+
+class FakeLLM(BaseLLM):
+    profile: Profile = Profile()
+
+    def call(self, messages, *args, **kwargs):
+        prompt = messages if isinstance(messages, str) else " ".join(str(m.get("content", "")) for m in messages)
+        _sleep(self.profile.llm_latency_median, self.profile.llm_latency_sigma)
+        with _rng_lock:
+            output_tokens = _rng.randint(self.profile.llm_output_tokens_min, self.profile.llm_output_tokens_max)
+            words = [_rng.choice(_VOCABULARY) for _ in range(output_tokens * 3 // 4)]
+        # what the provider would report, crewai sums it on the instance
+        self._track_token_usage_internal({
+            "prompt_tokens": len(prompt) // 4,
+            "completion_tokens": output_tokens,
+            "total_tokens": len(prompt) // 4 + output_tokens,
+        })
+        return "Final Answer: " + " ".join(words)
+
+
+_VIDEO_ID_RE = re.compile(r"(?:v=|youtu\.be/|shorts/)([A-Za-z0-9_-]{11})")
+
+
+class FakeYoutubeDL:
+    profile = Profile()
+
+    def __init__(self, options=None, auto_init=True):
+        self.options = options or {}
+
+    def get_info_extractor(self, ie_key):
+        return None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def close(self):
+        pass
+
+    def extract_info(self, url, download=False):
+        _sleep(self.profile.fetch_latency_median, self.profile.fetch_latency_sigma)
+        match = _VIDEO_ID_RE.search(url)
+        video_id = match.group(1) if match else "benchvideo0"
+        words = _transcript_words(video_id, self.profile)
+        return {
+            "id": video_id,
+            "title": f"Benchmark video {video_id}",
+            "uploader": "benchmark",
+            "upload_date": "20240101",
+            "duration": words * 60 // 150,
+            "thumbnail": None,
+            "webpage_url": f"https://www.youtube.com/watch?v={video_id}",
+        }
+
+
+def _transcript_words(video_id: str, profile: Profile) -> int:
+    rng = _video_rng(video_id, profile.seed)
+    words = profile.transcript_words_median * math.exp(profile.transcript_words_sigma * rng.gauss(0, 1))
+    return max(50, min(int(words), profile.transcript_words_max))
+
+
+class _FakeTranscript:
+    def __init__(self, video_id: str, profile: Profile):
+        self.video_id = video_id
+        self.profile = profile
+        self.language = "English"
+        self.language_code = "en"
+        self.is_generated = False
+
+    def fetch(self):
+        _sleep(self.profile.fetch_latency_median, self.profile.fetch_latency_sigma)
+        rng = _video_rng(self.video_id, self.profile.seed)
+        words = [rng.choice(_VOCABULARY) for _ in range(_transcript_words(self.video_id, self.profile))]
+        # ~12 words per caption line, like the real api
+        return [SimpleNamespace(text=" ".join(words[i:i + 12]), start=i / 2.5, duration=4.8) for i in range(0, len(words), 12)]
+
+
+class _FakeTranscriptList:
+    def __init__(self, video_id: str, profile: Profile):
+        self._transcript = _FakeTranscript(video_id, profile)
+
+    def find_transcript(self, languages):
+        return self._transcript
+
+    def find_manually_created_transcript(self, languages):
+        return self._transcript
+
+    def find_generated_transcript(self, languages):
+        return self._transcript
+
+    def __iter__(self):
+        return iter([self._transcript])
+
+
+class FakeTranscriptApi:
+    profile = Profile()
+
+    def list(self, video_id):
+        _sleep(self.profile.fetch_latency_median / 3, self.profile.fetch_latency_sigma)
+        return _FakeTranscriptList(video_id, self.profile)
+
+
+def install_fakes(profile: Profile) -> FakeLLM:
+    """
+        Patches the app to use the fakes (call it before the app starts) and
+        returns the LLM used by the agents.
+    """
+    import fakeredis
+    import yt_dlp
+    from app import configs
+    from app.configs import redis as redis_config
+    from app.ai_agents import summary_agent, qa_agent, routing
+    from app.utils import youtube
+
+    global _rng
+    _rng = random.Random(profile.seed)
+    FakeYoutubeDL.profile = profile
+    FakeTranscriptApi.profile = profile
+
+    llm = FakeLLM(model="fake/benchmark", profile=profile)
+    for module in (configs, summary_agent, qa_agent):
+        module.get_gemini_llm = lambda: llm
+    # every routed model (app/ai_agents/routing.py) is the same fake
+    routing.get_llm = lambda model: llm
+
+    yt_dlp.YoutubeDL = FakeYoutubeDL
+    youtube.YouTubeTranscriptApi = FakeTranscriptApi
+
+    server = fakeredis.FakeServer()
+    redis_config._make_client = lambda max_connections, decode_responses: fakeredis.FakeAsyncRedis(
+        server=server, decode_responses=decode_responses
+    )
+    return llm
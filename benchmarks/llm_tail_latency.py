@@ -0,0 +1,205 @@
+"""
+Effect of the LLM invocation layer (app/ai_agents/invoke.py) on the tail latency.
+
+A stub LLM (benchmarks.fakes.FakeLLM: log-normal latency) gets injected faults:
+a share of the calls hangs for --tail-latency seconds, or fails with a 503. The
+calls go through the real path (CrewPool.run -> invoke -> crew kickoff), only
+the provider is fake. Scenarios:
+
+    tail      --tail-ratio of the calls are stuck: plain calls vs hedged calls
+    errors    --error-ratio of the calls fail with 503: no retries vs retries
+    outage    every call fails: without vs with the circuit breaker (provider calls
+              made, time to fail)
+    deadline  tail calls with a --deadline seconds request deadline: the
+              slowest call is bounded by it
+    routing   the routed model is down (app/ai_agents/routing.py): once its
+              breaker is open the requests go straight to the fallback model.
+              Exits 1 when no request was moved for "breaker_open"
+
+    python -m benchmarks.llm_tail_latency --calls 400 --concurrency 16
+"""
+
+import argparse
+import json
+import logging
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.fakes import FakeLLM, Profile, install_fakes
+
+
+class _Faults:
+    tail_ratio = 0.0
+    tail_latency = 0.0
+    error_ratio = 0.0
+    provider_calls = 0
+    lock = threading.Lock()
+    rng = random.Random(7)
+
+    @classmethod
+    def draw(cls) -> float:
+        with cls.lock:
+            cls.provider_calls += 1
+            return cls.rng.random()
+
+
+class FaultyLLM(FakeLLM):
+    def call(self, messages, *args, **kwargs):
+        from google.genai.errors import ServerError
+
+        draw = _Faults.draw()
+        if draw < _Faults.error_ratio:
+            time.sleep(0.05)
+            raise ServerError(503, {"error": {"code": 503, "status": "UNAVAILABLE", "message": "The model is overloaded."}})
+        if draw > 1 - _Faults.tail_ratio:
+            time.sleep(_Faults.tail_latency)
+        return super().call(messages, *args, **kwargs)
+
+
+class DownLLM(FakeLLM):
+    def call(self, messages, *args, **kwargs):
+        from google.genai.errors import ServerError
+
+        _Faults.draw()
+        time.sleep(0.05)
+        raise ServerError(503, {"error": {"code": 503, "status": "UNAVAILABLE", "message": "The model is overloaded."}})
+
+
+def _configure(**settings) -> None:
+    from app.ai_agents import invoke
+
+    for name, value in settings.items():
+        setattr(invoke, name, value)
+    # every scenario starts cold: no latencies, closed breakers, full hedge budget
+    invoke._trackers.clear()
+    invoke._model_trackers.clear()
+    invoke._breakers.clear()
+    invoke._budget.update(calls=0, hedges=0)
+
+
+def _percentile(values: list[float], q: float) -> float:
+    return round(values[min(len(values) - 1, int(q * len(values)))], 3)
+
+
+def _run_calls(llm, args, deadline: float | None = None) -> dict:
+    from app.ai_agents.qa_agent import answer_pool
+    from app.utils.resilience import deadline as request_deadline
+
+    _Faults.provider_calls = 0
+
+    def one(i: int) -> tuple[float, str]:
+        started = time.perf_counter()
+        try:
+            with request_deadline(deadline):
+                answer_pool.run(llm, f"Answer question {i} about the video.", "A short answer.")
+            outcome = "ok"
+        except Exception as e:
+            outcome = type(e).__name__
+        return time.perf_counter() - started, outcome
+
+    with ThreadPoolExecutor(args.concurrency) as executor:
+        results = list(executor.map(one, range(args.calls)))
+    latencies = sorted(latency for latency, _ in results)
+    outcomes: dict = {}
+    for _, outcome in results:
+        outcomes[outcome] = outcomes.get(outcome, 0) + 1
+    return {
+        "p50": _percentile(latencies, 0.5),
+        "p95": _percentile(latencies, 0.95),
+        "p99": _percentile(latencies, 0.99),
+        "max": round(latencies[-1], 3),
+        "outcomes": outcomes,
+        "provider_calls": _Faults.provider_calls,
+    }
+
+
+def _run_routed(profile: Profile, args) -> dict:
+    from app.ai_agents import routing
+    from app.ai_agents.qa_agent import answer_pool
+
+    pick = routing.pick_model(routing.KIND_QA, route="qa")
+    # like crewai, llm.model has no provider prefix: the breaker invoke() opens
+    # must be the one routing looks at
+    llms = {
+        pick["model"]: DownLLM(model=pick["model"].split("/", 1)[-1], profile=profile),
+        routing.LLM_FALLBACK_MODEL: FakeLLM(model=routing.LLM_FALLBACK_MODEL.split("/", 1)[-1], profile=profile),
+    }
+    routing.get_llm = llms.__getitem__
+    _Faults.provider_calls = 0
+
+    def ask(i: int, llm=None, on_token=None) -> dict:
+        return answer_pool.run(llm, f"Answer question {i} about the video.", "A short answer.", on_token)
+
+    def one(i: int) -> str:
+        try:
+            return routing.run_routed(ask, pick, i)["routing"]["reason"]
+        except Exception as e:
+            return type(e).__name__
+
+    # sequential: the breaker opens after LLM_BREAKER_MIN_CALLS failed calls
+    reasons: dict = {}
+    for i in range(args.calls // 4):
+        reason = one(i)
+        reasons[reason] = reasons.get(reason, 0) + 1
+    return {"model": pick["model"], "fallback": routing.LLM_FALLBACK_MODEL, "reasons": reasons, "down_model_calls": _Faults.provider_calls}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0.3, help="median LLM latency (seconds)")
+    parser.add_argument("--tail-ratio", type=float, default=0.03)
+    parser.add_argument("--tail-latency", type=float, default=4.0)
+    parser.add_argument("--error-ratio", type=float, default=0.1)
+    parser.add_argument("--deadline", type=float, default=1.5)
+    args = parser.parse_args()
+    # every injected 503 is logged by crewai
+    logging.getLogger("crewai").setLevel(logging.CRITICAL)
+
+    profile = Profile(llm_latency_median=args.latency, llm_latency_sigma=0.25, llm_output_tokens_min=20, llm_output_tokens_max=60)
+    install_fakes(profile)
+    llm = FaultyLLM(model="fake/benchmark", profile=profile)
+    report = {}
+
+    _Faults.tail_ratio, _Faults.tail_latency, _Faults.error_ratio = args.tail_ratio, args.tail_latency, 0.0
+    _configure(LLM_HEDGE_ENABLED=False, LLM_MAX_ATTEMPTS=1, LLM_BREAKER_ENABLED=False)
+    # first run also pays the crewai warm-up, keep it out of the numbers
+    _run_calls(llm, argparse.Namespace(calls=args.concurrency, concurrency=args.concurrency))
+    _configure()
+    report["tail"] = {"plain": _run_calls(llm, args)}
+    # the budget allows hedging ~the slowest LLM_HEDGE_MAX_RATIO, the p95 trigger picks them
+    _configure(LLM_HEDGE_ENABLED=True, LLM_HEDGE_MIN_DELAY=args.latency)
+    report["tail"]["hedged"] = _run_calls(llm, args)
+
+    _Faults.tail_ratio, _Faults.error_ratio = 0.0, args.error_ratio
+    _configure(LLM_HEDGE_ENABLED=False, LLM_MAX_ATTEMPTS=1, LLM_BREAKER_ENABLED=False)
+    report["errors"] = {"no_retries": _run_calls(llm, args)}
+    _configure(LLM_MAX_ATTEMPTS=3, LLM_RETRY_BASE_DELAY=0.1)
+    report["errors"]["retries"] = _run_calls(llm, args)
+
+    _Faults.error_ratio = 1.0
+    _configure(LLM_BREAKER_ENABLED=False)
+    report["outage"] = {"no_breaker": _run_calls(llm, args)}
+    _configure(LLM_BREAKER_ENABLED=True)
+    report["outage"]["breaker"] = _run_calls(llm, args)
+
+    _Faults.tail_ratio, _Faults.error_ratio = args.tail_ratio, 0.0
+    _configure(LLM_HEDGE_ENABLED=False, LLM_MAX_ATTEMPTS=1, LLM_BREAKER_ENABLED=False)
+    report["deadline"] = {"none": _run_calls(llm, args)}
+    _configure()
+    report["deadline"][f"{args.deadline}s"] = _run_calls(llm, args, deadline=args.deadline)
+
+    _configure(LLM_HEDGE_ENABLED=False, LLM_MAX_ATTEMPTS=1, LLM_BREAKER_ENABLED=True)
+    report["routing"] = _run_routed(profile, args)
+
+    print(json.dumps(report, indent=2))
+    if not report["routing"]["reasons"].get("breaker_open"):
+        sys.exit("routing: an open breaker on the routed model did not move the requests to the fallback")
+
+
+if __name__ == "__main__":
+    main()
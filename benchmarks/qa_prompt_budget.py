@@ -0,0 +1,101 @@
+"""
+Input tokens of the /ask-question prompt before/after the token budget
+(app/ai_agents/qa_context.py), plus a randomized check that the rendered
+prompt is never above the budget.
+
+    python -m benchmarks.qa_prompt_budget --budget 3000 --cases 2000
+
+Synthetic input like what retrieval + NestJS send: sliding-window chunks that
+overlap, the same chunk twice, and a long chat history.
+"""
+
+import argparse
+import json
+import os
+import random
+import time
+
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+os.environ.setdefault("REDIS_HOST", "localhost")
+os.environ.setdefault("REDIS_PORT", "6379")
+os.environ.setdefault("REDIS_PASSWORD", "benchmark")
+
+from app.ai_agents.prompts import QA_TASK  # noqa: E402
+from app.ai_agents.qa_context import assemble_qa_prompt, CONTEXT_SEPARATOR, HISTORY_SEPARATOR  # noqa: E402
+from app.utils.tokens import estimate_tokens  # noqa: E402
+
+_VOCABULARY = (
+    "docker container image volume network kubernetes pod deploy build cache layer "
+    "the a of to and in is it that this we you for with on are as be"
+).split()
+
+
+def _words(rng: random.Random, count: int) -> list[str]:
+    return [rng.choice(_VOCABULARY) + rng.choice(("", "", "s", "ing")) for _ in range(count)]
+
+
+def _case(rng: random.Random) -> dict:
+    transcript = _words(rng, rng.randint(500, 6000))
+    window, step = rng.randint(40, 300), rng.randint(20, 300)
+    # sliding windows overlap when step < window
+    chunks = [" ".join(transcript[i:i + window]) for i in range(0, len(transcript), step)]
+    chunks = rng.sample(chunks, min(len(chunks), rng.randint(1, 25)))
+    chunks += rng.sample(chunks, min(len(chunks), rng.randint(0, 3)))
+    history = [" ".join(_words(rng, rng.randint(1, 400))) for _ in range(rng.randint(0, 30))]
+    question = " ".join(_words(rng, rng.randint(3, 40)))
+    return {"session_id": "bench-session", "question": question,
+            "relative_parts_from_transcript": chunks, "last_few_message": history}
+
+
+def _unbounded_tokens(case: dict) -> int:
+    # the prompt as it was built before the budget
+    return estimate_tokens(QA_TASK.render(
+        session_id=case["session_id"],
+        question=case["question"],
+        context_text=CONTEXT_SEPARATOR.join(case["relative_parts_from_transcript"]),
+        conversation_history=HISTORY_SEPARATOR.join(case["last_few_message"]),
+    ))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--budget", type=int, default=3000)
+    parser.add_argument("--cases", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    before = after = over_budget = 0
+    worst = 0
+    elapsed = 0.0
+    for _ in range(args.cases):
+        case = _case(rng)
+        # small budgets too (the question alone can be over them), but above the
+        # fixed instructions (~300 tokens) which can't be cut
+        budget = rng.choice((args.budget, rng.randint(400, args.budget)))
+        started = time.perf_counter()
+        prompt, usage = assemble_qa_prompt(budget=budget, **case)
+        elapsed += time.perf_counter() - started
+
+        tokens = estimate_tokens(prompt)
+        worst = max(worst, tokens / budget)
+        if tokens > budget or usage["total_tokens"] != tokens:
+            over_budget += 1
+        before += _unbounded_tokens(case)
+        after += tokens
+
+    report = {
+        "cases": args.cases,
+        "over_budget": over_budget,
+        "max_budget_used": round(worst, 3),
+        "avg_tokens_before": round(before / args.cases),
+        "avg_tokens_after": round(after / args.cases),
+        "avg_assemble_ms": round(elapsed / args.cases * 1000, 3),
+    }
+    print(json.dumps(report, indent=2))
+    if over_budget:
+        raise SystemExit(f"{over_budget} prompts were over the budget")
+
+
+if __name__ == "__main__":
+    main()
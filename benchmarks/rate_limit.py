@@ -0,0 +1,196 @@
+"""
+Cluster-wide LLM quota (app/utils/rate_limit.py) with simulated workers.
+
+--workers RateLimiter instances (one per simulated uvicorn worker, each with its
+own local fallback) share one fakeredis server, the real Lua scripts run on it.
+Every worker has --threads callers hammering a stub provider that enforces a
+quota of --quota-requests / --quota-tokens per --window seconds (sliding) and
+answers 429 above it. Scenarios:
+
+    unlimited  no limiter: how many calls the provider refuses
+    redis      shared buckets: provider 429s, limiter rejections, waits
+    fairness   tenant "a" has 6x the callers of tenant "b": share of the calls
+               each gets, with LLM_RATE_TENANT_SHARE=1 and 0.6
+    fallback   redis unreachable: every worker limits itself to 1/--workers
+
+Time is scaled: the quota per --window seconds is configured as its per minute
+equivalent.
+
+    python -m benchmarks.rate_limit --workers 4 --threads 8 --seconds 6
+"""
+
+import argparse
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+os.environ.setdefault("REDIS_HOST", "localhost")
+os.environ.setdefault("REDIS_PORT", "6379")
+os.environ.setdefault("REDIS_PASSWORD", "benchmark")
+os.environ.setdefault("METRICS_ENABLED", "false")
+
+
+class StubProvider:
+    """
+        Sliding window quota, like the provider's per minute one.
+    """
+
+    def __init__(self, requests: int, tokens: int, window: float, latency: float):
+        self.requests = requests
+        self.tokens = tokens
+        self.window = window
+        self.latency = latency
+        self._calls: deque = deque()
+        self._used_tokens = 0
+        self._lock = threading.Lock()
+        self.ok = 0
+        self.refused = 0
+
+    def call(self, tokens: int) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            while self._calls and self._calls[0][0] <= now - self.window:
+                self._used_tokens -= self._calls.popleft()[1]
+            if len(self._calls) >= self.requests or self._used_tokens + tokens > self.tokens:
+                self.refused += 1
+                allowed = False
+            else:
+                self._calls.append((now, tokens))
+                self._used_tokens += tokens
+                self.ok += 1
+                allowed = True
+        time.sleep(self.latency * random.uniform(0.5, 1.5) if allowed else 0.01)
+        return allowed
+
+
+def _shared_redis():
+    import fakeredis
+
+    server = fakeredis.FakeServer()
+    scripts = {}
+    lock = threading.Lock()
+
+    def connect():
+        # one client per simulated worker, like one pool per process
+        client = fakeredis.FakeRedis(server=server, decode_responses=True)
+
+        def run_script(source, keys, args):
+            with lock:
+                if (id(client), source) not in scripts:
+                    scripts[(id(client), source)] = client.register_script(source)
+            return scripts[(id(client), source)](keys=keys, args=args)
+
+        return run_script
+
+    return connect
+
+
+def _redis_down(source, keys, args):
+    raise ConnectionError("redis is down")
+
+
+def _configure(args, **settings) -> None:
+    from app.utils import rate_limit
+
+    per_minute = 60 / args.window
+    rate_limit.LLM_RATE_RPM = args.quota_requests * per_minute
+    rate_limit.LLM_RATE_TPM = args.quota_tokens * per_minute
+    rate_limit.LLM_RATE_BURST_SECONDS = args.window / 10
+    rate_limit.LLM_RATE_TENANT_SHARE = 1.0
+    rate_limit.LLM_RATE_MODEL_LIMITS = {}
+    for name, value in settings.items():
+        setattr(rate_limit, name, value)
+
+
+def _run(args, limiters, tenants) -> dict:
+    from app.utils.rate_limit import RateLimitedError, set_tenant
+
+    provider = StubProvider(args.quota_requests, args.quota_tokens, args.window, args.latency)
+    stop_at = time.monotonic() + args.seconds
+    lock = threading.Lock()
+    stats = {"rejected": 0, "waits": [], "per_tenant": {}}
+
+    def caller(limiter, tenant):
+        set_tenant(tenant)
+        rng = random.Random(hash((tenant, threading.get_ident())))
+        while time.monotonic() < stop_at:
+            tokens = rng.randint(args.tokens // 2, args.tokens * 3 // 2)
+            started = time.monotonic()
+            if limiter is not None:
+                try:
+                    limiter.acquire("gemini/benchmark", tokens, max_wait=args.max_wait)
+                except RateLimitedError as e:
+                    with lock:
+                        stats["rejected"] += 1
+                    time.sleep(min(e.retry_after, 0.5))
+                    continue
+            waited = time.monotonic() - started
+            ok = provider.call(tokens)
+            with lock:
+                stats["waits"].append(waited)
+                if ok:
+                    stats["per_tenant"][tenant] = stats["per_tenant"].get(tenant, 0) + 1
+
+    threads = [
+        threading.Thread(target=caller, args=(limiter, tenant))
+        for limiter in limiters
+        for tenant in tenants
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    waits = sorted(stats["waits"]) or [0.0]
+    return {
+        "provider_ok": provider.ok,
+        "provider_429": provider.refused,
+        "quota_per_window": args.quota_requests,
+        "limiter_rejected": stats["rejected"],
+        "wait_p50": round(waits[len(waits) // 2], 3),
+        "wait_p95": round(waits[int(len(waits) * 0.95)], 3),
+        "ok_per_tenant": stats["per_tenant"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=8, help="callers per worker")
+    parser.add_argument("--seconds", type=float, default=6)
+    parser.add_argument("--window", type=float, default=2, help="provider quota window (seconds)")
+    parser.add_argument("--quota-requests", type=int, default=40, help="per window")
+    parser.add_argument("--quota-tokens", type=int, default=60000, help="per window")
+    parser.add_argument("--tokens", type=int, default=1000, help="mean tokens per call")
+    parser.add_argument("--latency", type=float, default=0.05, help="provider latency (seconds)")
+    parser.add_argument("--max-wait", type=float, default=2)
+    args = parser.parse_args()
+
+    from app.utils.rate_limit import RateLimiter
+
+    connect = _shared_redis()
+    tenants = ["nestjs"] * args.threads
+    report = {}
+
+    _configure(args)
+    report["unlimited"] = _run(args, [None] * args.workers, tenants)
+    report["redis"] = _run(args, [RateLimiter(connect()) for _ in range(args.workers)], tenants)
+
+    unfair = ["a"] * (args.threads * 6 // 7) + ["b"] * max(1, args.threads // 7)
+    report["fairness"] = {}
+    for share in (1.0, 0.6):
+        _configure(args, LLM_RATE_TENANT_SHARE=share, LLM_RATE_KEY_PREFIX=f"bench:fair:{share}")
+        report["fairness"][f"share={share}"] = _run(args, [RateLimiter(connect()) for _ in range(args.workers)], unfair)
+
+    _configure(args, LLM_RATE_KEY_PREFIX="bench:fallback")
+    report["fallback"] = _run(args, [RateLimiter(_redis_down, args.workers) for _ in range(args.workers)], tenants)
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Input tokens of a "re-summarize" chat request on long videos: what the QA
+agent's tool puts back in its context before (the full transcript) vs after
+(the session summary notes, app/caches/session_notes.py).
+
+The summary is made by the real map-reduce code (run_summary_crew) with the
+fake LLM of benchmarks/fakes.py, `--notes-tokens` is the size of every LLM
+answer (notes of one part, merged notes, final summary).
+
+    python -m benchmarks.resummarize_tokens --words 30000 60000 120000 --notes-tokens 1200
+"""
+
+import argparse
+import json
+import os
+import random
+
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+os.environ.setdefault("REDIS_HOST", "localhost")
+os.environ.setdefault("REDIS_PORT", "6379")
+os.environ.setdefault("REDIS_PASSWORD", "benchmark")
+os.environ.setdefault("CREWAI_DISABLE_TELEMETRY", "true")
+os.environ.setdefault("OTEL_SDK_DISABLED", "true")
+
+from benchmarks.fakes import Profile, install_fakes, _VOCABULARY  # noqa: E402
+from app.ai_agents.qa_context import assemble_qa_prompt  # noqa: E402
+from app.utils.tokens import estimate_tokens  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--words", type=int, nargs="+", default=[30000, 60000, 120000])
+    parser.add_argument("--notes-tokens", type=int, default=1200)
+    args = parser.parse_args()
+
+    llm = install_fakes(Profile(
+        llm_latency_median=0,
+        llm_output_tokens_min=args.notes_tokens,
+        llm_output_tokens_max=args.notes_tokens,
+    ))
+    from app.ai_agents.summary_agent import run_summary_crew
+    from app.ai_agents.qa_agent import _format_summary_notes
+
+    rng = random.Random(1)
+    question = "Can you re-summarize the video in 5 bullet points?"
+    # the QA prompt itself is the same before/after, the tool output is what changes
+    qa_prompt_tokens = estimate_tokens(assemble_qa_prompt("session", question, [], [])[0])
+    report = {"notes_tokens": args.notes_tokens, "qa_prompt_tokens": qa_prompt_tokens, "videos": []}
+    for words in args.words:
+        transcript = " ".join(rng.choice(_VOCABULARY) for _ in range(words))
+        result = run_summary_crew(transcript, llm=llm)
+        notes = _format_summary_notes({
+            "summary_instruction": None,
+            "summary": result["summary"],
+            "sections": result["sections"],
+        })
+        before, after = estimate_tokens(transcript), estimate_tokens(notes)
+        report["videos"].append({
+            "words": words,
+            "transcript_tokens": before,
+            "sections": len(result["sections"]),
+            "summary_input_tokens": result["input_tokens"],
+            # tool output, fed back to the LLM with the QA prompt
+            "resummarize_input_before": qa_prompt_tokens + before,
+            "resummarize_input_after": qa_prompt_tokens + after,
+            "saved": f"{1 - (qa_prompt_tokens + after) / (qa_prompt_tokens + before):.1%}",
+        })
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
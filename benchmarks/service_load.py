@@ -0,0 +1,186 @@
+"""
+Offline load test of the whole API (benchmarks/fakes.py instead of Gemini,
+YouTube and redis), with machine-readable results to catch regressions.
+
+    python -m benchmarks.service_load --concurrency 16 --requests 200 --output bench.json
+    python -m benchmarks.service_load --compare bench.json --tolerance 0.2   # exit 1 on regression
+
+Phases:
+    cold:  one /summary per video (cache misses, builds the retrieval indexes)
+    mixed: /summary (cache hits unless --bypass-cache) and /ask-question,
+           `--qa-ratio` of the requests are questions
+
+Reported per phase and endpoint: throughput, p50/p95/p99/max latency, errors,
+plus the peak RSS of the process.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import resource
+import sys
+import time
+from contextlib import redirect_stdout
+from io import StringIO
+
+from benchmarks.fakes import Profile, install_fakes
+
+API_KEY_HEADER = {"X-Internal-API-Key": "benchmark"}
+
+
+def _percentile(sorted_values: list[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(q * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def _stats(latencies: list[float], errors: int, wall: float) -> dict:
+    values = sorted(latencies)
+    return {
+        "requests": len(values) + errors,
+        "errors": errors,
+        "throughput_rps": round(len(values) / wall, 2) if wall else 0.0,
+        "p50_ms": round(_percentile(values, 0.50) * 1000, 1),
+        "p95_ms": round(_percentile(values, 0.95) * 1000, 1),
+        "p99_ms": round(_percentile(values, 0.99) * 1000, 1),
+        "max_ms": round(values[-1] * 1000, 1) if values else 0.0,
+    }
+
+
+def _video_url(i: int) -> str:
+    return f"https://www.youtube.com/watch?v=bench{i:06d}"
+
+
+async def _run_phase(client, jobs: list[tuple[str, dict]], concurrency: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    results: dict[str, dict] = {}
+
+    async def one(path: str, body: dict):
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.post(path, json=body, headers=API_KEY_HEADER)
+            elapsed = time.perf_counter() - started
+        endpoint = results.setdefault(path, {"latencies": [], "errors": 0})
+        if response.status_code == 200:
+            endpoint["latencies"].append(elapsed)
+        else:
+            endpoint["errors"] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(path, body) for path, body in jobs))
+    wall = time.perf_counter() - started
+    report = {path.rsplit("/", 1)[-1]: _stats(r["latencies"], r["errors"], wall) for path, r in results.items()}
+    report["wall_seconds"] = round(wall, 3)
+    report["throughput_rps"] = round(sum(len(r["latencies"]) for r in results.values()) / wall, 2)
+    return report
+
+
+async def _run(args) -> dict:
+    import httpx
+    from app.main import app
+
+    rng = random.Random(args.seed)
+    summary_path, qa_path = "/api/v1/ai/summary", "/api/v1/ai/ask-question"
+
+    cold = [
+        (summary_path, {"youtube_url": _video_url(i), "video_chat_session_id": f"bench-session-{i}"})
+        for i in range(args.videos)
+    ]
+    mixed = []
+    for _ in range(args.requests):
+        video = rng.randrange(args.videos)
+        if rng.random() < args.qa_ratio:
+            mixed.append((qa_path, {
+                "video_chat_session_id": f"bench-session-{video}",
+                "question": f"What does the video say about {rng.choice(['docker', 'cache', 'latency', 'threads'])}?",
+                "last_few_message": [f"message {n}" for n in range(rng.randint(0, 10))],
+            }))
+        else:
+            mixed.append((summary_path, {"youtube_url": _video_url(video), "bypass_cache": args.bypass_cache}))
+
+    # ASGITransport doesn't run the lifespan, do it here (redis pools, workers...)
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            return {
+                "cold": await _run_phase(client, cold, args.concurrency),
+                "mixed": await _run_phase(client, mixed, args.concurrency),
+            }
+
+
+def _regressions(current: dict, baseline: dict, tolerance: float) -> list[str]:
+    problems = []
+    for phase, endpoints in baseline["phases"].items():
+        for endpoint, base in endpoints.items():
+            if not isinstance(base, dict) or endpoint not in current["phases"].get(phase, {}):
+                continue
+            now = current["phases"][phase][endpoint]
+            if now["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+                problems.append(f"{phase}/{endpoint}: p95 {base['p95_ms']} -> {now['p95_ms']} ms")
+            if now["throughput_rps"] < base["throughput_rps"] * (1 - tolerance):
+                problems.append(f"{phase}/{endpoint}: throughput {base['throughput_rps']} -> {now['throughput_rps']} rps")
+            if now["errors"] > base["errors"]:
+                problems.append(f"{phase}/{endpoint}: errors {base['errors']} -> {now['errors']}")
+    if current["peak_rss_mb"] > baseline["peak_rss_mb"] * (1 + tolerance):
+        problems.append(f"peak RSS {baseline['peak_rss_mb']} -> {current['peak_rss_mb']} MB")
+    return problems
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=200, help="requests of the mixed phase")
+    parser.add_argument("--videos", type=int, default=20, help="distinct videos (cold phase size)")
+    parser.add_argument("--qa-ratio", type=float, default=0.7)
+    parser.add_argument("--bypass-cache", action="store_true")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--llm-latency", type=float, default=1.0, help="median seconds")
+    parser.add_argument("--llm-latency-sigma", type=float, default=0.3)
+    parser.add_argument("--output-tokens", type=int, nargs=2, default=(150, 600), metavar=("MIN", "MAX"))
+    parser.add_argument("--fetch-latency", type=float, default=0.3, help="median seconds")
+    parser.add_argument("--transcript-words", type=int, default=3000, help="median words")
+    parser.add_argument("--transcript-words-sigma", type=float, default=0.8)
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    parser.add_argument("--compare", help="baseline JSON report, exit 1 on regression")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    profile = Profile(
+        llm_latency_median=args.llm_latency,
+        llm_latency_sigma=args.llm_latency_sigma,
+        llm_output_tokens_min=args.output_tokens[0],
+        llm_output_tokens_max=args.output_tokens[1],
+        fetch_latency_median=args.fetch_latency,
+        transcript_words_median=args.transcript_words,
+        transcript_words_sigma=args.transcript_words_sigma,
+        seed=args.seed,
+    )
+    install_fakes(profile)
+
+    # the service prints every summary / token usage
+    with redirect_stdout(StringIO()):
+        phases = asyncio.run(_run(args))
+
+    report = {
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+        "phases": phases,
+        # linux: KiB
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            problems = _regressions(report, json.load(f), args.tolerance)
+        if problems:
+            print("\n".join(["regressions:", *problems]), file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Startup cost of the app: runs `python -X importtime -c "import app.main"` in a
+fresh interpreter and reports the total import time and the slowest modules.
+
+    python -m benchmarks.startup_importtime --top 15
+    python -m benchmarks.startup_importtime --max-ms 1500   # exit 1 above the budget (CI)
+
+Numbers are cumulative (a package includes everything it imports), like the
+`cumulative` column of -X importtime.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+_ENV_DEFAULTS = {
+    "GOOGLE_API_KEY": "benchmark",
+    "REDIS_HOST": "localhost",
+    "REDIS_PORT": "6379",
+    "REDIS_PASSWORD": "benchmark",
+    "API_KEY": "benchmark",
+}
+
+
+def _measure(module: str) -> list[tuple[str, int, int]]:
+    env = {**_ENV_DEFAULTS, **os.environ}
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    if proc.returncode != 0:
+        raise SystemExit(f"import {module} failed:\n{proc.stderr[-2000:]}")
+
+    rows = []
+    for line in proc.stderr.splitlines():
+        # import time:  self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--runs", type=int, default=3, help="the best run is reported (less noise)")
+    parser.add_argument("--max-ms", type=float, default=None, help="fail if the total is above this")
+    args = parser.parse_args()
+
+    best = None
+    for _ in range(args.runs):
+        rows = _measure(args.module)
+        # the top level module is the last line, its cumulative time is the total
+        total_us = next(cumulative for name, _, cumulative in reversed(rows) if name == args.module)
+        if best is None or total_us < best[0]:
+            best = (total_us, rows)
+
+    total_us, rows = best
+    slowest = sorted(rows, key=lambda row: row[2], reverse=True)[: args.top]
+    report = {
+        "module": args.module,
+        "total_ms": round(total_us / 1000, 1),
+        "modules_imported": len(rows),
+        "heavy_modules_loaded": {
+            name: any(row[0] == name for row in rows) for name in ("crewai", "google.genai", "litellm", "yt_dlp")
+        },
+        "top_cumulative_ms": [
+            {"module": name, "cumulative_ms": round(cumulative / 1000, 1), "self_ms": round(self_us / 1000, 1)}
+            for name, self_us, cumulative in slowest
+        ],
+    }
+    print(json.dumps(report, indent=2))
+
+    if args.max_ms is not None and report["total_ms"] > args.max_ms:
+        print(f"import of {args.module} took {report['total_ms']}ms, budget is {args.max_ms}ms", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Size and serialization cost of a /summary response, per transcript length:
+
+    inline       the whole transcript in the JSON body (before)
+    inline+gzip  same body, compressed by GZipMiddleware (Accept-Encoding: gzip)
+    reference    transcript_by_reference: the body has a TranscriptRef, the text
+                 is compressed once and stored (`store_ms`, paid once per transcript)
+
+Synthetic transcripts use Zipf-distributed words (compresses about like real
+English captions), `--text FILE` measures a real transcript instead.
+
+    python -m benchmarks.transcript_payload --words 5000 20000 60000
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import random
+import statistics
+import string
+import time
+
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+os.environ.setdefault("REDIS_HOST", "localhost")
+os.environ.setdefault("REDIS_PORT", "6379")
+os.environ.setdefault("REDIS_PASSWORD", "benchmark")
+
+from fastapi.responses import JSONResponse  # noqa: E402
+
+from app.api.v1.endpoints.ai.dto import SummaryResponse, TranscriptRef  # noqa: E402
+from app.configs.compression import RESPONSE_GZIP_LEVEL, TRANSCRIPT_COMPRESSION_LEVEL  # noqa: E402
+from app.utils.compression import CODECS, compress, resolve_codec  # noqa: E402
+
+
+def _synthetic_transcript(words: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    vocabulary = ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(2, 9))) for _ in range(5000)]
+    weights = [1 / rank for rank in range(1, len(vocabulary) + 1)]
+    return " ".join(rng.choices(vocabulary, weights=weights, k=words))
+
+
+def _response(transcript: str | None, ref: TranscriptRef | None) -> SummaryResponse:
+    return SummaryResponse(
+        video_metadata={"video_id": "abcdefghijk", "title": "A video", "duration": 3600},
+        summary="word " * 400,
+        transcript=transcript,
+        transcript_available=True,
+        input_tokens=10000,
+        output_tokens=500,
+        llm_model="gemini/gemini-2.5-flash",
+        transcript_ref=ref,
+    )
+
+
+def _body(response: SummaryResponse) -> bytes:
+    # what FastAPI does with a response_model
+    return JSONResponse(response.model_dump(mode="json")).body
+
+
+def _timed(fn, repeat: int):
+    durations, result = [], None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        durations.append(time.perf_counter() - started)
+    return round(statistics.median(durations) * 1000, 3), result
+
+
+def _measure(text: str, repeat: int) -> dict:
+    raw = text.encode("utf-8")
+    inline_ms, inline_body = _timed(lambda: _body(_response(text, None)), repeat)
+    gzip_ms, gzip_body = _timed(lambda: gzip.compress(_body(_response(text, None)), RESPONSE_GZIP_LEVEL), repeat)
+    result = {
+        "transcript_bytes": len(raw),
+        "inline": {"serialize_ms": inline_ms, "wire_bytes": len(inline_body)},
+        "inline+gzip": {"serialize_ms": gzip_ms, "wire_bytes": len(gzip_body)},
+    }
+    for codec in CODECS:
+        if resolve_codec(codec) != codec:
+            result[f"reference ({codec})"] = "not installed"
+            continue
+        store_ms, data = _timed(
+            lambda: (hashlib.sha256(raw).hexdigest(), compress(raw, codec, TRANSCRIPT_COMPRESSION_LEVEL))[1], repeat
+        )
+        ref = TranscriptRef(
+            transcript_id=hashlib.sha256(raw).hexdigest(),
+            size_bytes=len(raw),
+            compressed_bytes=len(data),
+            encoding=codec,
+        )
+        ref_ms, ref_body = _timed(lambda: _body(_response(None, ref)), repeat)
+        result[f"reference ({codec})"] = {
+            "serialize_ms": ref_ms,
+            "wire_bytes": len(ref_body),
+            "store_ms": store_ms,
+            "stored_bytes": len(data),
+        }
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--words", type=int, nargs="+", default=[5000, 20000, 60000])
+    parser.add_argument("--text", help="a real transcript (utf-8 text file) instead of the synthetic ones")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    if args.text:
+        with open(args.text, encoding="utf-8") as f:
+            texts = {"file": f.read()}
+    else:
+        texts = {f"{words}_words": _synthetic_transcript(words) for words in args.words}
+    report = {name: _measure(text, args.repeat) for name, text in texts.items()}
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Per-call CPU cost of the yt-dlp metadata path: a new YoutubeDL per request
+(before) vs the pooled, YouTube-only instances (app/utils/ytdlp_pool.py).
+
+The network part is removed (YoutubeIE._real_extract returns a canned info
+dict), so what is measured is construction + option parsing + yt-dlp's
+own processing of the result.
+
+    python -m benchmarks.ytdlp_pool --calls 200 --threads 1 4
+"""
+
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+os.environ.setdefault("REDIS_HOST", "localhost")
+os.environ.setdefault("REDIS_PORT", "6379")
+os.environ.setdefault("REDIS_PASSWORD", "benchmark")
+
+import yt_dlp  # noqa: E402
+from yt_dlp.extractor.youtube import YoutubeIE  # noqa: E402
+
+OPTIONS = {
+    "skip_download": True,
+    "noplaylist": True,
+    "quiet": True,
+    "no_warnings": True,
+    "logger": None,
+}
+
+
+def _canned_extract(self, url):
+    video_id = self._match_id(url)
+    return {
+        "id": video_id,
+        "title": f"video {video_id}",
+        "duration": 600,
+        "formats": [{"url": "https://example.invalid/v.mp4", "format_id": "18", "ext": "mp4"}],
+    }
+
+
+def _before(url: str) -> dict:
+    # what _fetch_video_metadata did: a new YoutubeDL (all extractors) per call
+    with yt_dlp.YoutubeDL(OPTIONS) as ydl:
+        return ydl.extract_info(url, download=False)
+
+
+def _after(url: str) -> dict:
+    from app.utils.ytdlp_pool import metadata_pool
+
+    with metadata_pool.checkout() as ydl:
+        return ydl.extract_info(url, download=False)
+
+
+def _measure(fn, calls: int, threads: int) -> dict:
+    urls = [f"https://www.youtube.com/watch?v=bench{i:06d}" for i in range(calls)]
+    fn(urls[0])  # imports / first instance
+    started_cpu, started = time.process_time(), time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(fn, urls))
+    wall, cpu = time.perf_counter() - started, time.process_time() - started_cpu
+    return {
+        "wall_ms_per_call": round(wall / calls * 1000, 3),
+        "cpu_ms_per_call": round(cpu / calls * 1000, 3),
+        "calls_per_second": round(calls / wall, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 4])
+    args = parser.parse_args()
+
+    YoutubeIE._real_extract = _canned_extract
+    report = {"calls": args.calls, "results": []}
+    for threads in args.threads:
+        before = _measure(_before, args.calls, threads)
+        after = _measure(_after, args.calls, threads)
+        report["results"].append({
+            "threads": threads,
+            "before": before,
+            "after": after,
+            "cpu_speedup": round(before["cpu_ms_per_call"] / max(after["cpu_ms_per_call"], 1e-6), 1),
+        })
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()